@@ -10,146 +10,266 @@ This script demonstrates how to:
 Requirements:
 - pip install pyautogui
 - pip install psutil (optional, for process management)
+
+Usage:
+    python app_controller.py                                  # interactive menu
+    python app_controller.py --serve --window "Terminal"      # headless service
+    python app_controller.py --serve --config serve.json      # settings from a JSON file
+    python app_controller.py --serve --shm tango_triggers     # plus the shared-memory fast path
 """
 
-import pyautogui
 import time
+STARTED_AT = time.perf_counter()  # Cold-start reference for --serve, taken before the other imports
+
+import argparse
+import json
 import sys
 import psutil
-import subprocess
 import socketserver
 import threading
 import socket
-from typing import Optional, List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Tuple
+
+from trigger_protocol import (
+    LineFramer, BinaryFramer, BinaryTriggerCodec, FrameTooLargeError, decode_message,
+    encode_ack, encode_binary_ack, encode_reply, UNKNOWN_COMMAND, CONTROL_COMMANDS, HELLO_COMMAND
+)
+from trigger_queue import TriggerQueue, TriggerRecord
+from input_backends import InputBackend, create_backend
+from window_focus import FocusService, create_focus_service
+from app_enumerator import ApplicationEnumerator
+from trigger_metrics import TriggerMetrics
+from window_pool import WindowPool, TargetWindow
+from controller_logging import get_logger, setup_logging
+from shm_transport import ShmTriggerReceiver, DEFAULT_CAPACITY as SHM_CAPACITY
+from keystroke_plan import (
+    load_sequence_specs, compile_sequences, trigger_fields, PlanExecutor
+)
+from delay_calibration import profile_path, load_profile, apply_profile, is_simulated
+from trigger_profiler import TriggerProfiler
+from trigger_guard import TriggerGuard
+from injection_thread import InjectionThread, PRIORITIES, parse_cpus, tune_process, tune_current_thread
+
+_pyautogui = None
 
-# Configure pyautogui safety settings
-pyautogui.PAUSE = 0.1  # Add a small pause between actions
-pyautogui.FAILSAFE = True  # Move mouse to top-left corner to abort
+
+def get_pyautogui():
+    """Import pyautogui on first use; it pulls in screenshot and message-box modules."""
+    global _pyautogui
+    if _pyautogui is None:
+        import pyautogui
+        # Configure pyautogui safety settings
+        pyautogui.PAUSE = 0  # Timing comes from the explicit delays, never a hidden per-call pause
+        pyautogui.FAILSAFE = True  # Move mouse to top-left corner to abort
+        _pyautogui = pyautogui
+    return _pyautogui
+
+# Hot-path messages go through the queued logger, never straight to the console
+log = get_logger()
+socket_log = get_logger('socket')
+executor_log = get_logger('executor')
 
 
 class TriggerHandler(socketserver.BaseRequestHandler):
-    """Handle incoming socket connections for F4 triggers."""
+    """Handle incoming socket connections for F4/F5 triggers.
+
+    A connection may carry a single legacy message or a stream of
+    newline-delimited messages (see trigger_protocol).
+    """
+    
+    def setup(self):
+        """Remember when the connection was accepted."""
+        self.accepted_at = time.perf_counter()
+        self.codec = None  # Set once the client negotiates binary frames
+        self.binary_framer = None
+        # Acks are tiny writes; without this Nagle holds them back behind the client's delayed ACK
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
     
     def handle(self):
-        """Handle incoming trigger message."""
+        """Read messages until the client closes the connection."""
+        framer = LineFramer()
         try:
-            # Receive data from client
-            data = self.request.recv(1024).decode('utf-8').strip()
-            
-            # Try to parse as JSON first (new format), fallback to simple string (old format)
-            try:
-                import json
-                trigger_data = json.loads(data)
+            while True:
+                data = self.request.recv(4096)
+                received_at = time.perf_counter()
+                if not data:
+                    # Client closed; process an undelimited trailing message
+                    leftover = framer.flush() if self.codec is None else None
+                    if leftover:
+                        self.process_message(leftover, received_at)
+                    break
                 
-                if trigger_data.get('command') == 'TRIGGER_F4':
-                    # Extract trigger information
-                    symbol_key = trigger_data.get('symbolKey', 'Unknown')
-                    scrip = trigger_data.get('scrip', 'Unknown')
-                    fut_scrip = trigger_data.get('futScrip', 'Unknown')
-                    fut_scrip_bp = trigger_data.get('futScripBp', 'Unknown')
-                    timestamp = trigger_data.get('timestamp', 'Unknown')
-                    
-                    print(f"📦 Received F4 trigger package:")
-                    print(f"   Symbol Key: {symbol_key}")
-                    print(f"   Scrip: {scrip}")
-                    print(f"   futScrip: {fut_scrip}")
-                    print(f"   futScripBp: {fut_scrip_bp}")
-                    print(f"   Timestamp: {timestamp}")
-                    print(f"   Raw package: {trigger_data}")
-                    
-                    # Store trigger information for use
-                    self.server.controller.last_trigger_info = {
-                        'command': 'TRIGGER_F4',
-                        'symbolKey': symbol_key,
-                        'scrip': scrip,
-                        'futScrip': fut_scrip,
-                        'futScripBp': fut_scrip_bp,
-                        'timestamp': timestamp
-                    }
-                    
-                    # Set the global trigger flag
-                    self.server.controller.trigger_received = True
-                    
-                    # Send acknowledgment back to client
-                    self.request.sendall(b"F4_TRIGGERED\n")
-                    print(f"✅ F4 trigger ready for scrip: {scrip}")
-                    
-                elif trigger_data.get('command') == 'TRIGGER_F5':
-                    # Extract trigger information for F5
-                    symbol_key = trigger_data.get('symbolKey', 'Unknown')
-                    scrip = trigger_data.get('scrip', 'Unknown')
-                    fut_scrip = trigger_data.get('futScrip', 'Unknown')
-                    timestamp = trigger_data.get('timestamp', 'Unknown')
-                    
-                    print(f"📦 Received F5 trigger package:")
-                    print(f"   Symbol Key: {symbol_key}")
-                    print(f"   Scrip: {scrip}")
-                    print(f"   futScrip: {fut_scrip}")
-                    print(f"   Timestamp: {timestamp}")
-                    print(f"   Raw package: {trigger_data}")
-                    
-                    # Store trigger information for use
-                    self.server.controller.last_trigger_info = {
-                        'command': 'TRIGGER_F5',
-                        'symbolKey': symbol_key,
-                        'scrip': scrip,
-                        'futScrip': fut_scrip,
-                        'timestamp': timestamp
-                    }
-                    
-                    # Set the global trigger flag
-                    self.server.controller.trigger_received = True
-                    
-                    # Send acknowledgment back to client
-                    self.request.sendall(b"F5_TRIGGERED\n")
-                    print(f"✅ F5 trigger ready for scrip: {scrip}")
-                    
-                else:
-                    self.request.sendall(b"UNKNOWN_COMMAND\n")
-                    
-            except json.JSONDecodeError:
-                # Fallback to old simple string format for backward compatibility
-                if data == "TRIGGER_F4":
-                    print("📦 Received legacy trigger format")
-                    
-                    # Store basic trigger information
-                    self.server.controller.last_trigger_info = {
-                        'command': 'TRIGGER_F4',  # Set command for legacy compatibility
-                        'symbolKey': 'Legacy',
-                        'scrip': 'Unknown',
-                        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                    
-                    # Set the global trigger flag
-                    self.server.controller.trigger_received = True
-                    
-                    # Send acknowledgment back to client
-                    self.request.sendall(b"F4_TRIGGERED\n")
-                    print("Trigger received from Node script - sending F4...")
-                else:
-                    self.request.sendall(b"UNKNOWN_COMMAND\n")
+                if self.codec is not None:
+                    self.process_binary(self.binary_framer.feed(data), received_at)
+                    continue
+                
+                for frame in framer.iter_frames(data):
+                    self.process_message(frame, received_at)
+                    if self.codec is not None:
+                        break
                 
+                if self.codec is not None:
+                    # Binary frames sent in the same packet as the HELLO line
+                    self.process_binary(self.binary_framer.feed(framer.take_rest()), received_at)
+                    continue
+                
+                # Legacy clients send one message without newline and wait for the reply
+                one_shot = framer.take_one_shot()
+                if one_shot:
+                    self.process_message(one_shot, received_at)
+                    
+        except FrameTooLargeError as e:
+            socket_log.error("Error handling socket request: %s", e)
+            self.request.sendall(encode_ack(UNKNOWN_COMMAND))
+        except (ConnectionResetError, BrokenPipeError):
+            pass
         except Exception as e:
-            print(f"Error handling socket request: {e}")
+            socket_log.exception("Error handling socket request: %s", e)
+    
+    def negotiate(self, request: Dict):
+        """Switch the connection to binary frames using the symbols listed in a HELLO message."""
+        try:
+            self.codec = BinaryTriggerCodec.from_hello(request)
+        except ValueError as e:
+            socket_log.warning("⚠️ Binary format refused: %s", e)
+            self.request.sendall(encode_reply({'status': 'ERROR', 'error': str(e)}, request.get('id')))
+            return
+        self.binary_framer = BinaryFramer()
+        socket_log.info("🔀 Connection switched to binary frames (%d symbols)", len(self.codec.symbols))
+        self.request.sendall(encode_reply({'status': 'OK', 'format': request['format'],
+                                           'symbols': len(self.codec.symbols)}, request.get('id')))
+    
+    def queue_trigger(self, trigger_info: Dict, received_at: float) -> Tuple[TriggerRecord, Optional[str]]:
+        """Hand a parsed trigger to the controller; returns the record and the rejection reason, if any."""
+        trigger = TriggerRecord.from_info(trigger_info, received_at)
+        trigger.timeline.mark('accepted', self.accepted_at)
+        trigger.timeline.mark('parsed')
+        command = trigger_info['command']
+        if trigger_info['symbolKey'] == 'Legacy':
+            socket_log.debug("📦 Received legacy trigger format")
+        else:
+            socket_log.debug("📦 Received %s trigger package: %s (scrip %s, futScrip %s)",
+                            command[-2:], trigger_info['symbolKey'], trigger_info['scrip'],
+                            trigger_info['futScrip'])
+            socket_log.debug("   futScripBp: %s, timestamp: %s",
+                             trigger_info.get('futScripBp'), trigger_info['timestamp'])
+        
+        trigger.timeline.mark('enqueued')
+        rejection = self.server.controller.submit_trigger(trigger)
+        if rejection:
+            socket_log.warning("⚠️ Trigger rejected (%s) - %s for %s",
+                               rejection, trigger_info['command'], trigger_info['scrip'])
+        else:
+            socket_log.debug("✅ %s trigger ready for scrip: %s", command[-2:], trigger_info['scrip'])
+        return trigger, rejection
+    
+    def process_message(self, frame: bytes, received_at: float):
+        """Parse one message, hand it to the controller and acknowledge it."""
+        trigger_info, ack = decode_message(frame)
+        
+        if trigger_info and trigger_info['command'] in CONTROL_COMMANDS:
+            if trigger_info['command'] == HELLO_COMMAND:
+                self.negotiate(trigger_info)
+                return
+            reply = self.server.controller.handle_control(trigger_info)
+            self.request.sendall(encode_reply(reply, trigger_info.get('id')))
+            return
+        
+        trigger = rejection = None
+        if trigger_info:
+            trigger, rejection = self.queue_trigger(trigger_info, received_at)
+            if rejection:
+                ack = encode_ack(rejection.upper(), trigger_info.get('id'))
+        
+        # Send acknowledgment back to client
+        self.request.sendall(ack)
+        
+        if trigger and not rejection:
+            trigger.timeline.mark('acked')
+    
+    def process_binary(self, frames: List[tuple], received_at: float):
+        """Queue every binary frame from one read and acknowledge them with a single write."""
+        acks = []
+        queued = []
+        for fields in frames:
+            trigger_info, correlation_id, status = self.codec.decode(fields)
+            if trigger_info:
+                trigger, rejection = self.queue_trigger(trigger_info, received_at)
+                if rejection:
+                    status = rejection.upper()
+                else:
+                    queued.append(trigger)
+            acks.append(encode_binary_ack(status, correlation_id))
+        if acks:
+            self.request.sendall(b''.join(acks))
+            acked_at = time.perf_counter()
+            for trigger in queued:
+                trigger.timeline.mark('acked', acked_at)
+
+
+class TriggerServer(socketserver.ThreadingTCPServer):
+    """Threaded TCP server so several producers can stay connected at once."""
+    
+    daemon_threads = True  # Connection threads die with the main thread
+    allow_reuse_address = True
+    
+    def __init__(self, server_address, controller):
+        super().__init__(server_address, TriggerHandler)
+        self.controller = controller
 
 
 class WindowsAppController:
     """Controller class for automating Windows applications via keyboard shortcuts."""
     
-    def __init__(self):
-        """Initialize the controller with safety settings."""
+    def __init__(self, max_pending_triggers: int = 100, max_trigger_age: Optional[float] = None,
+                 coalesce_triggers: bool = True, sequence_file: Optional[str] = None,
+                 input_backend: Optional[InputBackend] = None,
+                 focus_service: Optional[FocusService] = None,
+                 trigger_guard: Optional[TriggerGuard] = None):
+        """
+        Initialize the controller with safety settings.
+        
+        Args:
+            max_pending_triggers: Bound of the trigger queue; triggers beyond it are rejected
+            max_trigger_age: Seconds after which a trigger is stale and dropped (None, the default,
+                never expires; a limit must cover the queue depth times one sequence's duration)
+            coalesce_triggers: Merge pending triggers for the same symbolKey/command into the newest
+            sequence_file: Optional JSON file overriding/adding keystroke sequences
+            input_backend: Backend used to inject sequence keystrokes (default: best for platform)
+            focus_service: Service used to bring the target window to the front
+            trigger_guard: Per-symbol rate limits and circuit breaker applied before queueing (None disables)
+        """
         self.setup_safety()
-        self.trigger_received = False
         self.server = None
         self.server_thread = None
         self.target_app_info = None  # Store the target application info
-        self.last_trigger_info = None  # Store information from the last trigger
+        self.focus_service = focus_service or create_focus_service()
+        self.app_enumerator = ApplicationEnumerator()
+        self.metrics = TriggerMetrics()  # Rolling latency percentiles per command
+        # Pending triggers: stale ones dropped, repeats per symbol coalesced, highest priority first
+        self.queue_settings = {'maxsize': max_pending_triggers, 'max_age': max_trigger_age,
+                               'coalesce': coalesce_triggers,
+                               # A coalesced trigger runs no sequence of its own
+                               'on_coalesce': trigger_guard.refund if trigger_guard else None}
+        self.trigger_queue = TriggerQueue(**self.queue_settings)
+        self.window_pool = None  # Set when several target windows are controlled
+        self.shm_receiver = None  # Shared-memory ring consumer, if enabled
+        self.startup_seconds = None  # Module import to listening, set by the --serve entry point
+        self.profiler = TriggerProfiler()  # PROFILE/MEMORY/STACKS control commands
+        self.trigger_guard = trigger_guard
+        self.post_worker = None  # Takes metrics/breaker bookkeeping off the executor when started
+        
+        # Keystroke sequences are compiled once; the executor applies exact per-step delays
+        self.sequence_plans = compile_sequences(load_sequence_specs(sequence_file))
+        self.input_backend = input_backend or create_backend()
+        self.plan_executor = PlanExecutor(self.input_backend)
     
     def setup_safety(self):
         """Set up safety measures to prevent runaway automation."""
         print("Safety mode enabled:")
         print("- Move mouse to top-left corner to emergency stop")
-        print("- 0.1 second pause between actions")
+        print("- No implicit pause: timing comes from the explicit per-step delays")
         print("- Press Ctrl+C in terminal to stop script")
         print("-" * 50)
     
@@ -163,7 +283,7 @@ class WindowsAppController:
         """
         try:
             print(f"Sending hotkey: {' + '.join(keys)}")
-            pyautogui.hotkey(*keys)
+            get_pyautogui().hotkey(*keys)
             time.sleep(delay)
         except Exception as e:
             print(f"Error sending hotkey: {e}")
@@ -178,7 +298,7 @@ class WindowsAppController:
         """
         try:
             print(f"Typing: {text}")
-            pyautogui.typewrite(text, interval=interval)
+            get_pyautogui().typewrite(text, interval=interval)
         except Exception as e:
             print(f"Error typing text: {e}")
     
@@ -193,145 +313,48 @@ class WindowsAppController:
         """
         try:
             print(f"Pressing '{key}' {presses} time(s)")
-            pyautogui.press(key, presses=presses, interval=interval)
+            get_pyautogui().press(key, presses=presses, interval=interval)
         except Exception as e:
             print(f"Error pressing key: {e}")
     
-    def get_open_applications(self) -> List[Dict[str, str]]:
+    def get_open_applications(self, max_age: Optional[float] = None) -> List[Dict[str, str]]:
         """
         Get list of currently open applications with visible windows.
         
+        Args:
+            max_age: Maximum age in seconds of the cached list (0 forces a rescan)
+        
         Returns:
             List of dictionaries containing app info (name, pid, window_title)
         """
         try:
-            # Use tasklist command to get running processes with window titles
-            result = subprocess.run(
-                ['tasklist', '/fo', 'csv', '/v'],
-                capture_output=True,
-                text=True,
-                encoding='utf-8'
-            )
-            
-            if result.returncode != 0:
-                print("Error getting process list")
-                return []
-            
-            lines = result.stdout.strip().split('\n')
-            if len(lines) < 2:
-                return []
-            
-            # Parse CSV header
-            header = [col.strip('"') for col in lines[0].split('","')]
-            apps = []
-            
-            # Find relevant column indices
-            name_idx = header.index('Image Name') if 'Image Name' in header else 0
-            pid_idx = header.index('PID') if 'PID' in header else 1
-            title_idx = header.index('Window Title') if 'Window Title' in header else -1
-            
-            for line in lines[1:]:
-                if not line.strip():
-                    continue
-                    
-                # Parse CSV line
-                cols = [col.strip('"') for col in line.split('","')]
-                if len(cols) <= max(name_idx, pid_idx, title_idx):
-                    continue
-                
-                name = cols[name_idx]
-                pid = cols[pid_idx]
-                window_title = cols[title_idx] if title_idx != -1 else "N/A"
-                
-                # Filter out system processes and processes without meaningful window titles
-                if (window_title and 
-                    window_title not in ['N/A', 'Console', ''] and 
-                    not window_title.startswith('Windows') and
-                    name.lower() not in ['dwm.exe', 'winlogon.exe', 'csrss.exe', 'smss.exe']):
-                    
-                    apps.append({
-                        'name': name,
-                        'pid': pid,
-                        'window_title': window_title,
-                        'display_name': f"{name} - {window_title}"
-                    })
-            
-            # Remove duplicates based on window title
-            seen_titles = set()
-            unique_apps = []
-            for app in apps:
-                if app['window_title'] not in seen_titles:
-                    seen_titles.add(app['window_title'])
-                    unique_apps.append(app)
-            
-            return unique_apps
-            
+            return self.app_enumerator.get_applications(max_age)
         except Exception as e:
             print(f"Error getting applications: {e}")
             return []
     
-    def focus_application(self, app_info: Dict[str, str]):
+    def focus_application(self, app_info: Dict[str, str]) -> bool:
         """
         Automatically focus an application by bringing its window to the front.
-        """
-        print(f"🎯 Focusing application: {app_info['display_name']}")
         
+        The focus service caches the window handle and returns at once when the
+        window is already in the foreground, so refocusing before every trigger is cheap.
+        
+        Returns:
+            True if the application window is in the foreground
+        """
         try:
-            # Use PowerShell to bring the window to front based on process name
-            process_name = app_info['name'].replace('.exe', '')
-            
-            # Enhanced PowerShell command with multiple focus attempts
-            powershell_cmd = f'''
-            $proc = Get-Process -Name "{process_name}" -ErrorAction SilentlyContinue | Select-Object -First 1
-            if ($proc -and $proc.MainWindowHandle -ne 0) {{
-                Add-Type -TypeDefinition 'using System; using System.Runtime.InteropServices; public class Win32 {{ [DllImport("user32.dll")] public static extern bool SetForegroundWindow(IntPtr hWnd); [DllImport("user32.dll")] public static extern bool BringWindowToTop(IntPtr hWnd); [DllImport("user32.dll")] public static extern bool ShowWindow(IntPtr hWnd, int nCmdShow); [DllImport("user32.dll")] public static extern bool SetActiveWindow(IntPtr hWnd); }}'
-                
-                # Multiple attempts to ensure focus
-                [Win32]::ShowWindow($proc.MainWindowHandle, 9)  # SW_RESTORE
-                Start-Sleep -Milliseconds 100
-                [Win32]::BringWindowToTop($proc.MainWindowHandle)
-                Start-Sleep -Milliseconds 100
-                [Win32]::SetForegroundWindow($proc.MainWindowHandle)
-                Start-Sleep -Milliseconds 100
-                [Win32]::SetActiveWindow($proc.MainWindowHandle)
-                
-                Write-Host "Successfully focused window for {process_name}"
-            }} else {{
-                Write-Host "Could not find window for {process_name}"
-            }}
-            '''
-            
-            # Execute PowerShell command
-            result = subprocess.run(
-                ['powershell', '-Command', powershell_cmd],
-                capture_output=True,
-                text=True
-            )
+            if self.focus_service.focus(app_info):
+                return True
+            executor_log.error("❌ Could not auto-focus %s", app_info['name'])
             
-            if result.returncode == 0:
-                print(f"✅ Focus command executed for {app_info['name']}")
-                time.sleep(0.3)  # Brief pause to ensure focus is set
-                
-                # Verify focus by checking if we can send a harmless key
-                try:
-                    print("🔍 Verifying application focus...")
-                    # Send a null operation to test focus (Alt key press and release)
-                    pyautogui.keyDown('alt')
-                    time.sleep(0.05)
-                    pyautogui.keyUp('alt')
-                    print("✅ Application focus verified")
-                except Exception as verify_error:
-                    print(f"⚠️ Focus verification failed: {verify_error}")
-                    
-            else:
-                print(f"❌ Could not auto-focus {app_info['name']}")
-                print("Please manually click on the application window")
-                time.sleep(1)
-                
         except Exception as e:
-            print(f"❌ Error focusing application: {e}")
-            print("Please manually click on the application window")
-            time.sleep(1)
+            executor_log.error("❌ Error focusing application: %s", e)
+            self.focus_service.invalidate()
+        
+        executor_log.warning("Please manually click on the application window")
+        time.sleep(1)
+        return False
     
     def send_to_focused_window(self, action_type: str):
         """Send keyboard commands to currently focused window."""
@@ -370,21 +393,20 @@ class WindowsAppController:
     def start_socket_server(self, port: int = 9999):
         """Start the socket server to listen for triggers."""
         try:
-            # Create server
-            self.server = socketserver.TCPServer(("localhost", port), TriggerHandler)
-            self.server.controller = self  # Pass reference to controller
+            # Create server (one thread per connected producer)
+            self.server = TriggerServer(("localhost", port), self)
             
             # Start server in separate thread
             self.server_thread = threading.Thread(target=self.server.serve_forever)
             self.server_thread.daemon = True  # Dies when main thread dies
             self.server_thread.start()
             
-            print(f"Socket server started on localhost:{port}")
-            print("Waiting for trigger from Node script...")
+            log.info("Socket server started on localhost:%d", port)
+            log.info("Waiting for trigger from Node script...")
             return True
             
         except Exception as e:
-            print(f"Error starting socket server: {e}")
+            log.error("Error starting socket server: %s", e)
             return False
     
     def stop_socket_server(self):
@@ -392,241 +414,320 @@ class WindowsAppController:
         if self.server:
             self.server.shutdown()
             self.server.server_close()
-            print("Socket server stopped")
-    
-    def wait_for_trigger(self):
-        """Wait for trigger from Node script indefinitely."""
-        self.trigger_received = False
-        
-        print("Waiting for trigger... (Press Ctrl+C to cancel)")
-        
-        while not self.trigger_received:
-            time.sleep(0.1)  # Check every 100ms
-                
-        return True
+            log.info("Socket server stopped")
     
-    def execute_trigger_sequence(self, trigger_info):
-        """Execute the complete keystroke sequence for F4 or F5 trigger."""
-        if not trigger_info:
-            print("❌ No trigger information available")
-            return
-            
-        command = trigger_info.get('command', 'UNKNOWN')
-        scrip = trigger_info.get('scrip', 'Unknown')
-        
-        print(f"\n🔄 Executing {command} keystroke sequence for scrip: {scrip}")
+    def start_shm_transport(self, name: str, capacity: int = SHM_CAPACITY) -> bool:
+        """
+        Consume triggers from a shared-memory ring alongside the socket server.
         
+        Args:
+            name: Shared-memory name that local producers attach to
+            capacity: Number of trigger slots (rounded up to a power of two)
+        """
         try:
-            if command == 'TRIGGER_F4':
-                self.execute_f4_sequence(scrip)
-            elif command == 'TRIGGER_F5':
-                self.execute_f5_sequence(scrip)
-            else:
-                print(f"❌ Unknown command: {command}")
-                
+            self.shm_receiver = ShmTriggerReceiver(self.receive_shm_trigger, name, capacity)
         except Exception as e:
-            print(f"❌ Error executing {command} sequence: {e}")
-            raise
+            log.error("Error creating shared-memory ring '%s': %s", name, e)
+            return False
+        self.shm_receiver.start()
+        log.info("Shared-memory trigger ring '%s' ready (%d slots)", name, self.shm_receiver.ring.capacity)
+        return True
     
-    def execute_f4_sequence(self, scrip):
-        """Execute the F4 keystroke sequence."""
-        print("F4 Sequence:")
-        
-        # Get trigger info for futScrip and futScripBp
-        trigger_info = self.last_trigger_info or {}
-        fut_scrip = trigger_info.get('futScrip', scrip)
-        fut_scrip_bp = trigger_info.get('futScripBp', '0')
-        
-        # Step 1: F8
-        print("Step 1: Sending F8...")
-        self.send_hotkey('f8', delay=0.3)
-        
-        # Step 2: Enter numeric value 500
-        print("Step 2: Entering value 500...")
-        self.type_text('500', interval=0.05)
-        time.sleep(0.2)
-        
-        # Step 3: Press SHIFT+TAB 2 times
-        print("Step 3: Pressing SHIFT+TAB 2 times...")
-        self.send_hotkey('shift', 'tab', delay=0.2)
-        self.send_hotkey('shift', 'tab', delay=0.2)
-        
-        # Step 4: Press F key
-        print("Step 4: Pressing F key...")
-        self.press_key('f', interval=0.2)
-        
-        # Step 5: Press TAB 3 times
-        print("Step 5: Pressing TAB 3 times...")
-        self.press_key('tab', presses=3, interval=0.2)
-        
-        # Step 6: Enter futScrip value
-        print(f"Step 6: Entering futScrip: {fut_scrip}...")
-        self.type_text(str(fut_scrip), interval=0.05)
-        time.sleep(0.2)
-        
-        # Step 7: Press TAB
-        print("Step 7: Pressing TAB...")
-        self.press_key('tab', interval=0.2)
-        
-        # Step 8: Enter futScripBp value
-        print(f"Step 8: Entering futScripBp: {fut_scrip_bp}...")
-        self.type_text(str(fut_scrip_bp), interval=0.05)
-        time.sleep(0.2)
-        
-        # Step 9: Press Enter 3 times
-        print("Step 9: Pressing Enter 3 times...")
-        self.press_key('enter', presses=3, interval=0.2)
-        
-        # Step 10: F4
-        print("Step 10: Sending F4...")
-        self.send_hotkey('f4', delay=0.3)
-        
-        # Step 11: Press BACKSPACE 3 times
-        print("Step 11: Pressing BACKSPACE 3 times...")
-        self.press_key('backspace', presses=3, interval=0.2)
-        
-        # Step 12: Enter numeric value 500
-        print("Step 12: Entering value 500...")
-        self.type_text('500', interval=0.05)
-        time.sleep(0.2)
-        
-        # Step 13: Press TAB once
-        print("Step 13: Pressing TAB...")
-        self.press_key('tab', interval=0.2)
-        
-        # Step 14: Enter Scrip
-        print(f"Step 14: Entering scrip: {scrip}...")
-        self.type_text(scrip, interval=0.05)
-        time.sleep(0.2)
-        
-        # Step 15: Press SHIFT+TAB 3 times
-        print("Step 15: Pressing SHIFT+TAB 3 times...")
-        self.send_hotkey('shift', 'tab', delay=0.2)
-        self.send_hotkey('shift', 'tab', delay=0.2)
-        self.send_hotkey('shift', 'tab', delay=0.2)
-        
-        # Step 16: Press R key
-        print("Step 16: Pressing R key...")
-        self.press_key('r', interval=0.2)
-        
-        # Step 17: Press TAB once
-        print("Step 17: Pressing TAB...")
-        self.press_key('tab', interval=0.2)
-        
-        # Step 18: Press DOWN ARROW 2 times
-        print("Step 18: Pressing DOWN ARROW 2 times...")
-        self.press_key('down', presses=2, interval=0.2)
-        
-        # Step 19: Press Enter 5 times (final step)
-        print("Step 19: Pressing Enter 5 times (final step)...")
-        self.press_key('enter', presses=5, interval=0.2)
-        
-        print(f"✅ F4 keystroke sequence completed successfully for scrip: {scrip}")
+    def stop_shm_transport(self):
+        """Stop the shared-memory consumer and remove the ring."""
+        if self.shm_receiver:
+            self.shm_receiver.stop()
+            self.shm_receiver = None
+            log.info("Shared-memory trigger ring removed")
     
-    def execute_f5_sequence(self, scrip):
-        """Execute the F5 keystroke sequence."""
-        print("F5 Sequence:")
-        
-        # Get trigger info for futScrip
-        trigger_info = self.last_trigger_info or {}
-        fut_scrip = trigger_info.get('futScrip', scrip)
+    def receive_shm_trigger(self, trigger_info: Dict, received_at: float) -> Optional[str]:
+        """Queue a trigger read from the shared-memory ring; returns the rejection reason, if any."""
+        trigger = TriggerRecord.from_info(trigger_info, received_at)
+        trigger.timeline.mark('parsed')
+        trigger.timeline.mark('enqueued')
+        rejection = self.submit_trigger(trigger)
+        if rejection:
+            socket_log.warning("⚠️ Shared-memory trigger rejected (%s) - %s for %s",
+                               rejection, trigger_info['command'], trigger_info['scrip'])
+        return rejection
+    
+    def load_delay_profile(self, app_name: str, path: Optional[str] = None) -> List[str]:
+        """
+        Use the calibrated step delays for a target application (see delay_calibration.py).
         
-        # Step 1: F5
-        print("Step 1: Sending F5...")
-        self.send_hotkey('f5', delay=0.3)            
+        A profile found by application name is skipped if it was calibrated on
+        the simulator; pass its path explicitly to use it anyway.
         
-        # Step 2: Enter numeric value 500
-        print("Step 2: Entering value 500...")
-        self.type_text('500', interval=0.05)
-        time.sleep(0.2)
+        Args:
+            app_name: Process name the profile was calibrated for
+            path: Explicit profile file (default: profiles/<app_name>.json)
         
-        # Step 3: Press TAB once
-        print("Step 3: Pressing TAB...")
-        self.press_key('tab', interval=0.2)
+        Returns:
+            Names of the sequences whose delays were replaced
+        """
+        explicit = path is not None
+        path = path or profile_path(app_name)
+        try:
+            profile = load_profile(path)
+        except (OSError, ValueError) as e:
+            log.warning("⚠️ Ignoring delay profile %s: %s", path, e)
+            return []
+        if profile is None:
+            if explicit:
+                log.warning("⚠️ Delay profile %s not found; using compiled delays", path)
+            return []
+        if not explicit and is_simulated(profile):
+            log.warning("⚠️ Delay profile %s was calibrated on the simulator; not loaded automatically "
+                        "(pass --delay-profile %s to use it)", path, path)
+            return []
+        self.sequence_plans, tuned = apply_profile(self.sequence_plans, profile)
+        if tuned:
+            log.info("⏱️ Calibrated delays for %s from %s: %s", app_name, path, ', '.join(sorted(tuned)))
+        else:
+            log.warning("⚠️ Delay profile %s does not match the current sequences; using compiled delays", path)
+        return tuned
+    
+    def start_post_worker(self):
+        """Record metrics, breaker results and profiler reports on a worker thread."""
+        if self.post_worker is None:
+            self.post_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='post')
+            self.profiler.defer = self.defer
+    
+    def stop_post_worker(self):
+        """Finish queued bookkeeping and stop the worker."""
+        if self.post_worker:
+            self.profiler.defer = None
+            self.post_worker.shutdown(wait=True)
+            self.post_worker = None
+    
+    def defer(self, func, *args):
+        """Run func on the post-processing worker if there is one, otherwise now."""
+        if self.post_worker is None:
+            func(*args)
+            return
+        self.post_worker.submit(self._run_deferred, func, *args)
+    
+    @staticmethod
+    def _run_deferred(func, *args):
+        try:
+            func(*args)
+        except Exception as e:
+            log.error("❌ Post-processing %s failed: %s", getattr(func, '__name__', func), e)
+    
+    def submit_trigger(self, trigger: TriggerRecord) -> Optional[str]:
+        """
+        Queue a trigger for the executor (called from socket threads).
         
-        # Step 4: Enter Scrip
-        print(f"Step 4: Entering scrip: {scrip}...")
-        self.type_text(scrip, interval=0.05)
-        time.sleep(0.2)
+        With a window pool the trigger is routed to one of the target windows.
         
-        # Step 5: Press SHIFT+TAB 3 times
-        print("Step 5: Pressing SHIFT+TAB 3 times...")
-        self.send_hotkey('shift', 'tab', delay=0.2)
-        self.send_hotkey('shift', 'tab', delay=0.2)
-        self.send_hotkey('shift', 'tab', delay=0.2)
+        Returns:
+            None if queued, otherwise the rejection reason (e.g. 'queue_full', 'stale', 'rate_limited')
+        """
+        if self.trigger_guard:
+            rejection = self.trigger_guard.admit(trigger)
+            if rejection:
+                return rejection
+        if self.window_pool:
+            rejection = self.window_pool.submit(trigger)
+        else:
+            rejection = self.trigger_queue.put(trigger)
+        if rejection and self.trigger_guard:
+            self.trigger_guard.refund(trigger)
+        return rejection
+    
+    def start_window_pool(self, apps: List[Dict[str, str]], routing: str = 'affinity',
+                          thread_setup=None) -> WindowPool:
+        """
+        Start one executor per target window; triggers are then routed between them.
         
-        # Step 6: Press R key
-        print("Step 6: Pressing R key...")
-        self.press_key('r', interval=0.2)
+        Triggers already waiting in the single-window queue are handed to the pool.
         
-        # Step 7: Press TAB once
-        print("Step 7: Pressing TAB...")
-        self.press_key('tab', interval=0.2)
+        Args:
+            apps: Target applications
+            routing: 'affinity' (symbolKey sticks to a window) or 'least_loaded'
+            thread_setup: Called first on each window's executor thread
+        """
+        pool = WindowPool(
+            apps, self.input_backend, self.focus_service,
+            queue_factory=lambda: TriggerQueue(**self.queue_settings),
+            process=self.process_pending,
+            routing=routing,
+            verbose=self.plan_executor.verbose,
+            thread_setup=thread_setup,
+        )
+        pool.start()
+        self.window_pool = pool
+        while True:
+            trigger = self.trigger_queue.get(timeout=0)
+            if trigger is None:
+                break
+            pool.submit(trigger)
+        return pool
+    
+    def stop_window_pool(self):
+        """Stop the window pool executors."""
+        if self.window_pool:
+            self.window_pool.stop()
+            self.window_pool = None
+    
+    def wait_for_trigger(self) -> Optional[TriggerRecord]:
+        """
+        Wait for the next trigger from Node script indefinitely.
         
-        # Step 8: Press DOWN ARROW 2 times
-        print("Step 8: Pressing DOWN ARROW 2 times...")
-        self.press_key('down', presses=2, interval=0.2)
+        Returns:
+            The next queued trigger, or None if the queue was closed
+        """
+        if not len(self.trigger_queue):
+            log.info("Waiting for trigger... (Press Ctrl+C to cancel)")
         
-        # Step 9: Press Enter 5 times
-        print("Step 9: Pressing Enter 5 times...")
-        self.press_key('enter', presses=5, interval=0.2)
+        while True:
+            # Producers wake us immediately; the timeout only keeps Ctrl+C responsive on Windows
+            trigger = self.trigger_queue.get(timeout=1.0)
+            if trigger is not None:
+                trigger.timeline.mark('dequeued')
+                return trigger
+            if self.trigger_queue.closed:
+                return None
+    
+    def handle_control(self, request: Dict) -> Dict:
+        """
+        Answer a control command received on the trigger socket.
         
-        # Step 10: F4
-        print("Step 10: Sending F4...")
-        self.send_hotkey('f4', delay=0.3)
+        Args:
+            request: The decoded control message (command plus arguments)
         
-        # Step 11: Press BACKSPACE 3 times
-        print("Step 11: Pressing BACKSPACE 3 times...")
-        self.press_key('backspace', presses=3, interval=0.2)
+        Returns:
+            JSON-serializable reply
+        """
+        command = request['command']
+        if command == 'METRICS':
+            if request.get('format') == 'prometheus':
+                return {'status': 'OK', 'prometheus': self.metrics.to_prometheus()}
+            reply = {'status': 'OK', 'latency_seconds': self.metrics.snapshot(),
+                     'queue': self.trigger_queue.stats()}
+            if self.window_pool:
+                reply['windows'] = self.window_pool.status()
+            if self.shm_receiver:
+                reply['shm'] = self.shm_receiver.stats()
+            if request.get('recent'):
+                reply['recent'] = self.metrics.recent_timelines()
+            if self.startup_seconds is not None:
+                reply['startup_s'] = self.startup_seconds
+            if self.trigger_guard:
+                reply['guard'] = self.trigger_guard.stats()
+                if request.get('symbol'):
+                    reply['guard']['symbol'] = self.trigger_guard.symbol_status(request['symbol'])
+            return reply
+        if command in ('PROFILE', 'MEMORY', 'STACKS'):
+            return self.profiler.handle(request)
+        return {'status': UNKNOWN_COMMAND}
+    
+    def process_trigger(self, trigger: TriggerRecord, window: Optional[TargetWindow] = None):
+        """
+        Focus the target application, run the trigger's sequence and record its timeline.
         
-        # Step 12: Enter numeric value 500
-        print("Step 12: Entering value 500...")
-        self.type_text('500', interval=0.05)
-        time.sleep(0.2)
+        Args:
+            trigger: Trigger to execute
+            window: Pool window to execute on (the pool focuses it for the whole sequence)
+        """
+        timeline = trigger.timeline
         
-        # Step 13: Press TAB once
-        print("Step 13: Pressing TAB...")
-        self.press_key('tab', interval=0.2)
+        # Re-focus the target application right before executing keystrokes
+        # (no-op when it is still in the foreground)
+        if window is None and self.target_app_info:
+            timeline.mark('focus_start')
+            self.focus_application(self.target_app_info)
+            timeline.mark('focus_end')
         
-        # Step 14: Enter Scrip
-        print(f"Step 14: Entering futScrip: {fut_scrip}...")
-        self.type_text(fut_scrip, interval=0.05)
-        time.sleep(0.2)
+        timeline.mark('execution_start')
+        if self.trigger_guard:
+            self.trigger_guard.begin(trigger)  # A hung sequence times out without returning
+        ok = False
+        try:
+            self.execute_trigger_sequence(trigger, window.executor if window else None)
+            ok = True
+        finally:
+            timeline.mark('complete')
+            if self.trigger_guard:
+                self.trigger_guard.end(trigger)
+            self.defer(self.finish_trigger, trigger, ok)
+    
+    def finish_trigger(self, trigger: TriggerRecord, ok: bool):
+        """Record a completed trigger's timeline and feed its result to the circuit breaker."""
+        self.metrics.record(trigger.command, trigger.timeline, trigger.symbol_key)
+        if not self.trigger_guard:
+            return
+        duration = trigger.timeline.span('execution_start', 'complete') or 0.0
+        if self.trigger_guard.record_result(trigger, ok, duration):
+            executor_log.warning("⛔ Circuit opened for %s after repeated failed/slow sequences; "
+                                 "refusing it for %.0fs", trigger.symbol_key, self.trigger_guard.breaker_cooldown)
+    
+    def process_pending(self, trigger: TriggerRecord,
+                        window: Optional[TargetWindow] = None) -> List[TriggerRecord]:
+        """
+        Execute a trigger just taken from the queue (the executor loops' entry point).
         
-        # Step 15: Press SHIFT+TAB 3 times
-        print("Step 15: Pressing SHIFT+TAB 3 times...")
-        self.send_hotkey('shift', 'tab', delay=0.2)
-        self.send_hotkey('shift', 'tab', delay=0.2)
-        self.send_hotkey('shift', 'tab', delay=0.2)
+        Args:
+            trigger: Trigger just taken from the queue
+            window: Pool window to execute on
         
-        # Step 16: Press F key
-        print("Step 16: Pressing F key...")
-        self.press_key('f', interval=0.2)
+        Returns:
+            Every trigger executed
+        """
+        if self.profiler.pending:
+            return self.profiler.run(self._process_pending, trigger, window)
+        return self._process_pending(trigger, window)
+    
+    def _process_pending(self, trigger: TriggerRecord,
+                         window: Optional[TargetWindow] = None) -> List[TriggerRecord]:
+        self.process_trigger(trigger, window)
+        return [trigger]
+    
+    def execute_trigger_sequence(self, trigger: Optional[TriggerRecord],
+                                 executor: Optional[PlanExecutor] = None):
+        """Execute the complete keystroke sequence for F4 or F5 trigger."""
+        if not trigger:
+            executor_log.error("❌ No trigger information available")
+            return
+            
+        command = trigger.command
+        scrip = trigger.scrip
         
-        # Step 17: Press TAB once
-        print("Step 17: Pressing TAB...")
-        self.press_key('tab', interval=0.2)
+        executor_log.info("🔄 Executing %s keystroke sequence for scrip: %s", command, scrip)
         
-        # Step 18: Press DOWN ARROW 2 times
-        print("Step 18: Pressing DOWN ARROW 2 times...")
-        self.press_key('down', presses=2, interval=0.2)
-
-        # Step 19: Press Enter 5 times (final step)
-        print("Step 19: Pressing Enter 5 times (final step)...")
-        self.press_key('enter', presses=5, interval=0.2)
+        plan = self.sequence_plans.get(command)
+        if plan is None:
+            executor_log.error("❌ Unknown command: %s", command)
+            return
         
-        print(f"✅ F5 keystroke sequence completed successfully for scrip: {scrip}")
-
-
-
+        try:
+            timings = (executor or self.plan_executor).run(plan, trigger_fields(trigger))
+            for timing in timings:
+                trigger.timeline.mark(f'step_{timing.step}', timing.started)
+                trigger.timeline.note_lateness(timing.late)
+            executor_log.info("✅ %s keystroke sequence completed successfully for scrip: %s", command, scrip)
+            if timings:
+                total = sum(timing.duration for timing in timings)
+                slowest = max(timings, key=lambda timing: timing.duration)
+                executor_log.info("⏱️ %.3fs total, slowest step %d (%.3fs)", total, slowest.step, slowest.duration)
+                
+        except Exception as e:
+            executor_log.error("❌ Error executing %s sequence: %s", command, e)
+            raise
+    
 
 
-def show_application_selector(controller: WindowsAppController):
-    """Show menu to select from currently open applications."""
+def show_application_selector(controller: WindowsAppController, multiple: bool = False):
+    """
+    Show menu to select from currently open applications.
+    
+    Args:
+        multiple: Accept a comma-separated list and return a list of applications
+    """
     print("\n=== OPEN APPLICATIONS ===")
     print("Scanning for open applications...")
     
-    apps = controller.get_open_applications()
+    apps = controller.get_open_applications(max_age=0)
     
     if not apps:
         print("No applications with visible windows found.")
@@ -642,11 +743,21 @@ def show_application_selector(controller: WindowsAppController):
     
     while True:
         try:
-            choice = input(f"\nSelect application (1-{len(apps)}) or 'back': ").strip().lower()
+            if multiple:
+                choice = input(f"\nSelect applications (e.g. 1,3,4) or 'back': ").strip().lower()
+            else:
+                choice = input(f"\nSelect application (1-{len(apps)}) or 'back': ").strip().lower()
             
             if choice == 'back':
                 return None
             
+            if multiple:
+                choice_nums = [int(part) for part in choice.split(',') if part.strip()]
+                if choice_nums and all(1 <= num <= len(apps) for num in choice_nums):
+                    return [apps[num - 1] for num in dict.fromkeys(choice_nums)]
+                print(f"Please enter numbers between 1 and {len(apps)}")
+                continue
+            
             choice_num = int(choice)
             if 1 <= choice_num <= len(apps):
                 return apps[choice_num - 1]
@@ -663,10 +774,12 @@ def control_application(controller: WindowsAppController, app_info: Dict[str, st
     
     # Store the target application info for re-focusing when trigger arrives
     controller.target_app_info = app_info
+    controller.load_delay_profile(app_info['name'])
     
     # Automatically focus the application
-    controller.focus_application(app_info)
-    print(f"Application '{app_info['display_name']}' is now focused")
+    print(f"🎯 Focusing application: {app_info['display_name']}")
+    if controller.focus_application(app_info):
+        print(f"Application '{app_info['display_name']}' is now focused")
     
     # Start socket server
     if not controller.start_socket_server():
@@ -680,39 +793,27 @@ def control_application(controller: WindowsAppController, app_info: Dict[str, st
         print("const net = require('net');")
         print("const client = net.createConnection(9999, 'localhost');")
         print("client.write('TRIGGER_F4');")
+        print("Persistent clients may send newline-delimited JSON with an 'id' per trigger")
         print("\n🔄 Listening for triggers continuously... (Press Ctrl+C to stop)")
         
         while True:
-            if controller.wait_for_trigger():  # Wait indefinitely for each trigger
-                # Display trigger information if available
-                if controller.last_trigger_info:
-                    trigger_info = controller.last_trigger_info
-                    command_type = trigger_info.get('command', 'UNKNOWN')
-                    print(f"\n🎯 Processing {command_type} for:")
-                    print(f"   Scrip: {trigger_info['scrip']}")
-                    print(f"   Symbol Key: {trigger_info['symbolKey']}")
-                    print(f"   Timestamp: {trigger_info['timestamp']}")
+            trigger = controller.wait_for_trigger()  # Wait indefinitely for each trigger
+            if trigger:
+                # Display trigger information
+                executor_log.info("🎯 Processing %s for %s (scrip %s, queued behind it: %d)",
+                                  trigger.command, trigger.symbol_key, trigger.scrip,
+                                  len(controller.trigger_queue))
                 
-                # Re-focus the target application right before executing keystrokes
-                if controller.target_app_info:
-                    print("Ensuring application focus before keystroke execution...")
-                    controller.focus_application(controller.target_app_info)
-                    time.sleep(0.5)  # Give more time for focus to be properly set
-                
-                # Execute complete keystroke sequence
-                controller.execute_trigger_sequence(controller.last_trigger_info)
+                # Re-focus the target application and execute complete keystroke sequence
+                # (through process_pending so a PROFILE armed over the socket covers it)
+                controller.process_pending(trigger)
                 
                 # Display completion message with scrip info
-                trigger_info = controller.last_trigger_info
-                scrip_display = trigger_info['scrip'] if trigger_info else 'Unknown'
-                command_type = trigger_info.get('command', 'UNKNOWN') if trigger_info else 'UNKNOWN'
-                print(f"✅ {command_type} sequence executed for {app_info['display_name']} - scrip: {scrip_display}")
-                print("🔄 Ready for next trigger...")
-                
-                # Reset trigger flag for next trigger
-                controller.trigger_received = False
+                executor_log.info("✅ %s sequence executed for %s - scrip: %s",
+                                  trigger.command, app_info['display_name'], trigger.scrip)
+                executor_log.debug("🔄 Ready for next trigger...")
             else:
-                print("Trigger monitoring stopped")
+                log.info("Trigger monitoring stopped")
                 break
             
     except KeyboardInterrupt:
@@ -744,6 +845,40 @@ def control_application(controller: WindowsAppController, app_info: Dict[str, st
             print(f"Error executing command '{command}': {e}")
 
 
+def control_applications(controller: WindowsAppController, apps: List[Dict[str, str]]):
+    """Control several application windows, one executor per window."""
+    print(f"\n=== CONTROLLING {len(apps)} WINDOWS ===")
+    for app in apps:
+        print(f"   {app['display_name']}")
+    
+    if len({app['name'].lower() for app in apps}) == 1:
+        controller.load_delay_profile(apps[0]['name'])
+    controller.start_window_pool(apps)
+    
+    # Start socket server
+    if not controller.start_socket_server():
+        print("Failed to start socket server. Returning to main menu.")
+        controller.stop_window_pool()
+        return
+    
+    try:
+        print("\n🔄 Routing triggers across windows... (Press Ctrl+C to stop)")
+        # Executors run on their own threads; the timeout keeps Ctrl+C responsive
+        while not controller.window_pool.wait(1.0):
+            pass
+            
+    except KeyboardInterrupt:
+        print("\nOperation cancelled by user")
+        
+    finally:
+        # Clean up
+        controller.stop_socket_server()
+        for status in controller.window_pool.status():
+            print(f"   {status['window']}: {status['completed']} completed, "
+                  f"{status['focus_handoffs']} focus handoffs")
+        controller.stop_window_pool()
+
+
 def execute_keystroke_command(controller: WindowsAppController, command: str):
     """Execute a keystroke command."""
     command = command.strip().lower()
@@ -770,12 +905,232 @@ def execute_keystroke_command(controller: WindowsAppController, command: str):
 
 
 
-def main():
+# Defaults for the headless service; a --config JSON file and the command line override them
+SERVE_DEFAULTS = {
+    'port': 9999,
+    'shm': None,
+    'windows': [],
+    'routing': 'affinity',
+    'sequence_file': None,
+    'backend': 'auto',
+    'max_pending': 100,
+    'max_age': None,
+    'coalesce': True,
+    'log_level': 'INFO',
+    'log_steps': False,
+    'window_wait': 0,
+    'delay_profile': 'auto',
+    'symbol_rate': 0.5,
+    'symbol_burst': 3,
+    'global_rate': 2.0,
+    'global_burst': 10,
+    'breaker_failures': 3,
+    'breaker_cooldown': 30.0,
+    'sequence_timeout': 15.0,
+    'priority': 'high',
+    'cpus': None,
+    'pause_gc': True,
+}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Command line for the interactive menu (no arguments) and the --serve service."""
+    parser = argparse.ArgumentParser(description="Windows Application Controller")
+    parser.add_argument('--serve', action='store_true',
+                        help="Run headless: bind the trigger socket at once and execute without menus")
+    parser.add_argument('--config', help="JSON file with service settings (keys as below, '-' -> '_')")
+    parser.add_argument('--window', dest='windows', action='append',
+                        help="Target window: title/process substring or pid:<n> (repeat for several)")
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--shm', help="Also accept triggers from a shared-memory ring with this name")
+    parser.add_argument('--routing', choices=('affinity', 'least_loaded'))
+    parser.add_argument('--sequence-file', help="Keystroke sequence JSON")
+    parser.add_argument('--backend', help="Input backend: auto, sendinput, pyautogui or recording")
+    parser.add_argument('--max-pending', type=int)
+    parser.add_argument('--max-age', type=float, help="Stale-trigger age in seconds (default: never expire; negative disables)")
+    parser.add_argument('--no-coalesce', dest='coalesce', action='store_false', default=None)
+    parser.add_argument('--log-level')
+    parser.add_argument('--log-steps', action='store_true', default=None)
+    parser.add_argument('--window-wait', type=float,
+                        help="Seconds to keep looking for target windows (0 = until found)")
+    parser.add_argument('--delay-profile', metavar='PATH|auto|none',
+                        help="Calibrated step delays (auto: profiles/<process name>.json)")
+    parser.add_argument('--symbol-rate', type=float, help="Triggers per second per symbolKey (0 disables)")
+    parser.add_argument('--symbol-burst', type=int, help="Triggers a symbolKey may send at once")
+    parser.add_argument('--global-rate', type=float, help="Triggers per second over all symbols (0 disables)")
+    parser.add_argument('--global-burst', type=int)
+    parser.add_argument('--breaker-failures', type=int,
+                        help="Consecutive failed/slow sequences that stop a symbolKey (0 disables)")
+    parser.add_argument('--breaker-cooldown', type=float, help="Seconds a stopped symbolKey is refused")
+    parser.add_argument('--sequence-timeout', type=float,
+                        help="Seconds after which a sequence counts as failed (0 disables)")
+    parser.add_argument('--priority', choices=PRIORITIES, help="Process and injection thread priority")
+    parser.add_argument('--cpus', help="CPUs for the process, e.g. 2,3; the injection thread gets the first")
+    parser.add_argument('--no-gc-pause', dest='pause_gc', action='store_false', default=None,
+                        help="Keep automatic garbage collection on while sequences run")
+    return parser.parse_args(argv)
+
+
+def serve_options(args: argparse.Namespace) -> Dict:
+    """Merge defaults, the config file and command-line values (in that order)."""
+    options = dict(SERVE_DEFAULTS)
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        unknown = set(config) - set(SERVE_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown settings in {args.config}: {', '.join(sorted(unknown))}")
+        options.update(config)
+    for key in SERVE_DEFAULTS:
+        value = getattr(args, key, None)
+        if value is not None:
+            options[key] = value
+    if options['priority'] not in PRIORITIES:
+        raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+    parse_cpus(options['cpus'])  # Raises ValueError for a malformed list
+    return options
+
+
+def match_window(app: Dict[str, str], pattern: str) -> bool:
+    """Match an application by pid:<n> or a case-insensitive title/process substring."""
+    if pattern.startswith('pid:'):
+        return app['pid'] == pattern[4:]
+    pattern = pattern.lower()
+    return pattern in app['display_name'].lower() or pattern in app['name'].lower()
+
+
+def find_target_windows(controller: WindowsAppController, patterns: List[str],
+                        wait: float = 0) -> List[Dict[str, str]]:
+    """
+    Resolve window patterns to applications, rescanning until every pattern matches.
+
+    Args:
+        controller: Controller whose enumerator is used
+        patterns: Patterns for match_window(); the first match of each is used
+        wait: Give up after this many seconds (0 keeps looking)
+
+    Returns:
+        One application per pattern, or an empty list on timeout
+    """
+    deadline = time.monotonic() + wait if wait > 0 else None
+    announced = False
+    while True:
+        apps = controller.get_open_applications(max_age=0)
+        found = []
+        for pattern in patterns:
+            match = next((app for app in apps if match_window(app, pattern) and app not in found), None)
+            if match is None:
+                break
+            found.append(match)
+        else:
+            return found
+        if deadline is not None and time.monotonic() >= deadline:
+            return []
+        if not announced:
+            log.warning("Waiting for target window(s): %s", ', '.join(patterns))
+            announced = True
+        time.sleep(1)
+
+
+def load_serve_profile(controller: WindowsAppController, apps: List[Dict[str, str]], setting: Optional[str]):
+    """Apply the --delay-profile setting once the target windows are known."""
+    if not setting or setting == 'none':
+        return
+    if setting != 'auto':
+        controller.load_delay_profile(apps[0]['name'] if apps else 'default', setting)
+        return
+    names = {app['name'].lower() for app in apps}
+    if len(names) == 1:
+        controller.load_delay_profile(apps[0]['name'])
+    elif names:
+        # One plan table serves every window, so mixed applications keep the compiled delays
+        log.warning("Target windows belong to different applications; no delay profile loaded")
+
+
+def serve(options: Dict) -> int:
+    """
+    Headless service: listen first, then find the target windows and execute triggers.
+    
+    Triggers that arrive while the windows are being located are acknowledged and
+    queued (subject to the usual stale-trigger age).
+    """
+    setup_logging(options['log_level'], steps=options['log_steps'])
+    cpus = parse_cpus(options['cpus'])
+    max_age = options['max_age'] if options['max_age'] is None or options['max_age'] >= 0 else None
+    controller = WindowsAppController(
+        max_pending_triggers=options['max_pending'],
+        max_trigger_age=max_age,
+        coalesce_triggers=options['coalesce'],
+        sequence_file=options['sequence_file'],
+        input_backend=create_backend(options['backend']),
+        trigger_guard=TriggerGuard.from_options(options),
+    )
+    if not controller.start_socket_server(options['port']):
+        return 1
+    if options['shm'] and not controller.start_shm_transport(options['shm']):
+        controller.stop_socket_server()
+        return 1
+    controller.startup_seconds = time.perf_counter() - STARTED_AT
+    log.info("🚀 Listening on localhost:%d %.0f ms after start", options['port'],
+             controller.startup_seconds * 1000)
+    
+    try:
+        patterns = options['windows']
+        apps = find_target_windows(controller, patterns, options['window_wait']) if patterns else []
+        if patterns and not apps:
+            log.error("❌ Target window(s) not found: %s", ', '.join(patterns))
+            return 1
+        if not apps:
+            log.warning("No --window given; keystrokes go to whichever window is in the foreground")
+        load_serve_profile(controller, apps, options['delay_profile'])
+        
+        # Executors only inject keystrokes; metrics and breaker bookkeeping go to a worker
+        controller.start_post_worker()
+        if len(apps) > 1:
+            tune_process(options['priority'], cpus)
+            controller.start_window_pool(apps, options['routing'],
+                                         thread_setup=lambda window: tune_current_thread(options['priority']))
+            log.info("🎯 Routing triggers across %s", ', '.join(app['display_name'] for app in apps))
+            while not controller.window_pool.wait(1.0):
+                pass
+        else:
+            if apps:
+                controller.target_app_info = apps[0]
+                log.info("🎯 Target: %s", apps[0]['display_name'])
+            injector = InjectionThread(controller, options['priority'], cpus, options['pause_gc'])
+            injector.start()
+            try:
+                while not injector.join(1.0):
+                    pass
+            finally:
+                injector.stop()
+    except KeyboardInterrupt:
+        log.info("Service stopped by user")
+    finally:
+        controller.stop_socket_server()
+        controller.stop_shm_transport()
+        controller.stop_window_pool()
+        controller.stop_post_worker()
+    return 0
+
+
+def main(argv=None):
     """Main function to run the application controller."""
+    args = parse_args(argv)
+    if args.serve:
+        try:
+            options = serve_options(args)
+        except (OSError, ValueError) as e:
+            print(f"❌ Invalid service configuration: {e}")
+            return 2
+        return serve(options)
+    
     print("Windows Application Controller")
     print("=" * 40)
     print("Control currently open applications with keyboard shortcuts")
     
+    # Console and logs/controller.log are written by a background thread
+    setup_logging()
     controller = WindowsAppController()
     
     while True:
@@ -783,10 +1138,11 @@ def main():
         print("MAIN MENU")
         print("=" * 50)
         print("1. Select from open applications")
-        print("2. Custom hotkey sender")
-        print("3. Exit")
+        print("2. Select several windows (multi-window execution)")
+        print("3. Custom hotkey sender")
+        print("4. Exit")
         
-        choice = input("\nEnter choice (1-3): ").strip()
+        choice = input("\nEnter choice (1-4): ").strip()
         
         try:
             if choice == '1':
@@ -794,8 +1150,12 @@ def main():
                 if app:
                     control_application(controller, app)
             elif choice == '2':
-                custom_hotkey_sender(controller)
+                apps = show_application_selector(controller, multiple=True)
+                if apps:
+                    control_applications(controller, apps)
             elif choice == '3':
+                custom_hotkey_sender(controller)
+            elif choice == '4':
                 print("Goodbye!")
                 break
             else:
@@ -845,4 +1205,4 @@ def custom_hotkey_sender(controller: WindowsAppController):
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
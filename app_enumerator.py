@@ -0,0 +1,142 @@
+"""
+Application Enumerator
+List applications with visible windows, using psutil and a cached snapshot.
+
+Process names come from psutil and are cached per (pid, create time), so a
+refresh only queries processes that started since the previous one. Window
+titles come from one EnumWindows pass on Windows. Every main window is its
+own entry, identified by (pid, hwnd), so several instances of one terminal
+with identical titles stay separate. Filtering happens once per refresh;
+callers within the TTL get the cached list back.
+"""
+
+import sys
+import time
+import threading
+from typing import Optional, List, Dict, Tuple, Callable
+
+import psutil
+
+# Processes that never host a user-facing application window
+SYSTEM_PROCESSES = {'dwm.exe', 'winlogon.exe', 'csrss.exe', 'smss.exe'}
+IGNORED_TITLES = {'N/A', 'Console', ''}
+
+
+def win32_window_titles() -> List[Tuple[int, int, str]]:
+    """(pid, hwnd, title) of every visible, titled, unowned top-level window (Windows only)."""
+    import ctypes
+    from ctypes import wintypes
+
+    user32 = ctypes.windll.user32
+    user32.GetWindow.argtypes = (wintypes.HWND, ctypes.c_uint)
+    user32.GetWindow.restype = wintypes.HWND
+    GW_OWNER = 4
+    windows = []
+    enum_proc_type = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+    buffer = ctypes.create_unicode_buffer(512)
+    pid = wintypes.DWORD()
+
+    def callback(hwnd, _lparam):
+        # Owned windows are dialogs of a main window, not separate targets
+        if user32.IsWindowVisible(hwnd) and not user32.GetWindow(hwnd, GW_OWNER):
+            length = user32.GetWindowTextW(hwnd, buffer, len(buffer))
+            if length:
+                user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+                windows.append((pid.value, hwnd, buffer.value))
+        return True
+
+    user32.EnumWindows(enum_proc_type(callback), 0)
+    return windows
+
+
+def no_window_titles() -> List[Tuple[int, int, str]]:
+    """Title provider for platforms without Win32 windows."""
+    return []
+
+
+class ApplicationEnumerator:
+    """Cached, incrementally refreshed list of open applications."""
+
+    def __init__(self, ttl: float = 2.0,
+                 window_titles: Optional[Callable[[], List[Tuple[int, int, str]]]] = None):
+        """
+        Args:
+            ttl: Seconds a snapshot stays valid before the next refresh
+            window_titles: Callable returning [(pid, hwnd, window title)]
+                           (default: EnumWindows on Windows, nothing elsewhere)
+        """
+        self.ttl = ttl
+        if window_titles is None:
+            window_titles = win32_window_titles if sys.platform == 'win32' else no_window_titles
+        self.window_titles = window_titles
+        self._names = {}  # pid -> (create_time, name)
+        self._apps: List[Dict[str, str]] = []
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self.processes_scanned = 0  # Processes queried on the last refresh
+
+    def _process_name(self, pid: int) -> Optional[str]:
+        """Return the cached name of pid, querying psutil only for new processes."""
+        cached = self._names.get(pid)
+        try:
+            proc = psutil.Process(pid)
+            create_time = proc.create_time()
+            if cached and cached[0] == create_time:
+                return cached[1]
+            name = proc.name()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            self._names.pop(pid, None)
+            return None
+        self.processes_scanned += 1
+        self._names[pid] = (create_time, name)
+        return name
+
+    def refresh(self) -> List[Dict[str, str]]:
+        """Rebuild the application list now."""
+        with self._lock:
+            self.processes_scanned = 0
+            titles = self.window_titles()
+
+            # Drop processes that exited since the last refresh
+            live = set(psutil.pids())
+            for pid in list(self._names):
+                if pid not in live:
+                    del self._names[pid]
+
+            apps = []
+            seen = set()
+            for pid, hwnd, window_title in sorted(titles):
+                if (window_title in IGNORED_TITLES or window_title.startswith('Windows')
+                        or (pid, hwnd) in seen or pid not in live):
+                    continue
+                name = self._process_name(pid)
+                if not name or name.lower() in SYSTEM_PROCESSES:
+                    continue
+                seen.add((pid, hwnd))
+                apps.append({
+                    'name': name,
+                    'pid': str(pid),
+                    'hwnd': str(hwnd),
+                    'window_title': window_title,
+                    'display_name': f"{name} - {window_title}"
+                })
+
+            self._apps = apps
+            self._refreshed_at = time.monotonic()
+            return list(apps)
+
+    def get_applications(self, max_age: Optional[float] = None) -> List[Dict[str, str]]:
+        """
+        Return the application list, refreshing it if older than max_age.
+
+        Args:
+            max_age: Maximum snapshot age in seconds (default: the enumerator TTL;
+                     0 forces a refresh)
+        """
+        if max_age is None:
+            max_age = self.ttl
+        with self._lock:
+            if (self._refreshed_at is not None
+                    and time.monotonic() - self._refreshed_at < max_age):
+                return list(self._apps)
+        return self.refresh()
@@ -0,0 +1,119 @@
+"""
+Controller Logging
+Queue-based logging so trigger handling never waits on console or file I/O.
+
+Every controller module logs through a child of the 'controller' logger.
+setup_logging() attaches a single QueueHandler to it; records are put on an
+unbounded in-memory queue and a background QueueListener thread writes them
+to the console and a size-rotated log file. The socket handler and the
+sequence executor therefore only pay for formatting the message.
+
+Loggers:
+    controller           general status
+    controller.socket    trigger packages, acks and rejections
+    controller.executor  sequence start/finish, focus, timing summaries
+    controller.steps     one line per sequence step (muted unless steps=True)
+
+Levels can also be set with the CONTROLLER_LOG_LEVEL and CONTROLLER_LOG_STEPS
+environment variables.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from typing import Optional
+
+LOGGER_NAME = 'controller'
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+LOG_FILE = 'controller.log'
+CONSOLE_FORMAT = '%(message)s'
+FILE_FORMAT = '%(asctime)s.%(msecs)03d %(levelname)-7s %(threadName)s %(name)s: %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def get_logger(name: Optional[str] = None) -> logging.Logger:
+    """Logger 'controller' or 'controller.<name>'."""
+    return logging.getLogger(f'{LOGGER_NAME}.{name}' if name else LOGGER_NAME)
+
+
+def _level(value, default: int) -> int:
+    if value is None:
+        return default
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(str(value).upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level '{value}'")
+    return level
+
+
+def setup_logging(level=None, console_level=None, log_dir: Optional[str] = LOG_DIR,
+                  console: bool = True, steps: Optional[bool] = None,
+                  max_bytes: int = 5 * 1024 * 1024, backup_count: int = 5) -> logging.handlers.QueueListener:
+    """
+    Route controller logging through a background writer thread.
+
+    Calling it again replaces the previous configuration.
+
+    Args:
+        level: Minimum level recorded at all (default INFO, or CONTROLLER_LOG_LEVEL)
+        console_level: Minimum level shown on the console (default: level)
+        log_dir: Directory for the rotating log file (None disables file logging)
+        console: Write records to stdout
+        steps: Log every sequence step (default off, or CONTROLLER_LOG_STEPS=1)
+        max_bytes: Size at which the log file is rotated
+        backup_count: Rotated files kept
+
+    Returns:
+        The running QueueListener
+    """
+    shutdown_logging()
+
+    level = _level(level if level is not None else os.environ.get('CONTROLLER_LOG_LEVEL'), logging.INFO)
+    console_level = _level(console_level, level)
+    if steps is None:
+        steps = os.environ.get('CONTROLLER_LOG_STEPS', '').lower() in ('1', 'true', 'yes')
+
+    handlers = []
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(console_level)
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(console_handler)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(log_dir, LOG_FILE), maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        file_handler.setLevel(level)
+        file_handler.setFormatter(logging.Formatter(FILE_FORMAT, DATE_FORMAT))
+        handlers.append(file_handler)
+
+    records = queue.SimpleQueue()  # Unbounded: put() never blocks the caller
+    logger = get_logger()
+    logger.handlers[:] = [logging.handlers.QueueHandler(records)]
+    logger.setLevel(level)
+    logger.propagate = False
+    get_logger('steps').setLevel(level if steps else logging.WARNING)
+
+    global _listener
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,444 @@
+"""
+Delay Calibration
+Find the shortest step delays a target application sustains and save them as a profile.
+
+Calibration starts from the compiled sequences' delays and tightens one step
+at a time: the step's delay (and typing interval) is shrunk until the probe
+reports a failure, then set back to the last passing value plus a safety
+margin. Earlier steps keep their tightened values while later ones are
+calibrated. A sequence whose final profile does not pass the probe again
+(with more trials) keeps its original delays.
+
+A probe answers "do these delays still work?". Two exist:
+
+- SimulatorProbe (--probe simulator, the default) plays the sequence on
+  terminal_simulator (alone and twice back-to-back, with jittered latencies)
+  and passes only if every trial produces the reference orders without
+  early keystrokes. It never touches the real application.
+- OrderLogProbe (--probe order_log) runs the sequence on the real terminal
+  window and passes only if orderManager.js logs an acknowledgment in
+  order_logs.txt for every order the sequence should place (matched by
+  symbol) and no rejection, within a timeout. Every check places real
+  orders, so it has to be confirmed with --yes.
+
+Profiles are stored per target application (process name) in profiles/ and
+loaded by the controller when it starts on that application - unless they
+were calibrated with SimulatorProbe: the simulator only models the terminal,
+so such a profile is used only when its path is passed explicitly
+(--delay-profile profiles/terminal.exe.json).
+
+Usage:
+    python delay_calibration.py --app terminal.exe                      # calibrate on the simulator
+    python delay_calibration.py --app terminal.exe --latency open=0.4 --jitter 0.5 --margin 0.3
+    python delay_calibration.py --app terminal.exe --probe order_log --yes \
+        --field scrip=NPL --field symbolKey=NPL-JAN-NPL --field futScrip=NPL-JAN --field futScripBp=88.01
+    python delay_calibration.py --show terminal.exe
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional, List, Dict, Tuple, Any
+
+from input_backends import InputBackend, create_backend
+from keystroke_plan import KeystrokePlan, PlanExecutor, load_sequence_specs, compile_sequences
+from order_log_parser import iter_order_responses
+from terminal_simulator import DEFAULT_LATENCIES, POLICIES, check_plans, parse_latencies, reference_orders
+from window_focus import FocusService, create_focus_service
+from window_pool import FocusedBackend
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+PROFILE_VERSION = 1
+SIMULATED_PROBES = {'simulator'}  # Probes that never touched the real application
+ORDER_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'order_logs.txt')
+LOG_POLL_SECONDS = 0.1
+SAMPLE_FIELDS = {'scrip': 'NPL', 'symbolKey': 'NPL-JAN-NPL', 'futScrip': 'NPL-JAN', 'futScripBp': '100.25'}
+
+
+class DelayProbe:
+    """Decides whether a plan's delays still work on the target."""
+
+    name = 'base'
+
+    def check(self, plan: KeystrokePlan, fields: Dict[str, str]) -> Tuple[bool, str]:
+        """
+        Run the plan (or a stand-in for it) and verify the outcome.
+
+        Returns:
+            (passed, reason for a failure)
+        """
+        raise NotImplementedError
+
+    def settings(self) -> Dict[str, Any]:
+        """Recorded in the profile so a calibration can be reproduced."""
+        return {'probe': self.name}
+
+
+class SimulatorProbe(DelayProbe):
+    """Local stand-in probe backed by terminal_simulator."""
+
+    name = 'simulator'
+
+    def __init__(self, latencies: Optional[Dict[str, float]] = None, policy: str = 'drop',
+                 jitter: float = 0.2, trials: int = 5):
+        """
+        Args:
+            latencies: Terminal latency overrides (see terminal_simulator.DEFAULT_LATENCIES)
+            policy: What the simulated terminal does with early keystrokes
+            jitter: Random stretch of every latency, as a fraction
+            trials: Seeded runs that must all pass
+        """
+        self.latencies = dict(DEFAULT_LATENCIES, **(latencies or {}))
+        self.policy = policy
+        self.jitter = jitter
+        self.trials = trials
+
+    def check(self, plan: KeystrokePlan, fields: Dict[str, str]) -> Tuple[bool, str]:
+        for trial in range(self.trials):
+            # Twice back-to-back as well, so the last step's delay covers the next trigger
+            for runs in ([(plan, fields)], [(plan, fields), (plan, fields)]):
+                ok, report, _ = check_plans(runs, self.latencies, self.policy, self.jitter, seed=trial)
+                if not ok:
+                    if report.early:
+                        early = report.early[0]
+                        return False, f"'{early.key}' {early.early_by * 1000:.0f} ms early at step {early.step}"
+                    if report.stray:
+                        return False, f"{report.stray} keystroke(s) with no form open"
+                    return False, "orders differ from the reference"
+        return True, ''
+
+    def settings(self) -> Dict[str, Any]:
+        return {'probe': self.name, 'latencies': self.latencies, 'policy': self.policy,
+                'jitter': self.jitter, 'trials': self.trials}
+
+
+class OrderLogProbe(DelayProbe):
+    """Real-target probe: runs the plan on the terminal and waits for its orders in order_logs.txt."""
+
+    name = 'order_log'
+
+    def __init__(self, app_info: Dict[str, str], log_path: str = ORDER_LOG_PATH, timeout: float = 10.0,
+                 trials: int = 1, backend: Optional[InputBackend] = None,
+                 focus_service: Optional[FocusService] = None):
+        """
+        Args:
+            app_info: Target window (as listed by ApplicationEnumerator)
+            log_path: order_logs.txt written by orderManager.js
+            timeout: Seconds to wait for the acknowledgments after the sequence ends
+            trials: Runs that must all pass (each one places real orders)
+            backend: Input backend (default: best for platform)
+            focus_service: Brings the target window to the front before every batch
+        """
+        self.app_info = app_info
+        self.log_path = log_path
+        self.timeout = timeout
+        self.trials = trials
+        backend = FocusedBackend(backend or create_backend(), focus_service or create_focus_service(),
+                                 app_info, threading.Lock())
+        self.executor = PlanExecutor(backend, verbose=False)
+
+    def _log_size(self) -> int:
+        try:
+            return os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return 0
+
+    def _responses(self, offset: int) -> List[Dict[str, Any]]:
+        """Responses logged after offset (complete lines only)."""
+        try:
+            with open(self.log_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        data = data[:data.rfind(b'\n') + 1]
+        return list(iter_order_responses(data.decode('utf-8', errors='replace').splitlines()))
+
+    @staticmethod
+    def _symbol(response: Dict[str, Any], symbols) -> Optional[str]:
+        """The expected symbol an acknowledgment's message names, if any."""
+        words = str(response.get('message', '')).split()
+        return next((symbol for symbol in symbols if symbol in words), None)
+
+    def check(self, plan: KeystrokePlan, fields: Dict[str, str]) -> Tuple[bool, str]:
+        expected = Counter(str(order.get('symbol')) for order in reference_orders([(plan, fields)]).orders)
+        for _ in range(self.trials):
+            offset = self._log_size()
+            self.executor.run(plan, fields)
+            deadline = time.monotonic() + self.timeout
+            while True:
+                acknowledged = Counter()
+                for response in self._responses(offset):
+                    status = str(response.get('status') or '')
+                    if response.get('orderNo') is None or 'REJECT' in status.upper():
+                        return False, f"order rejected: {response.get('message', status)}"
+                    symbol = self._symbol(response, expected)
+                    if status == 'ACKNOWLEDGED' and symbol:
+                        acknowledged[symbol] += 1
+                missing = expected - acknowledged
+                if not missing:
+                    break
+                if time.monotonic() >= deadline:
+                    return False, (f"no acknowledgment for {', '.join(sorted(missing.elements()))} "
+                                   f"within {self.timeout:g}s")
+                time.sleep(LOG_POLL_SECONDS)
+        return True, ''
+
+    def settings(self) -> Dict[str, Any]:
+        return {'probe': self.name, 'window_title': self.app_info.get('window_title'),
+                'timeout': self.timeout, 'trials': self.trials}
+
+
+def calibrate_plan(plan: KeystrokePlan, probe: DelayProbe, fields: Dict[str, str] = SAMPLE_FIELDS,
+                   shrink: float = 0.7, margin: float = 0.2, min_margin: float = 0.005,
+                   floor: float = 0.001, verbose: bool = True) -> Dict[int, Dict[str, float]]:
+    """
+    Tighten every step's delay (and typing interval) in turn.
+
+    Args:
+        plan: Compiled plan with the current delays
+        probe: Verifies a candidate plan
+        fields: Template values used while probing
+        shrink: Factor applied per tightening attempt
+        margin: Relative safety margin added to the last passing value
+        min_margin: Absolute margin added at least, in seconds
+        floor: Below this a delay is tried as 0 once, then tightening stops
+
+    Returns:
+        {step: {'delay': ..., 'interval': ...}} for every step (never above the original)
+    """
+    original = plan.step_delays()
+    delays = {step: dict(entry) for step, entry in original.items()}
+    ok, reason = probe.check(plan, fields)
+    if not ok:
+        raise RuntimeError(f"{plan.name} fails the probe with its current delays ({reason})")
+
+    for step in sorted(delays):
+        for key in ('interval', 'delay'):
+            if key not in delays[step]:
+                continue
+            start = delays[step][key]
+            passing = start
+            candidate = start
+            while passing > 0:
+                candidate = candidate * shrink if candidate * shrink >= floor else 0.0
+                trial = dict(delays)
+                trial[step] = dict(delays[step], **{key: candidate})
+                ok, reason = probe.check(plan.with_step_delays(trial), fields)
+                if not ok:
+                    break
+                passing = candidate
+            settled = start if passing == start else min(start, max(passing * (1 + margin), passing + min_margin))
+            delays[step][key] = round(settled, 4)
+            if verbose:
+                print(f"   step {step:2} {key:<8} {start:.3f}s -> {delays[step][key]:.3f}s"
+                      + (f"  ({reason})" if not ok else ""))
+    return delays
+
+
+def profile_path(app_name: str, profile_dir: str = PROFILE_DIR) -> str:
+    """profiles/<process name>.json, with unsafe characters replaced."""
+    safe = re.sub(r'[^A-Za-z0-9._-]+', '_', app_name.lower()) or 'default'
+    return os.path.join(profile_dir, f"{safe}.json")
+
+
+def save_profile(app_name: str, plans: Dict[str, KeystrokePlan], delays: Dict[str, Dict[int, Dict[str, float]]],
+                 settings: Dict[str, Any], profile_dir: str = PROFILE_DIR) -> str:
+    """Write a calibration profile; returns its path."""
+    profile = {
+        'version': PROFILE_VERSION,
+        'app': app_name,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'calibration': settings,
+        'sequences': {
+            name: {
+                'descriptions': list(plans[name].descriptions),
+                'steps': {str(step): entry for step, entry in sorted(steps.items())},
+            } for name, steps in delays.items()
+        },
+    }
+    path = profile_path(app_name, profile_dir)
+    os.makedirs(profile_dir, exist_ok=True)
+    staging = f"{path}.tmp-{os.getpid()}"
+    with open(staging, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+    os.replace(staging, path)
+    return path
+
+
+def load_profile(path: str) -> Optional[Dict[str, Any]]:
+    """Read a profile (None if it does not exist)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return None
+    if profile.get('version') != PROFILE_VERSION:
+        raise ValueError(f"{path}: unsupported profile version {profile.get('version')}")
+    return profile
+
+
+def is_simulated(profile: Dict[str, Any]) -> bool:
+    """Whether the profile was calibrated against a stand-in rather than the real application."""
+    return profile.get('calibration', {}).get('probe') in SIMULATED_PROBES
+
+
+def apply_profile(plans: Dict[str, KeystrokePlan], profile: Dict[str, Any]) -> Tuple[Dict[str, KeystrokePlan], List[str]]:
+    """
+    Plans with the profile's delays.
+
+    A sequence is only changed if its step descriptions still match the ones
+    it was calibrated with; otherwise it keeps its compiled delays.
+
+    Returns:
+        (plans, names of the sequences that were tuned)
+    """
+    tuned = []
+    result = dict(plans)
+    for name, entry in profile.get('sequences', {}).items():
+        plan = plans.get(name)
+        if plan is None or list(plan.descriptions) != entry.get('descriptions'):
+            continue
+        delays = {int(step): values for step, values in entry['steps'].items()}
+        result[name] = plan.with_step_delays(delays)
+        tuned.append(name)
+    return result, tuned
+
+
+def calibrate(plans: Dict[str, KeystrokePlan], probe: DelayProbe, names: Optional[List[str]] = None,
+              confirm_trials: int = 4, fields: Dict[str, str] = SAMPLE_FIELDS,
+              **options) -> Dict[str, Dict[int, Dict[str, float]]]:
+    """
+    Calibrate several sequences and confirm each result with extra probe trials.
+
+    Args:
+        fields: Template values used while probing (the orders a real probe places)
+
+    Returns:
+        {sequence: step delays}; sequences whose result fails confirmation are left out
+    """
+    results = {}
+    for name in names or sorted(plans):
+        plan = plans[name]
+        print(f"\n🔧 {name}: {plan.nominal_duration(fields):.2f}s nominal")
+        delays = calibrate_plan(plan, probe, fields, **options)
+        tuned = plan.with_step_delays(delays)
+        trials = getattr(probe, 'trials', None)
+        if trials is not None:
+            probe.trials = trials * confirm_trials
+        try:
+            ok, reason = probe.check(tuned, fields)
+        finally:
+            if trials is not None:
+                probe.trials = trials
+        if not ok:
+            print(f"❌ {name}: tightened delays fail confirmation ({reason}); keeping the original delays")
+            continue
+        print(f"✅ {name}: {plan.nominal_duration(fields):.2f}s -> {tuned.nominal_duration(fields):.2f}s")
+        results[name] = delays
+    return results
+
+
+def find_app_window(app_name: str, pattern: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """First open window of the process (whose title contains pattern, if given)."""
+    from app_enumerator import ApplicationEnumerator  # psutil is only needed for the real probe
+    for app in ApplicationEnumerator().get_applications(max_age=0):
+        if app['name'].lower() == app_name.lower() and (
+                not pattern or pattern.lower() in app['window_title'].lower()):
+            return app
+    return None
+
+
+def parse_fields(values: Optional[List[str]]) -> Dict[str, str]:
+    """SAMPLE_FIELDS with KEY=VALUE overrides."""
+    fields = dict(SAMPLE_FIELDS)
+    for value in values or []:
+        key, sep, text = value.partition('=')
+        if not sep or key not in SAMPLE_FIELDS:
+            raise ValueError(f"bad --field '{value}' (expected one of {', '.join(SAMPLE_FIELDS)}=VALUE)")
+        fields[key] = text
+    return fields
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate per-application step delays")
+    parser.add_argument('--app', help="Target application process name, e.g. terminal.exe")
+    parser.add_argument('--show', metavar='APP', help="Print the saved profile of an application")
+    parser.add_argument('--sequences', help="Comma-separated commands (default: all)")
+    parser.add_argument('--sequence-file', help="Keystroke sequence JSON")
+    parser.add_argument('--probe', choices=('simulator', OrderLogProbe.name), default='simulator',
+                        help="simulator (default) or order_log: the real terminal, checked in order_logs.txt")
+    parser.add_argument('--field', action='append', metavar='KEY=VALUE',
+                        help="Trigger field used while probing (the real probe places these orders)")
+    parser.add_argument('--window', help="Title substring of the target window (order_log probe)")
+    parser.add_argument('--order-log', default=ORDER_LOG_PATH, help="order_logs.txt to watch (order_log probe)")
+    parser.add_argument('--timeout', type=float, default=10.0,
+                        help="Seconds to wait for the order acknowledgments (order_log probe)")
+    parser.add_argument('--yes', action='store_true', help="Confirm that the order_log probe places real orders")
+    parser.add_argument('--latency', action='append', metavar='KIND=SECONDS',
+                        help="Simulated terminal latency override")
+    parser.add_argument('--policy', choices=POLICIES, default='drop')
+    parser.add_argument('--jitter', type=float, default=0.2, help="Random latency stretch per keystroke")
+    parser.add_argument('--trials', type=int, help="Probe runs per candidate (default: 5 simulated, 1 real)")
+    parser.add_argument('--shrink', type=float, default=0.7, help="Factor applied per tightening attempt")
+    parser.add_argument('--margin', type=float, default=0.2, help="Relative safety margin")
+    parser.add_argument('--profile-dir', default=PROFILE_DIR)
+    args = parser.parse_args(argv)
+
+    if args.show:
+        profile = load_profile(profile_path(args.show, args.profile_dir))
+        if profile is None:
+            print(f"No profile for {args.show}")
+            return 1
+        print(json.dumps(profile, indent=2))
+        return 0
+    if not args.app:
+        parser.error("--app is required (or --show)")
+    if not 0 < args.shrink < 1:
+        parser.error("--shrink must be between 0 and 1")
+    try:
+        latencies = parse_latencies(args.latency)
+        fields = parse_fields(args.field)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.probe == OrderLogProbe.name and not args.yes:
+        parser.error("the order_log probe places real orders on every check; pass --yes to confirm")
+
+    plans = compile_sequences(load_sequence_specs(args.sequence_file))
+    names = [name.strip() for name in args.sequences.split(',')] if args.sequences else None
+    unknown = [name for name in names or [] if name not in plans]
+    if unknown:
+        parser.error(f"unknown sequences: {', '.join(unknown)}")
+
+    if args.probe == OrderLogProbe.name:
+        app_info = find_app_window(args.app, args.window)
+        if app_info is None:
+            print(f"❌ No open window of {args.app}" + (f" matching '{args.window}'" if args.window else ""))
+            return 1
+        print(f"🎯 Probing {app_info['display_name']}; watching {args.order_log}")
+        probe = OrderLogProbe(app_info, args.order_log, args.timeout, args.trials or 1)
+    else:
+        probe = SimulatorProbe(latencies, args.policy, args.jitter, args.trials or 5)
+    try:
+        results = calibrate(plans, probe, names, fields=fields, shrink=args.shrink, margin=args.margin)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    if not results:
+        print("Nothing calibrated; no profile written")
+        return 1
+    settings = dict(probe.settings(), shrink=args.shrink, margin=args.margin)
+    path = save_profile(args.app, plans, results, settings, args.profile_dir)
+    print(f"\n📝 Profile saved to {path}")
+    if probe.name in SIMULATED_PROBES:
+        print(f"⚠️ Calibrated on the simulator: not loaded automatically, pass --delay-profile {path} to use it")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""
+Input Backends
+Pluggable keyboard injection used by the keystroke plan executor.
+
+Every backend accepts batches of InputEvent objects through send_events():
+- SendInputBackend: Windows only, injects a whole batch with one SendInput call
+- PyAutoGUIBackend: portable fallback, one pyautogui call per event
+- RecordingBackend: no display needed, records every event with a timestamp
+  so sequences can be benchmarked and regression-tested on Linux
+"""
+
+import sys
+import time
+import threading
+from dataclasses import dataclass
+from typing import List, Tuple, Iterable
+
+DOWN = 'down'
+UP = 'up'
+CHAR = 'char'
+
+
+@dataclass(frozen=True)
+class InputEvent:
+    """A single key transition (down/up of a named key) or a typed character."""
+
+    key: str
+    action: str  # DOWN, UP or CHAR
+
+
+def chord_events(keys: Iterable[str]) -> List[InputEvent]:
+    """Press keys in order and release them in reverse, like pyautogui.hotkey."""
+    keys = list(keys)
+    return ([InputEvent(key, DOWN) for key in keys] +
+            [InputEvent(key, UP) for key in reversed(keys)])
+
+
+def text_events(text: str) -> List[InputEvent]:
+    """One CHAR event per character of text."""
+    return [InputEvent(char, CHAR) for char in text]
+
+
+class InputBackend:
+    """Base class for keyboard injection backends."""
+
+    name = 'base'
+
+    def send_events(self, events: List[InputEvent]):
+        """Inject a batch of events, in order, as one unit."""
+        raise NotImplementedError
+
+    def send_keys(self, keys: Tuple[str, ...]):
+        """Send one key or chord, e.g. ('shift', 'tab')."""
+        self.send_events(chord_events(keys))
+
+    def send_text(self, text: str):
+        """Type text with no delay between characters."""
+        self.send_events(text_events(text))
+
+
+class PyAutoGUIBackend(InputBackend):
+    """Portable backend on top of pyautogui, without its global PAUSE."""
+
+    name = 'pyautogui'
+
+    def __init__(self):
+        self.pyautogui = None  # Imported on first use so startup stays fast and other backends need no display
+
+    def send_events(self, events: List[InputEvent]):
+        if self.pyautogui is None:
+            import pyautogui
+            self.pyautogui = pyautogui
+        for event in events:
+            if event.action == DOWN:
+                self.pyautogui.keyDown(event.key, _pause=False)
+            elif event.action == UP:
+                self.pyautogui.keyUp(event.key, _pause=False)
+            else:
+                self.pyautogui.typewrite(event.key, _pause=False)
+
+
+# Windows virtual-key codes for the named keys used by the sequences
+VK_CODES = {
+    'backspace': 0x08, 'tab': 0x09, 'enter': 0x0D, 'return': 0x0D,
+    'shift': 0x10, 'ctrl': 0x11, 'alt': 0x12, 'pause': 0x13, 'capslock': 0x14,
+    'esc': 0x1B, 'escape': 0x1B, 'space': 0x20,
+    'pageup': 0x21, 'pagedown': 0x22, 'end': 0x23, 'home': 0x24,
+    'left': 0x25, 'up': 0x26, 'right': 0x27, 'down': 0x28,
+    'insert': 0x2D, 'delete': 0x2E, 'del': 0x2E,
+    'win': 0x5B, 'winleft': 0x5B, 'winright': 0x5C,
+    'shiftleft': 0xA0, 'shiftright': 0xA1, 'ctrlleft': 0xA2, 'ctrlright': 0xA3,
+    'altleft': 0xA4, 'altright': 0xA5,
+}
+VK_CODES.update({f'f{n}': 0x6F + n for n in range(1, 25)})
+VK_CODES.update({chr(c): c - 0x20 for c in range(ord('a'), ord('z') + 1)})
+VK_CODES.update({str(d): 0x30 + d for d in range(10)})
+
+# Keys that need KEYEVENTF_EXTENDEDKEY so they are not read as numpad keys
+EXTENDED_KEYS = {'pageup', 'pagedown', 'end', 'home', 'left', 'up', 'right', 'down',
+                 'insert', 'delete', 'del', 'win', 'winleft', 'winright',
+                 'ctrlright', 'altright'}
+
+KEYEVENTF_EXTENDEDKEY = 0x0001
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+INPUT_KEYBOARD = 1
+
+
+class SendInputBackend(InputBackend):
+    """Windows backend that injects each batch with a single SendInput call."""
+
+    name = 'sendinput'
+
+    def __init__(self):
+        if sys.platform != 'win32':
+            raise OSError("SendInputBackend is only available on Windows")
+        import ctypes
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [('wVk', ctypes.c_uint16), ('wScan', ctypes.c_uint16),
+                        ('dwFlags', ctypes.c_uint32), ('time', ctypes.c_uint32),
+                        ('dwExtraInfo', ctypes.c_size_t)]
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [('dx', ctypes.c_int32), ('dy', ctypes.c_int32),
+                        ('mouseData', ctypes.c_uint32), ('dwFlags', ctypes.c_uint32),
+                        ('time', ctypes.c_uint32), ('dwExtraInfo', ctypes.c_size_t)]
+
+        class _INPUTUNION(ctypes.Union):
+            _fields_ = [('ki', KEYBDINPUT), ('mi', MOUSEINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _fields_ = [('type', ctypes.c_uint32), ('u', _INPUTUNION)]
+
+        self.ctypes = ctypes
+        self.INPUT = INPUT
+        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self.user32.SendInput.argtypes = (ctypes.c_uint, ctypes.c_void_p, ctypes.c_int)
+        self.user32.SendInput.restype = ctypes.c_uint
+
+    def _fill(self, item, event: InputEvent):
+        """Fill one INPUT structure for event; returns item for chaining."""
+        item.type = INPUT_KEYBOARD
+        ki = item.u.ki
+        if event.action == CHAR:
+            ki.wVk = 0
+            ki.wScan = ord(event.key)
+            ki.dwFlags = KEYEVENTF_UNICODE
+        else:
+            key = event.key.lower()
+            vk = VK_CODES.get(key)
+            if vk is None:
+                raise ValueError(f"Unsupported key for SendInput: {event.key}")
+            ki.wVk = vk
+            ki.wScan = 0
+            ki.dwFlags = ((KEYEVENTF_KEYUP if event.action == UP else 0) |
+                          (KEYEVENTF_EXTENDEDKEY if key in EXTENDED_KEYS else 0))
+        ki.time = 0
+        ki.dwExtraInfo = 0
+
+    def send_events(self, events: List[InputEvent]):
+        # A CHAR expands to a unicode down/up pair
+        count = sum(2 if event.action == CHAR else 1 for event in events)
+        inputs = (self.INPUT * count)()
+        index = 0
+        for event in events:
+            self._fill(inputs[index], event)
+            index += 1
+            if event.action == CHAR:
+                self._fill(inputs[index], event)
+                inputs[index].u.ki.dwFlags |= KEYEVENTF_KEYUP
+                index += 1
+        sent = self.user32.SendInput(count, inputs, self.ctypes.sizeof(self.INPUT))
+        if sent != count:
+            raise OSError(f"SendInput injected {sent} of {count} events "
+                          f"(error {self.ctypes.get_last_error()})")
+
+
+@dataclass(frozen=True)
+class RecordedEvent:
+    """An InputEvent with the perf_counter() time it was sent and its batch number."""
+
+    timestamp: float
+    batch: int
+    key: str
+    action: str
+
+
+class RecordingBackend(InputBackend):
+    """Display-free backend that records the exact event stream."""
+
+    name = 'recording'
+
+    def __init__(self):
+        self.events: List[RecordedEvent] = []
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def send_events(self, events: List[InputEvent]):
+        now = time.perf_counter()
+        with self._lock:
+            self.batches += 1
+            self.events.extend(RecordedEvent(now, self.batches, event.key, event.action)
+                               for event in events)
+
+    def clear(self):
+        """Forget everything recorded so far."""
+        with self._lock:
+            self.events = []
+            self.batches = 0
+
+    def keystrokes(self) -> List[str]:
+        """
+        Summarize the stream as key presses, e.g. ['f8', '5', '0', '0', 'shift+tab'].
+
+        Chords are reported when their last key is released.
+        """
+        strokes = []
+        held = []
+        chord = []
+        for event in self.events:
+            if event.action == CHAR:
+                strokes.append(event.key)
+            elif event.action == DOWN:
+                held.append(event.key)
+                chord.append(event.key)
+            else:
+                if event.key in held:
+                    held.remove(event.key)
+                if not held and chord:
+                    strokes.append('+'.join(chord))
+                    chord = []
+        return strokes
+
+
+BACKENDS = {
+    SendInputBackend.name: SendInputBackend,
+    PyAutoGUIBackend.name: PyAutoGUIBackend,
+    RecordingBackend.name: RecordingBackend,
+}
+
+
+def create_backend(name: str = 'auto') -> InputBackend:
+    """
+    Create an input backend by name.
+
+    Args:
+        name: 'sendinput', 'pyautogui', 'recording' or 'auto'
+              ('auto' picks sendinput on Windows and pyautogui elsewhere)
+    """
+    if name == 'auto':
+        name = SendInputBackend.name if sys.platform == 'win32' else PyAutoGUIBackend.name
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown input backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
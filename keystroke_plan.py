@@ -0,0 +1,334 @@
+"""
+Keystroke Plans
+Declarative keystroke sequences for the trading terminal.
+
+Each sequence is plain data: a list of steps, where a step either sends a key
+(or chord) one or more times, or types a text template such as '{futScrip}'.
+Sequences compile once into a flat KeystrokePlan which PlanExecutor replays
+on an input backend with exact, per-action delays - no hidden
+pyautogui.PAUSE on top.
+
+Step fields:
+    desc      Text printed for the step
+    keys      List of keys pressed together, e.g. ['shift', 'tab']
+    text      Text template, formatted with the trigger fields
+    repeat    Number of times the keys are sent (default 1)
+    interval  Delay between typed characters (text steps, default 0.05)
+    delay     Delay after each key send, or after the whole text (default 0.2)
+"""
+
+import json
+import logging
+import time
+from dataclasses import dataclass, replace
+from typing import Optional, List, Dict, Tuple, Any
+
+from input_backends import InputBackend, chord_events, text_events
+from controller_logging import get_logger
+
+step_log = get_logger('steps')  # Muted unless step logging is enabled
+
+DEFAULT_DELAY = 0.2
+DEFAULT_INTERVAL = 0.05
+
+# Sequences keyed by trigger command; delays match the original hand-written steps
+DEFAULT_SEQUENCES = {
+    'TRIGGER_F4': [
+        {'desc': 'Sending F8', 'keys': ['f8'], 'delay': 0.3},
+        {'desc': 'Entering value 500', 'text': '500'},
+        {'desc': 'Pressing SHIFT+TAB 2 times', 'keys': ['shift', 'tab'], 'repeat': 2},
+        {'desc': 'Pressing F key', 'keys': ['f']},
+        {'desc': 'Pressing TAB 3 times', 'keys': ['tab'], 'repeat': 3},
+        {'desc': 'Entering futScrip: {futScrip}', 'text': '{futScrip}'},
+        {'desc': 'Pressing TAB', 'keys': ['tab']},
+        {'desc': 'Entering futScripBp: {futScripBp}', 'text': '{futScripBp}'},
+        {'desc': 'Pressing Enter 3 times', 'keys': ['enter'], 'repeat': 3},
+        {'desc': 'Sending F4', 'keys': ['f4'], 'delay': 0.3},
+        {'desc': 'Pressing BACKSPACE 3 times', 'keys': ['backspace'], 'repeat': 3},
+        {'desc': 'Entering value 500', 'text': '500'},
+        {'desc': 'Pressing TAB', 'keys': ['tab']},
+        {'desc': 'Entering scrip: {scrip}', 'text': '{scrip}'},
+        {'desc': 'Pressing SHIFT+TAB 3 times', 'keys': ['shift', 'tab'], 'repeat': 3},
+        {'desc': 'Pressing R key', 'keys': ['r']},
+        {'desc': 'Pressing TAB', 'keys': ['tab']},
+        {'desc': 'Pressing DOWN ARROW 2 times', 'keys': ['down'], 'repeat': 2},
+        {'desc': 'Pressing Enter 5 times (final step)', 'keys': ['enter'], 'repeat': 5},
+    ],
+    'TRIGGER_F5': [
+        {'desc': 'Sending F5', 'keys': ['f5'], 'delay': 0.3},
+        {'desc': 'Entering value 500', 'text': '500'},
+        {'desc': 'Pressing TAB', 'keys': ['tab']},
+        {'desc': 'Entering scrip: {scrip}', 'text': '{scrip}'},
+        {'desc': 'Pressing SHIFT+TAB 3 times', 'keys': ['shift', 'tab'], 'repeat': 3},
+        {'desc': 'Pressing R key', 'keys': ['r']},
+        {'desc': 'Pressing TAB', 'keys': ['tab']},
+        {'desc': 'Pressing DOWN ARROW 2 times', 'keys': ['down'], 'repeat': 2},
+        {'desc': 'Pressing Enter 5 times', 'keys': ['enter'], 'repeat': 5},
+        {'desc': 'Sending F4', 'keys': ['f4'], 'delay': 0.3},
+        {'desc': 'Pressing BACKSPACE 3 times', 'keys': ['backspace'], 'repeat': 3},
+        {'desc': 'Entering value 500', 'text': '500'},
+        {'desc': 'Pressing TAB', 'keys': ['tab']},
+        {'desc': 'Entering futScrip: {futScrip}', 'text': '{futScrip}'},
+        {'desc': 'Pressing SHIFT+TAB 3 times', 'keys': ['shift', 'tab'], 'repeat': 3},
+        {'desc': 'Pressing F key', 'keys': ['f']},
+        {'desc': 'Pressing TAB', 'keys': ['tab']},
+        {'desc': 'Pressing DOWN ARROW 2 times', 'keys': ['down'], 'repeat': 2},
+        {'desc': 'Pressing Enter 5 times (final step)', 'keys': ['enter'], 'repeat': 5},
+    ],
+}
+
+
+class PlanError(ValueError):
+    """Raised when a sequence spec is malformed."""
+
+
+@dataclass(frozen=True)
+class KeyAction:
+    """One compiled action: a key chord or a text template, then a delay."""
+
+    step: int  # 1-based index of the spec step this action came from
+    keys: Tuple[str, ...] = ()
+    text: Optional[str] = None  # Template; formatted with trigger fields at run time
+    interval: float = 0.0  # Delay between typed characters
+    delay: float = 0.0  # Delay after the action
+
+
+@dataclass(frozen=True)
+class KeystrokePlan:
+    """A compiled sequence: flat actions plus per-step descriptions."""
+
+    name: str
+    actions: Tuple[KeyAction, ...]
+    descriptions: Tuple[str, ...]
+
+    def scaled(self, factor: float) -> 'KeystrokePlan':
+        """Return a copy with every delay and typing interval multiplied by factor."""
+        actions = tuple(replace(action, delay=action.delay * factor,
+                                interval=action.interval * factor)
+                        for action in self.actions)
+        return replace(self, actions=actions)
+
+    def with_step_delays(self, delays: Dict[int, Dict[str, float]]) -> 'KeystrokePlan':
+        """
+        Return a copy with per-step delays replaced.
+
+        Args:
+            delays: {step: {'delay': seconds, 'interval': seconds}}; missing keys keep their value
+        """
+        actions = []
+        for action in self.actions:
+            override = delays.get(action.step)
+            if override:
+                action = replace(action, delay=override.get('delay', action.delay),
+                                 interval=override.get('interval', action.interval))
+            actions.append(action)
+        return replace(self, actions=tuple(actions))
+
+    def step_delays(self) -> Dict[int, Dict[str, float]]:
+        """{step: {'delay': ..., 'interval': ...}} as compiled (interval only for text steps)."""
+        delays = {}
+        for action in self.actions:
+            entry = {'delay': action.delay}
+            if action.text is not None:
+                entry['interval'] = action.interval
+            delays.setdefault(action.step, entry)
+        return delays
+
+    def nominal_duration(self, fields: Optional[Dict[str, str]] = None) -> float:
+        """Sum of every delay in the plan (excluding input injection cost)."""
+        total = 0.0
+        for action in self.actions:
+            total += action.delay
+            if action.text is not None:
+                text = action.text.format(**fields) if fields else action.text
+                total += action.interval * len(text)
+        return total
+
+
+@dataclass
+class StepTiming:
+    """Wall time spent in one spec step."""
+
+    step: int
+    description: str
+    started: float  # time.perf_counter() at step start
+    duration: float
+    late: float = 0.0  # Worst delay of a keystroke past its scheduled time in this step
+
+
+def compile_sequence(name: str, steps: List[Dict[str, Any]]) -> KeystrokePlan:
+    """
+    Compile a sequence spec into a flat KeystrokePlan.
+
+    Args:
+        name: Sequence name (usually the trigger command)
+        steps: List of step dicts (see module docstring)
+
+    Returns:
+        The compiled plan
+    """
+    actions = []
+    descriptions = []
+    for index, step in enumerate(steps, 1):
+        has_keys = 'keys' in step
+        has_text = 'text' in step
+        if has_keys == has_text:
+            raise PlanError(f"{name} step {index}: exactly one of 'keys' or 'text' is required")
+
+        descriptions.append(step.get('desc', f"Step {index}"))
+        delay = float(step.get('delay', DEFAULT_DELAY))
+
+        if has_keys:
+            keys = step['keys']
+            if isinstance(keys, str):
+                keys = [keys]
+            if not keys:
+                raise PlanError(f"{name} step {index}: 'keys' is empty")
+            repeat = int(step.get('repeat', 1))
+            if repeat < 1:
+                raise PlanError(f"{name} step {index}: 'repeat' must be at least 1")
+            action = KeyAction(step=index, keys=tuple(k.lower() for k in keys), delay=delay)
+            actions.extend([action] * repeat)
+        else:
+            actions.append(KeyAction(
+                step=index,
+                text=str(step['text']),
+                interval=float(step.get('interval', DEFAULT_INTERVAL)),
+                delay=delay,
+            ))
+
+    return KeystrokePlan(name=name, actions=tuple(actions), descriptions=tuple(descriptions))
+
+
+def load_sequence_specs(path: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Return the default sequence specs, overridden/extended by a JSON file.
+
+    Args:
+        path: Optional JSON file mapping command names to step lists
+    """
+    specs = dict(DEFAULT_SEQUENCES)
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        if not isinstance(overrides, dict):
+            raise PlanError(f"{path}: expected an object mapping commands to step lists")
+        specs.update(overrides)
+    return specs
+
+
+def compile_sequences(specs: Dict[str, List[Dict[str, Any]]]) -> Dict[str, KeystrokePlan]:
+    """Compile every spec in a {command: steps} mapping."""
+    return {name: compile_sequence(name, steps) for name, steps in specs.items()}
+
+
+def trigger_fields(trigger) -> Dict[str, str]:
+    """
+    Build template values from a TriggerRecord.
+
+    futScrip falls back to scrip and futScripBp to '0', as the original sequences did.
+    """
+    return {
+        'scrip': str(trigger.scrip),
+        'symbolKey': str(trigger.symbol_key),
+        'futScrip': str(trigger.fut_scrip if trigger.fut_scrip is not None else trigger.scrip),
+        'futScripBp': str(trigger.fut_scrip_bp if trigger.fut_scrip_bp is not None else '0'),
+    }
+
+
+def sleep_until(deadline: float) -> float:
+    """
+    Sleep until time.perf_counter() reaches deadline, spinning for the last ~2 ms.
+
+    Returns:
+        Seconds past the deadline when it returns (how late the next keystroke is)
+    """
+    late = time.perf_counter() - deadline
+    if late >= 0:
+        return late
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return -remaining
+        if remaining > 0.002:
+            time.sleep(remaining - 0.002)
+
+
+class PlanExecutor:
+    """Run compiled plans with exact per-action timing on an input backend.
+
+    Consecutive actions with no delay between them (and text typed with a
+    zero interval) are emitted as one batch through backend.send_events().
+    """
+
+    def __init__(self, backend: InputBackend, verbose: bool = True):
+        """
+        Args:
+            backend: Input backend used for every key event
+            verbose: Log each step as it starts (on the 'controller.steps' logger)
+        """
+        self.backend = backend
+        self.verbose = verbose
+
+    def run(self, plan: KeystrokePlan, fields: Dict[str, str]) -> List[StepTiming]:
+        """
+        Execute a plan.
+
+        Args:
+            plan: Compiled plan
+            fields: Template values (see trigger_fields)
+
+        Returns:
+            Timing of every step, in order
+        """
+        timings = []
+        batch = []
+        current_step = 0
+        step_start = 0.0
+        step_late = late = 0.0
+        deadline = time.perf_counter()
+
+        for action in plan.actions:
+            late = sleep_until(deadline) if not batch else 0.0
+            now = time.perf_counter()
+
+            if action.step != current_step:
+                if current_step:
+                    timings.append(StepTiming(current_step, plan.descriptions[current_step - 1],
+                                              step_start, now - step_start, step_late))
+                current_step = action.step
+                step_start = now
+                step_late = 0.0
+                if self.verbose and step_log.isEnabledFor(logging.INFO):
+                    step_log.info("Step %d: %s...", current_step,
+                                  plan.descriptions[current_step - 1].format(**fields))
+            step_late = max(step_late, late)
+
+            if action.text is None:
+                batch.extend(chord_events(action.keys))
+            elif action.interval <= 0:
+                batch.extend(text_events(action.text.format(**fields)))
+            else:
+                if batch:
+                    self.backend.send_events(batch)
+                    batch = []
+                char_deadline = time.perf_counter()
+                for char in action.text.format(**fields):
+                    step_late = max(step_late, sleep_until(char_deadline))
+                    self.backend.send_events(text_events(char))
+                    char_deadline = time.perf_counter() + action.interval
+                step_late = max(step_late, sleep_until(char_deadline))
+
+            if action.delay > 0 and batch:
+                self.backend.send_events(batch)
+                batch = []
+            deadline = time.perf_counter() + action.delay
+
+        if batch:
+            self.backend.send_events(batch)
+        if current_step:
+            step_late = max(step_late, sleep_until(deadline))
+            now = time.perf_counter()
+            timings.append(StepTiming(current_step, plan.descriptions[current_step - 1],
+                                      step_start, now - step_start, step_late))
+        return timings
@@ -0,0 +1,367 @@
+"""
+Market Data Columnar Store
+Convert feed.js's data/market-data-YYYY-MM-DD.json snapshots to memory-mappable columns.
+
+The JSON snapshots hold histogramData.majorValues / minorValues as lists of
+{key, value} objects (tens of thousands per day) that every tool had to parse
+in full. The columnar form of one day is a directory:
+
+    data/columnar/market-data-2025-12-30/
+        meta.json              symbol dictionary, session stats, source mtime/size
+        major_codes.npy        uint16 symbol code per value
+        major_values.npy       float64 values
+        major_offsets.npy      int64, values of symbol i are rows offsets[i]:offsets[i+1]
+        major_positions.npy    int32, arrival index of each row in the original list
+        minor_*.npy            same for minorValues
+
+Rows are grouped by symbol (stable, so arrival order is kept within a symbol),
+which makes every per-symbol series a contiguous slice. Arrays are opened with
+numpy's mmap_mode='r', so loading a day costs a few page faults and every
+accessor returns a read-only view rather than a copy.
+
+Usage:
+    python market_columnar.py                  # convert new/changed snapshots in data/
+    python market_columnar.py --force          # reconvert everything
+    python market_columnar.py --compare        # time JSON parsing vs columnar loading
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from typing import Optional, List, Dict, Any
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+COLUMNAR_DIRNAME = 'columnar'
+FORMAT_VERSION = 1
+SERIES = ('major', 'minor')
+SNAPSHOT_RE = re.compile(r'^market-data-(?P<date>\d{4}-\d{2}-\d{2})\.json$')
+COLUMNS = ('codes', 'values', 'offsets', 'positions')
+
+
+class ColumnarFormatError(Exception):
+    """Raised when a columnar snapshot is missing, truncated or from another format version."""
+
+
+class ColumnarSeries:
+    """One histogram series (majorValues or minorValues) of one day."""
+
+    def __init__(self, name: str, symbols: List[str], codes: np.ndarray, values: np.ndarray,
+                 offsets: np.ndarray, positions: np.ndarray):
+        self.name = name
+        self.symbols = symbols
+        self.codes = codes
+        self.values = values
+        self.offsets = offsets
+        self.positions = positions
+        self._index = {symbol: code for code, symbol in enumerate(symbols)}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def code_of(self, symbol: str) -> Optional[int]:
+        return self._index.get(symbol)
+
+    def row_range(self, symbol: str) -> Optional[tuple]:
+        """(start, stop) rows of symbol, or None if it has no values this day."""
+        code = self._index.get(symbol)
+        if code is None:
+            return None
+        return int(self.offsets[code]), int(self.offsets[code + 1])
+
+    def values_for(self, symbol: str) -> np.ndarray:
+        """Values of one symbol in arrival order (a zero-copy view; empty if unknown)."""
+        rows = self.row_range(symbol)
+        if rows is None:
+            return self.values[:0]
+        return self.values[rows[0]:rows[1]]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of values per symbol."""
+        sizes = np.diff(self.offsets)
+        return {symbol: int(size) for symbol, size in zip(self.symbols, sizes)}
+
+    def arrival_order(self) -> np.ndarray:
+        """Row indices that restore the original list order (values[arrival_order()])."""
+        order = np.empty(len(self.positions), dtype=np.int64)
+        order[self.positions] = np.arange(len(self.positions))
+        return order
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """The original [{key, value}, ...] list (for round-trip checks; copies everything)."""
+        order = self.arrival_order()
+        return [{'key': self.symbols[code], 'value': float(value)}
+                for code, value in zip(self.codes[order], self.values[order])]
+
+
+class MarketSnapshot:
+    """One day of market data backed by memory-mapped columns."""
+
+    def __init__(self, path: str, meta: Dict[str, Any], series: Dict[str, ColumnarSeries]):
+        self.path = path
+        self.meta = meta
+        self.series = series
+
+    @property
+    def date(self) -> str:
+        return self.meta['date']
+
+    @property
+    def symbols(self) -> List[str]:
+        return self.meta['symbols']
+
+    @property
+    def major(self) -> ColumnarSeries:
+        return self.series['major']
+
+    @property
+    def minor(self) -> ColumnarSeries:
+        return self.series['minor']
+
+
+def snapshot_date(path: str) -> Optional[str]:
+    """'YYYY-MM-DD' of a market-data JSON file name, or None if it is not one."""
+    match = SNAPSHOT_RE.match(os.path.basename(path))
+    return match.group('date') if match else None
+
+
+def columnar_path(json_path: str, columnar_dir: Optional[str] = None) -> str:
+    """Directory holding the columnar form of a JSON snapshot."""
+    if columnar_dir is None:
+        columnar_dir = os.path.join(os.path.dirname(os.path.abspath(json_path)), COLUMNAR_DIRNAME)
+    return os.path.join(columnar_dir, os.path.splitext(os.path.basename(json_path))[0])
+
+
+def source_signature(json_path: str) -> Dict[str, Any]:
+    stat = os.stat(json_path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def encode_series(entries: List[Dict[str, Any]], symbol_codes: Dict[str, int]) -> Dict[str, np.ndarray]:
+    """
+    Dictionary-encode and group a [{key, value}, ...] list.
+
+    Args:
+        entries: histogramData.majorValues or minorValues
+        symbol_codes: Shared symbol -> code dictionary of the snapshot
+
+    Returns:
+        The codes/values/offsets/positions columns
+    """
+    codes = np.fromiter((symbol_codes[entry['key']] for entry in entries), dtype=np.uint16,
+                        count=len(entries))
+    values = np.fromiter((entry['value'] for entry in entries), dtype=np.float64, count=len(entries))
+    positions = np.argsort(codes, kind='stable').astype(np.int32)
+    offsets = np.zeros(len(symbol_codes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=len(symbol_codes)), out=offsets[1:])
+    return {
+        'codes': codes[positions],
+        'values': values[positions],
+        'offsets': offsets,
+        'positions': positions,
+    }
+
+
+def is_current(json_path: str, columnar_dir: Optional[str] = None) -> bool:
+    """True if the columnar copy exists and was built from the JSON file as it is now."""
+    meta_path = os.path.join(columnar_path(json_path, columnar_dir), 'meta.json')
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get('version') == FORMAT_VERSION and meta.get('source') == source_signature(json_path)
+
+
+def convert_snapshot(json_path: str, columnar_dir: Optional[str] = None, force: bool = False) -> str:
+    """
+    Convert one market-data JSON file; skipped if the columnar copy is current.
+
+    The columns are written to a temporary directory and swapped in, so readers
+    never see a half-written snapshot.
+
+    Returns:
+        Path of the columnar snapshot directory
+    """
+    target = columnar_path(json_path, columnar_dir)
+    if not force and is_current(json_path, columnar_dir):
+        return target
+
+    signature = source_signature(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    histogram = data.get('histogramData') or {}
+    series_entries = {name: histogram.get(f'{name}Values') or [] for name in SERIES}
+
+    symbols = sorted({entry['key'] for entries in series_entries.values() for entry in entries})
+    if len(symbols) > np.iinfo(np.uint16).max:
+        raise ColumnarFormatError(f"{json_path}: too many symbols ({len(symbols)}) for uint16 codes")
+    symbol_codes = {symbol: code for code, symbol in enumerate(symbols)}
+
+    meta = {
+        'version': FORMAT_VERSION,
+        'date': snapshot_date(json_path),
+        'source': signature,
+        'symbols': symbols,
+        'timestamp': data.get('timestamp'),
+        'data_timestamp': histogram.get('dataTimestamp'),
+        'session_stats': data.get('sessionStats'),
+        'rows': {name: len(entries) for name, entries in series_entries.items()},
+    }
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    staging = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        for name, entries in series_entries.items():
+            for column, array in encode_series(entries, symbol_codes).items():
+                np.save(os.path.join(staging, f'{name}_{column}.npy'), array, allow_pickle=False)
+        with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(staging, target)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return target
+
+
+def list_snapshots(data_dir: str = DATA_DIR) -> List[str]:
+    """market-data JSON files in data_dir, oldest day first."""
+    if not os.path.isdir(data_dir):
+        return []
+    return [os.path.join(data_dir, name) for name in sorted(os.listdir(data_dir)) if SNAPSHOT_RE.match(name)]
+
+
+def convert_directory(data_dir: str = DATA_DIR, columnar_dir: Optional[str] = None,
+                      force: bool = False) -> Dict[str, bool]:
+    """
+    Convert every snapshot in data_dir.
+
+    Returns:
+        {json path: True if it was (re)converted, False if already current}
+    """
+    results = {}
+    for json_path in list_snapshots(data_dir):
+        stale = force or not is_current(json_path, columnar_dir)
+        if stale:
+            convert_snapshot(json_path, columnar_dir, force=True)
+        results[json_path] = stale
+    return results
+
+
+def load_snapshot(path: str, mmap: bool = True) -> MarketSnapshot:
+    """
+    Open a columnar snapshot directory.
+
+    Args:
+        path: Directory written by convert_snapshot()
+        mmap: Memory-map the columns (read-only) instead of reading them into memory
+
+    Raises:
+        ColumnarFormatError: If the directory is incomplete or from another format version
+    """
+    try:
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ColumnarFormatError(f"{path}: cannot read meta.json ({e})")
+    if meta.get('version') != FORMAT_VERSION:
+        raise ColumnarFormatError(f"{path}: format version {meta.get('version')}, expected {FORMAT_VERSION}")
+
+    series = {}
+    for name in SERIES:
+        columns = {}
+        for column in COLUMNS:
+            column_path = os.path.join(path, f'{name}_{column}.npy')
+            try:
+                columns[column] = np.load(column_path, mmap_mode='r' if mmap else None, allow_pickle=False)
+            except (OSError, ValueError) as e:
+                raise ColumnarFormatError(f"{column_path}: {e}")
+        if len(columns['values']) != meta['rows'][name]:
+            raise ColumnarFormatError(f"{path}: {name} has {len(columns['values'])} rows, "
+                                      f"meta.json says {meta['rows'][name]}")
+        series[name] = ColumnarSeries(name, meta['symbols'], **columns)
+    return MarketSnapshot(path, meta, series)
+
+
+def open_day(date: str, data_dir: str = DATA_DIR, convert: bool = True) -> MarketSnapshot:
+    """
+    Load one day ('YYYY-MM-DD'), converting its JSON snapshot first if needed.
+
+    Args:
+        date: Day to load
+        data_dir: Directory with the market-data JSON files
+        convert: Convert the JSON file if the columnar copy is missing or stale
+    """
+    json_path = os.path.join(data_dir, f'market-data-{date}.json')
+    if convert and os.path.exists(json_path):
+        return load_snapshot(convert_snapshot(json_path))
+    return load_snapshot(columnar_path(json_path))
+
+
+def compare_load_times(json_path: str, columnar_dir: Optional[str] = None,
+                       repeat: int = 5) -> Dict[str, float]:
+    """Best-of-repeat seconds for json.load vs load_snapshot plus every per-symbol lookup."""
+    target = convert_snapshot(json_path, columnar_dir)
+
+    def best(fn):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def from_json():
+        with open(json_path, 'r', encoding='utf-8') as f:
+            json.load(f)
+
+    def from_columns():
+        snapshot = load_snapshot(target)
+        for symbol in snapshot.symbols:
+            snapshot.major.values_for(symbol)
+            snapshot.minor.values_for(symbol)
+
+    return {'json_load_s': best(from_json), 'columnar_load_s': best(from_columns)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert market-data JSON snapshots to columnar form")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Directory with market-data-*.json files")
+    parser.add_argument('--output-dir', help="Columnar output directory (default: <data-dir>/columnar)")
+    parser.add_argument('--force', action='store_true', help="Reconvert even if the copies are current")
+    parser.add_argument('--compare', action='store_true', help="Time JSON parsing against columnar loading")
+    args = parser.parse_args(argv)
+
+    snapshots = list_snapshots(args.data_dir)
+    if not snapshots:
+        print(f"No market-data-*.json files in {args.data_dir}")
+        return 1
+
+    started = time.perf_counter()
+    results = convert_directory(args.data_dir, args.output_dir, args.force)
+    converted = sum(results.values())
+    print(f"📦 {converted} of {len(results)} snapshot(s) converted in {time.perf_counter() - started:.2f}s")
+
+    for json_path in snapshots:
+        snapshot = load_snapshot(columnar_path(json_path, args.output_dir))
+        line = (f"   {snapshot.date}: {len(snapshot.symbols)} symbols, "
+                f"{len(snapshot.major)} major / {len(snapshot.minor)} minor values")
+        if args.compare:
+            timings = compare_load_times(json_path, args.output_dir)
+            line += (f" | json.load {timings['json_load_s'] * 1000:.1f} ms, "
+                     f"columnar {timings['columnar_load_s'] * 1000:.2f} ms")
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
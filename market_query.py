@@ -0,0 +1,272 @@
+"""
+Market Data Query
+Indexed queries over every day in data/ without re-parsing the JSON snapshots.
+
+The index (data/columnar/index.json) records, for each market-data file, its
+mtime/size and the row range of every symbol in the columnar copy written by
+market_columnar. Opening a MarketQuery refreshes the index incrementally:
+new or changed files are converted and re-indexed, removed files dropped,
+untouched days are not read at all. Queries consult the index first, so days
+on which a symbol never traded are skipped without being opened.
+
+Rows are streamed day by day as ValueRow tuples; the value filter is applied
+with numpy on each symbol's memory-mapped slice.
+
+Usage:
+    python market_query.py NPL-JAN-NPL                           # all major values
+    python market_query.py NPL-JAN-NPL --series minor --from 2025-12-01 --to 2025-12-31
+    python market_query.py NPL-JAN-NPL --min 0.3 --limit 20
+    python market_query.py --summary                             # rows per symbol per day
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Optional, List, Dict, Any, Callable, Iterator, NamedTuple, Tuple
+
+import numpy as np
+
+from market_columnar import (
+    DATA_DIR, COLUMNAR_DIRNAME, SERIES, MarketSnapshot,
+    list_snapshots, snapshot_date, source_signature, convert_snapshot, load_snapshot,
+)
+
+INDEX_FILE = 'index.json'
+INDEX_VERSION = 1
+
+
+class ValueRow(NamedTuple):
+    """One recorded value."""
+
+    date: str
+    symbol: str
+    series: str  # 'major' or 'minor'
+    position: int  # Index in the day's original majorValues/minorValues list
+    value: float
+
+
+class MarketIndex:
+    """Persistent {date: {series: {symbol: (start, stop)}}} index over the columnar snapshots."""
+
+    def __init__(self, data_dir: str = DATA_DIR, columnar_dir: Optional[str] = None):
+        self.data_dir = data_dir
+        self.columnar_dir = columnar_dir or os.path.join(data_dir, COLUMNAR_DIRNAME)
+        self.path = os.path.join(self.columnar_dir, INDEX_FILE)
+        self.days: Dict[str, Dict[str, Any]] = {}
+        self.symbol_days: Dict[str, List[str]] = {}
+
+    def load(self):
+        """Read the index from disk (an unreadable or outdated index is treated as empty)."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.days = data.get('days', {}) if data.get('version') == INDEX_VERSION else {}
+        self._rebuild_symbol_days()
+
+    def save(self):
+        os.makedirs(self.columnar_dir, exist_ok=True)
+        staging = f"{self.path}.tmp-{os.getpid()}"
+        with open(staging, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'days': self.days}, f)
+        os.replace(staging, self.path)
+
+    def _rebuild_symbol_days(self):
+        symbol_days: Dict[str, set] = {}
+        for date, entry in self.days.items():
+            for ranges in entry['rows'].values():
+                for symbol in ranges:
+                    symbol_days.setdefault(symbol, set()).add(date)
+        self.symbol_days = {symbol: sorted(dates) for symbol, dates in symbol_days.items()}
+
+    def _index_day(self, json_path: str) -> Dict[str, Any]:
+        snapshot = load_snapshot(convert_snapshot(json_path, self.columnar_dir))
+        rows = {}
+        for name in SERIES:
+            offsets = snapshot.series[name].offsets
+            rows[name] = {symbol: [int(offsets[code]), int(offsets[code + 1])]
+                          for code, symbol in enumerate(snapshot.symbols)
+                          if offsets[code + 1] > offsets[code]}
+        return {
+            'file': os.path.basename(json_path),
+            'source': source_signature(json_path),
+            'columnar': os.path.basename(snapshot.path),
+            'rows': rows,
+        }
+
+    def update(self) -> Dict[str, List[str]]:
+        """
+        Bring the index in line with data_dir and save it if anything changed.
+
+        Returns:
+            {'added': [...], 'updated': [...], 'removed': [...]} dates
+        """
+        changes = {'added': [], 'updated': [], 'removed': []}
+        present = {}
+        for json_path in list_snapshots(self.data_dir):
+            date = snapshot_date(json_path)
+            present[date] = json_path
+            entry = self.days.get(date)
+            if entry is not None and entry['source'] == source_signature(json_path):
+                continue
+            self.days[date] = self._index_day(json_path)
+            changes['updated' if entry is not None else 'added'].append(date)
+        for date in sorted(set(self.days) - set(present)):
+            del self.days[date]
+            changes['removed'].append(date)
+
+        if any(changes.values()):
+            self.days = dict(sorted(self.days.items()))
+            self._rebuild_symbol_days()
+            self.save()
+        return changes
+
+    def dates(self, start: Optional[str] = None, end: Optional[str] = None,
+              symbol: Optional[str] = None) -> List[str]:
+        """Indexed days within [start, end], optionally only those where symbol has values."""
+        candidates = self.symbol_days.get(symbol, []) if symbol is not None else list(self.days)
+        return [date for date in candidates
+                if (start is None or date >= start) and (end is None or date <= end)]
+
+    def row_range(self, date: str, series: str, symbol: str) -> Optional[Tuple[int, int]]:
+        rows = self.days.get(date, {}).get('rows', {}).get(series, {}).get(symbol)
+        return tuple(rows) if rows else None
+
+
+class MarketQuery:
+    """Streaming queries across all indexed days."""
+
+    def __init__(self, data_dir: str = DATA_DIR, columnar_dir: Optional[str] = None, refresh: bool = True):
+        """
+        Args:
+            data_dir: Directory with the market-data JSON files
+            columnar_dir: Columnar store and index location (default: <data_dir>/columnar)
+            refresh: Update the index for new/changed files before querying
+        """
+        self.index = MarketIndex(data_dir, columnar_dir)
+        self.index.load()
+        self.last_changes = self.index.update() if refresh else {}
+        self._snapshots: Dict[str, MarketSnapshot] = {}
+
+    def refresh(self) -> Dict[str, List[str]]:
+        """Pick up files added or rewritten since the query was opened."""
+        self.last_changes = self.index.update()
+        for date in self.last_changes['updated'] + self.last_changes['removed']:
+            self._snapshots.pop(date, None)
+        return self.last_changes
+
+    def snapshot(self, date: str) -> MarketSnapshot:
+        """Memory-mapped snapshot of an indexed day (opened on first use)."""
+        snapshot = self._snapshots.get(date)
+        if snapshot is None:
+            entry = self.index.days[date]
+            snapshot = load_snapshot(os.path.join(self.index.columnar_dir, entry['columnar']))
+            self._snapshots[date] = snapshot
+        return snapshot
+
+    def symbols(self) -> List[str]:
+        return sorted(self.index.symbol_days)
+
+    def dates(self, start: Optional[str] = None, end: Optional[str] = None,
+              symbol: Optional[str] = None) -> List[str]:
+        return self.index.dates(start, end, symbol)
+
+    def iter_arrays(self, symbol: str, series: str = 'major', start: Optional[str] = None,
+                    end: Optional[str] = None) -> Iterator[Tuple[str, np.ndarray]]:
+        """Yield (date, values) per day for one symbol; values are zero-copy views in arrival order."""
+        if series not in SERIES:
+            raise ValueError(f"Unknown series '{series}' (choose from {', '.join(SERIES)})")
+        for date in self.index.dates(start, end, symbol):
+            rows = self.index.row_range(date, series, symbol)
+            if rows:
+                yield date, self.snapshot(date).series[series].values[rows[0]:rows[1]]
+
+    def iter_values(self, symbol: Optional[str] = None, series: str = 'major',
+                    start: Optional[str] = None, end: Optional[str] = None,
+                    min_value: Optional[float] = None, max_value: Optional[float] = None,
+                    predicate: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> Iterator[ValueRow]:
+        """
+        Stream matching values, oldest day first.
+
+        Args:
+            symbol: Only this symbol key (all symbols if None)
+            series: 'major' or 'minor'
+            start: First date to include ('YYYY-MM-DD')
+            end: Last date to include
+            min_value: Keep values >= min_value
+            max_value: Keep values <= max_value
+            predicate: Vectorized filter, called with a day's value array, returning a boolean mask
+
+        Yields:
+            ValueRow per match; within a day rows are grouped by symbol in arrival order
+        """
+        if series not in SERIES:
+            raise ValueError(f"Unknown series '{series}' (choose from {', '.join(SERIES)})")
+        symbols = [symbol] if symbol is not None else None
+        for date in self.index.dates(start, end, symbol):
+            column = self.snapshot(date).series[series]
+            for name in symbols or column.symbols:
+                rows = self.index.row_range(date, series, name)
+                if not rows:
+                    continue
+                values = column.values[rows[0]:rows[1]]
+                mask = np.ones(len(values), dtype=bool)
+                if min_value is not None:
+                    mask &= values >= min_value
+                if max_value is not None:
+                    mask &= values <= max_value
+                if predicate is not None:
+                    mask &= np.asarray(predicate(values), dtype=bool)
+                positions = column.positions[rows[0]:rows[1]]
+                for i in np.flatnonzero(mask):
+                    yield ValueRow(date, name, series, int(positions[i]), float(values[i]))
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """{symbol: {date: major row count}} straight from the index."""
+        result: Dict[str, Dict[str, int]] = {}
+        for date, entry in self.index.days.items():
+            for symbol, (start, stop) in entry['rows']['major'].items():
+                result.setdefault(symbol, {})[date] = stop - start
+        return dict(sorted(result.items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query recorded major/minor values across days")
+    parser.add_argument('symbol', nargs='?', help="Symbol key, e.g. NPL-JAN-NPL")
+    parser.add_argument('--series', choices=SERIES, default='major')
+    parser.add_argument('--from', dest='start', help="First date (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='end', help="Last date (YYYY-MM-DD)")
+    parser.add_argument('--min', dest='min_value', type=float, help="Only values >= this")
+    parser.add_argument('--max', dest='max_value', type=float, help="Only values <= this")
+    parser.add_argument('--limit', type=int, help="Stop after this many rows")
+    parser.add_argument('--summary', action='store_true', help="Rows per symbol per day")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    args = parser.parse_args(argv)
+
+    query = MarketQuery(args.data_dir)
+    changes = {kind: dates for kind, dates in query.last_changes.items() if dates}
+    if changes:
+        print(f"🗂️ Index updated: {changes}")
+
+    if args.summary or not args.symbol:
+        dates = query.dates()
+        print(f"{len(query.symbols())} symbols over {len(dates)} day(s): {', '.join(dates)}")
+        for symbol, per_day in query.summary().items():
+            print(f"   {symbol:24} " + ', '.join(f"{date}: {count}" for date, count in per_day.items()))
+        return 0
+
+    count = 0
+    for row in query.iter_values(args.symbol, args.series, args.start, args.end,
+                                 args.min_value, args.max_value):
+        print(f"{row.date}  #{row.position:<6} {row.symbol}  {row.series} {row.value:.4f}")
+        count += 1
+        if args.limit and count >= args.limit:
+            break
+    print(f"📊 {count} row(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -28,6 +28,126 @@ function sendTrigger() {
     });
 }
 
+/**
+ * Persistent client: keeps one connection open and pipelines triggers as
+ * newline-delimited JSON. Each trigger carries an id that is echoed back in
+ * its acknowledgment line.
+ */
+function createPersistentTrigger() {
+    const client = net.createConnection(9999, 'localhost');
+    const pending = new Map();
+    let nextId = 1;
+    let buffer = '';
+
+    client.setNoDelay(true);
+
+    client.on('data', (data) => {
+        buffer += data.toString();
+        let newline;
+        while ((newline = buffer.indexOf('\n')) >= 0) {
+            const line = buffer.slice(0, newline);
+            buffer = buffer.slice(newline + 1);
+            const ack = JSON.parse(line);
+            const resolve = pending.get(ack.id);
+            if (resolve) {
+                pending.delete(ack.id);
+                resolve(ack.status);
+            }
+        }
+    });
+
+    client.on('error', (err) => {
+        console.error('Connection error:', err.message);
+    });
+
+    return {
+        send(trigger) {
+            const id = nextId++;
+            return new Promise((resolve) => {
+                pending.set(id, resolve);
+                client.write(JSON.stringify({ id, ...trigger }) + '\n');
+            });
+        },
+        close() {
+            client.end();
+        }
+    };
+}
+
+/**
+ * Binary client: sends the symbol table once (HELLO), then writes 28-byte
+ * trigger frames that refer to symbols by index (see trigger_protocol.py).
+ * Acks are 8 bytes: uint32 id, uint8 status.
+ */
+const BINARY_COMMANDS = { TRIGGER_F4: 1, TRIGGER_F5: 2 };
+const BINARY_STATUSES = { 1: 'F4_TRIGGERED', 2: 'F5_TRIGGERED', 3: 'UNKNOWN_COMMAND', 4: 'QUEUE_FULL', 5: 'STALE', 6: 'CLOSED', 7: 'RATE_LIMITED', 8: 'GLOBAL_RATE_LIMITED', 9: 'CIRCUIT_OPEN', 255: 'REJECTED' };
+
+function createBinaryTrigger(symbols, priceDecimals = 2) {
+    const client = net.createConnection(9999, 'localhost');
+    const index = new Map(symbols.map((symbol, i) => [symbol.symbolKey, i]));
+    const pending = new Map();
+    let nextId = 1;
+    let buffer = Buffer.alloc(0);
+    let ready;
+    const negotiated = new Promise((resolve, reject) => { ready = { resolve, reject }; });
+    let binary = false;
+
+    client.setNoDelay(true);
+    client.on('connect', () => {
+        client.write(JSON.stringify({ command: 'HELLO', format: 'binary', priceDecimals, symbols }) + '\n');
+    });
+
+    client.on('data', (data) => {
+        buffer = Buffer.concat([buffer, data]);
+        if (!binary) {
+            const newline = buffer.indexOf('\n');
+            if (newline < 0) return;
+            const reply = JSON.parse(buffer.subarray(0, newline).toString());
+            buffer = buffer.subarray(newline + 1);
+            if (reply.status !== 'OK') return ready.reject(new Error(reply.error));
+            binary = true;
+            ready.resolve();
+        }
+        while (buffer.length >= 8) {
+            const id = buffer.readUInt32LE(0);
+            const status = BINARY_STATUSES[buffer.readUInt8(4)] || 'REJECTED';
+            buffer = buffer.subarray(8);
+            const resolve = pending.get(id);
+            if (resolve) {
+                pending.delete(id);
+                resolve(status);
+            }
+        }
+    });
+
+    client.on('error', (err) => {
+        console.error('Connection error:', err.message);
+    });
+
+    return {
+        ready: negotiated,
+        send(trigger) {
+            const id = nextId++;
+            const frame = Buffer.alloc(28);
+            const hasPrice = trigger.futScripBp !== undefined;
+            frame.writeUInt8(BINARY_COMMANDS[trigger.command], 0);
+            frame.writeUInt8(0x01 | (hasPrice ? 0x02 : 0) | 0x04, 1);
+            frame.writeUInt16LE(index.get(trigger.symbolKey), 2);
+            frame.writeUInt32LE(id, 4);
+            frame.writeBigInt64LE(BigInt(hasPrice ? Math.round(Number(trigger.futScripBp) * 10 ** priceDecimals) : 0), 8);
+            frame.writeBigInt64LE(BigInt(Date.now()), 16);
+            frame.writeInt16LE(trigger.priority || 0, 24);
+            return new Promise((resolve) => {
+                pending.set(id, resolve);
+                client.write(frame);
+            });
+        },
+        close() {
+            client.end();
+        }
+    };
+}
+
 // Example usage scenarios:
 
 // 1. Send trigger immediately
@@ -47,4 +167,23 @@ sendTrigger();
 // fs.watchFile(watchFile, (curr, prev) => {
 //     console.log('File changed, sending trigger...');
 //     sendTrigger();
-// });
\ No newline at end of file
+// });
+
+// 4. Pipeline several triggers over one long-lived connection (uncomment to use)
+// const trigger = createPersistentTrigger();
+// Promise.all([
+//     trigger.send({ command: 'TRIGGER_F4', symbolKey: 'NPL-JAN-NPL', scrip: 'NPL', futScrip: 'NPL-JAN', futScripBp: '87.5' }),
+//     trigger.send({ command: 'TRIGGER_F5', symbolKey: 'PPL-JAN-PPL', scrip: 'PPL', futScrip: 'PPL-JAN' })
+// ]).then((statuses) => {
+//     console.log('Acknowledged:', statuses);
+//     trigger.close();
+// });
+
+// 5. Binary frames: symbols are sent once, each trigger is a fixed 28-byte frame (uncomment to use)
+// const fast = createBinaryTrigger([{ symbolKey: 'NPL-JAN-NPL', scrip: 'NPL', futScrip: 'NPL-JAN' }]);
+// fast.ready
+//     .then(() => fast.send({ command: 'TRIGGER_F4', symbolKey: 'NPL-JAN-NPL', futScripBp: '87.5' }))
+//     .then((status) => {
+//         console.log('Acknowledged:', status);
+//         fast.close();
+//     });
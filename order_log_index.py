@@ -0,0 +1,373 @@
+"""
+Order Log Index
+Incrementally index order_logs.txt and analyze trigger -> order latency.
+
+feed.js appends to order_logs.txt all day. Instead of re-reading it, the
+index remembers the byte offset of the last complete line it parsed (plus
+the parser state: session date, clock, triggers awaiting confirmation) in a
+small JSON state file next to the log. Each update() reads only the bytes
+appended since; a rewritten or truncated log is detected and re-indexed
+from the top.
+
+The state also keeps a compact time index - one (time, byte offset) entry
+per checkpoint interval - so the raw lines around a given time can be read
+by seeking instead of scanning.
+
+Triggers are joined to the controller's own timings (the METRICS control
+command with "recent": true, or a saved copy of its reply) by symbol,
+command and wall-clock time.
+
+Usage:
+    python order_log_index.py                          # update the index and print the report
+    python order_log_index.py --follow                 # keep tailing, report each new trigger
+    python order_log_index.py --controller-port 9999   # join to a running controller's timings
+    python order_log_index.py --around "10:53:18"      # raw log lines near a time
+    python order_log_index.py --reset                  # forget the state and re-index
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import socket
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+
+from order_log_parser import OrderLogParser, LoggedTrigger
+from trigger_metrics import summarize
+
+LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'order_logs.txt')
+STATE_VERSION = 1
+HEAD_BYTES = 256  # Fingerprint of the file start, to notice a rewritten log
+READ_CHUNK = 1024 * 1024
+
+
+def head_fingerprint(path: str, length: int = HEAD_BYTES) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+class OrderLogIndex:
+    """Byte-offset tailer over an order log with persisted parser state."""
+
+    def __init__(self, log_path: str = LOG_PATH, state_path: Optional[str] = None,
+                 checkpoint_seconds: int = 60):
+        """
+        Args:
+            log_path: The order log written by feed.js
+            state_path: Where the index state is kept (default: <log_path>.index.json)
+            checkpoint_seconds: Spacing of the time index entries
+        """
+        self.log_path = log_path
+        self.state_path = state_path or f"{log_path}.index.json"
+        self.checkpoint_seconds = checkpoint_seconds
+        self.reset()
+
+    def reset(self):
+        """Forget everything indexed so far (the next update() starts at byte 0)."""
+        self.offset = 0
+        self.line_count = 0
+        self.head = None
+        self.head_length = 0
+        self.parser = OrderLogParser()
+        self.triggers: List[LoggedTrigger] = []
+        self.time_index: List[Tuple[str, int]] = []  # (ISO time, byte offset of a line at that time)
+
+    def load(self) -> bool:
+        """Restore persisted state; returns False (and starts empty) if there is none or it is unusable."""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') != STATE_VERSION:
+                raise ValueError(f"state version {state.get('version')}")
+            triggers = [LoggedTrigger.from_dict(data) for data in state['triggers']]
+            parser = OrderLogParser(
+                datetime.fromisoformat(state['session_start']) if state['session_start'] else None)
+            parser.current_time = (datetime.fromisoformat(state['current_time'])
+                                   if state['current_time'] else None)
+            parser.pending = {command: [triggers[i] for i in indices]
+                              for command, indices in state['pending'].items()}
+        except (OSError, ValueError, KeyError, TypeError, IndexError):
+            self.reset()
+            return False
+        self.offset = state['offset']
+        self.line_count = state['line_count']
+        self.head = state['head']
+        self.head_length = state['head_length']
+        self.parser = parser
+        self.triggers = triggers
+        self.time_index = [tuple(entry) for entry in state['time_index']]
+        return True
+
+    def save(self):
+        positions = {id(trigger): i for i, trigger in enumerate(self.triggers)}
+        state = {
+            'version': STATE_VERSION,
+            'log_path': os.path.abspath(self.log_path),
+            'offset': self.offset,
+            'line_count': self.line_count,
+            'head': self.head,
+            'head_length': self.head_length,
+            'session_start': self.parser.session_start.isoformat() if self.parser.session_start else None,
+            'current_time': self.parser.current_time.isoformat() if self.parser.current_time else None,
+            'pending': {command: [positions[id(trigger)] for trigger in pending]
+                        for command, pending in self.parser.pending.items()},
+            'triggers': [trigger.to_dict() for trigger in self.triggers],
+            'time_index': self.time_index,
+        }
+        staging = f"{self.state_path}.tmp-{os.getpid()}"
+        with open(staging, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(staging, self.state_path)
+
+    def _log_changed(self, size: int) -> bool:
+        """True if the log no longer continues the bytes already indexed."""
+        if size < self.offset:
+            return True
+        return self.offset > 0 and self.head != head_fingerprint(self.log_path, self.head_length)
+
+    def update(self) -> List[LoggedTrigger]:
+        """
+        Parse everything appended since the last update and persist the new state.
+
+        A trailing line without its newline is left for the next update.
+
+        Returns:
+            Triggers found in the new lines
+        """
+        if not os.path.exists(self.log_path):
+            return []
+        size = os.path.getsize(self.log_path)
+        if self._log_changed(size):
+            self.reset()
+        if size == self.offset:
+            return []
+
+        new_triggers = []
+        last_checkpoint = (datetime.fromisoformat(self.time_index[-1][0])
+                           if self.time_index else None)
+        with open(self.log_path, 'rb') as f:
+            if self.head is None:
+                head = f.read(HEAD_BYTES)
+                self.head, self.head_length = hashlib.sha1(head).hexdigest(), len(head)
+            f.seek(self.offset)
+            remainder = b''
+            while True:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    break
+                lines = (remainder + chunk).split(b'\n')
+                remainder = lines.pop()
+                for raw in lines:
+                    line_offset = self.offset
+                    self.offset += len(raw) + 1
+                    self.line_count += 1
+                    trigger = self.parser.feed_line(raw.decode('utf-8', errors='replace'), self.line_count)
+                    if trigger:
+                        self.triggers.append(trigger)
+                        new_triggers.append(trigger)
+                    now = self.parser.current_time
+                    if now and (last_checkpoint is None or
+                                (now - last_checkpoint).total_seconds() >= self.checkpoint_seconds):
+                        self.time_index.append((now.isoformat(), line_offset))
+                        last_checkpoint = now
+        self.save()
+        return new_triggers
+
+    def follow(self, interval: float = 1.0) -> Iterator[LoggedTrigger]:
+        """Yield triggers as they are appended (runs until interrupted)."""
+        while True:
+            yield from self.update()
+            time.sleep(interval)
+
+    def offset_at(self, when: datetime) -> int:
+        """Byte offset of the last checkpoint at or before when (0 if none)."""
+        times = [datetime.fromisoformat(entry[0]) for entry in self.time_index]
+        i = bisect.bisect_right(times, when)
+        return self.time_index[i - 1][1] if i else 0
+
+    def lines_between(self, start: datetime, end: datetime) -> Iterator[str]:
+        """Raw log lines from the checkpoint before start up to the first line after end."""
+        parser = OrderLogParser(self.parser.session_start)
+        with open(self.log_path, 'rb') as f:
+            f.seek(self.offset_at(start))
+            for raw in f:
+                line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+                parser.feed_line(line)
+                if parser.current_time and parser.current_time > end:
+                    break
+                if parser.current_time is None or parser.current_time >= start:
+                    yield line
+
+    def symbol_report(self) -> Dict[str, Dict[str, Any]]:
+        """Per-symbol trigger counts and confirmation latency summaries."""
+        report: Dict[str, Dict[str, Any]] = {}
+        for trigger in self.triggers:
+            entry = report.setdefault(trigger.symbol_key, {'TRIGGER_F4': 0, 'TRIGGER_F5': 0,
+                                                           'unconfirmed': 0, 'latencies': []})
+            entry[trigger.command] += 1
+            if trigger.confirmation_latency is None:
+                entry['unconfirmed'] += 1
+            else:
+                entry['latencies'].append(trigger.confirmation_latency)
+        for entry in report.values():
+            entry['confirmation_latency_s'] = summarize(entry.pop('latencies'))
+        return dict(sorted(report.items()))
+
+
+def fetch_controller_timings(port: int, host: str = 'localhost', timeout: float = 5.0) -> List[Dict[str, Any]]:
+    """Recent completed triggers from a running controller (METRICS with recent=true)."""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall((json.dumps({'command': 'METRICS', 'recent': True, 'id': 'order-log-index'}) + '\n')
+                     .encode('utf-8'))
+        data = b''
+        while not data.endswith(b'\n'):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data.decode('utf-8')).get('recent', [])
+
+
+def load_controller_timings(path: str) -> List[Dict[str, Any]]:
+    """Recent timelines from a saved METRICS reply or TriggerMetrics.to_json(include_recent=True)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('recent', [])
+
+
+def join_timings(triggers: List[LoggedTrigger], timings: List[Dict[str, Any]],
+                 tolerance: float = 2.0) -> List[Dict[str, Any]]:
+    """
+    Pair logged triggers with the controller timeline of the same trigger.
+
+    A timeline matches when symbol and command agree and the controller
+    received it within tolerance seconds of the logged (whole-second) time.
+    Each timeline is used at most once.
+
+    Returns:
+        One dict per logged trigger, with 'controller' set to the matched segments or None
+    """
+    candidates: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for timing in timings:
+        if timing.get('symbol_key') and timing.get('wall_received'):
+            candidates.setdefault((timing['symbol_key'], timing['command']), []).append(timing)
+
+    joined = []
+    for trigger in triggers:
+        logged_at = trigger.time.timestamp()
+        best = None
+        for timing in candidates.get((trigger.symbol_key, trigger.command), []):
+            # Log times are truncated to the second
+            skew = timing['wall_received'] - logged_at
+            if -tolerance <= skew <= tolerance + 1 and (best is None or abs(skew) < abs(best[0])):
+                best = (skew, timing)
+        if best:
+            candidates[(trigger.symbol_key, trigger.command)].remove(best[1])
+        joined.append({
+            'time': trigger.time.isoformat(),
+            'command': trigger.command,
+            'symbol_key': trigger.symbol_key,
+            'confirmation_latency_s': trigger.confirmation_latency,
+            'controller': dict(best[1]['segments'], receipt_skew=best[0]) if best else None,
+        })
+    return joined
+
+
+def parse_when(text: str, reference: Optional[datetime]) -> datetime:
+    """Accept an ISO timestamp or a time of day (h:mm:ss [AM/PM]) on the reference date."""
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in ('%I:%M:%S %p', '%H:%M:%S'):
+        try:
+            clock = datetime.strptime(text.strip(), fmt).time()
+            return datetime.combine((reference or datetime.now()).date(), clock)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized time '{text}'")
+
+
+def print_report(index: OrderLogIndex, joined: Optional[List[Dict[str, Any]]] = None):
+    print(f"\n📒 {len(index.triggers)} trigger(s) in {index.line_count} lines "
+          f"({index.offset} bytes indexed, {len(index.time_index)} time checkpoints)")
+    for symbol, entry in index.symbol_report().items():
+        latency = entry['confirmation_latency_s']
+        line = f"   {symbol:24} F4 {entry['TRIGGER_F4']:>3}  F5 {entry['TRIGGER_F5']:>3}"
+        if latency.get('count'):
+            line += f"  trigger->confirmation p50 {latency['p50']:.0f}s max {latency['max']:.0f}s"
+        if entry['unconfirmed']:
+            line += f"  ({entry['unconfirmed']} unconfirmed)"
+        print(line)
+    if joined is not None:
+        matched = [row for row in joined if row['controller']]
+        print(f"\n🔗 {len(matched)} of {len(joined)} trigger(s) matched to controller timings")
+        for row in matched:
+            segments = row['controller']
+            print(f"   {row['time']} {row['command']} {row['symbol_key']}: "
+                  f"controller total {segments.get('total', 0) * 1000:.1f} ms, "
+                  f"queue {segments.get('queue_wait', 0) * 1000:.1f} ms, "
+                  f"confirmation {row['confirmation_latency_s']}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally index order_logs.txt")
+    parser.add_argument('--log', default=LOG_PATH, help="Order log to index")
+    parser.add_argument('--state', help="Index state file (default: <log>.index.json)")
+    parser.add_argument('--reset', action='store_true', help="Discard the saved state and re-index")
+    parser.add_argument('--follow', action='store_true', help="Keep tailing the log")
+    parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls with --follow")
+    parser.add_argument('--controller-port', type=int, help="Join to a running controller's recent timings")
+    parser.add_argument('--metrics-file', help="Join to timings saved from a METRICS reply")
+    parser.add_argument('--tolerance', type=float, default=2.0, help="Join window in seconds")
+    parser.add_argument('--around', help="Print raw lines near this time (ISO or h:mm:ss AM)")
+    parser.add_argument('--window', type=float, default=5.0, help="Seconds either side for --around")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    index = OrderLogIndex(args.log, args.state)
+    if not args.reset:
+        index.load()
+    started = time.perf_counter()
+    previous = index.offset
+    new_triggers = index.update()
+    print(f"🗂️ Read {index.offset - previous} new bytes in {time.perf_counter() - started:.3f}s, "
+          f"{len(new_triggers)} new trigger(s)")
+
+    if args.around:
+        when = parse_when(args.around, index.parser.session_start)
+        for line in index.lines_between(when - timedelta(seconds=args.window),
+                                        when + timedelta(seconds=args.window)):
+            print(line)
+        return 0
+
+    timings = None
+    if args.controller_port:
+        timings = fetch_controller_timings(args.controller_port)
+    elif args.metrics_file:
+        timings = load_controller_timings(args.metrics_file)
+    joined = join_timings(index.triggers, timings, args.tolerance) if timings is not None else None
+    print_report(index, joined)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'symbols': index.symbol_report(), 'joined': joined,
+                       'triggers': [trigger.to_dict() for trigger in index.triggers]}, f, indent=2)
+        print(f"📝 Report saved to {args.output}")
+
+    if args.follow:
+        print("\n👀 Following the log... (Press Ctrl+C to stop)")
+        try:
+            for trigger in index.follow(args.interval):
+                print(f"   {trigger.time:%H:%M:%S} {trigger.command} {trigger.symbol_key} "
+                      f"{trigger.metric} {trigger.value:.4f}")
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Order Log Parser
+Turn feed.js's order_logs.txt into structured trigger records.
+
+order_logs.txt interleaves STOMP connection chatter, boxed order payloads and
+server responses. The lines that matter for replay are:
+
+    === Order Execution Logs - Session Started: 1/22/2026, 10:52:21 AM ===
+    [10:53:18 AM] 🔔 F4 TRIGGERED: NPL-JAN-NPL - Major: 0.3800 >= 0.3000
+    [10:53:19 AM] ✅ F4: BUY NPL (500@REG) + SHORT SELL NPL-JAN (500@FUT@88.01)
+    [12:09:02 PM] ✅ F5: BUY NPL-JAN (500@FUT) + SELL NPL (500@REG)
+
+orderManager.js also logs every order-service notification (the terminal's
+orders included, since notifications are per user); iter_order_responses()
+yields their JSON bodies:
+
+    [10:53:19 AM] 📨 ORDER RESPONSE RECEIVED:
+    [10:53:19 AM] Raw message body:
+    [10:53:19 AM] {"orderNo":"2581555","message":"New Buy order of 500 NPL in KSE ...","status":"ACKNOWLEDGED",...}
+
+Log lines carry only the time of day; the date comes from the session header
+and rolls over when the clock wraps past midnight.
+"""
+
+import json
+import re
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Iterable, Iterator
+
+SESSION_RE = re.compile(r'^=== Order Execution Logs - Session Started: (?P<started>.+?) ===')
+LINE_RE = re.compile(r'^\[(?P<clock>\d{1,2}:\d{2}:\d{2}\s*[AP]M)\]\s?(?P<text>.*)$')
+TRIGGER_RE = re.compile(
+    r'(?P<key>F[45]) TRIGGERED: (?P<symbol>\S+) - (?P<metric>Major|Minor): '
+    r'(?P<value>-?[\d.]+) (?P<op>>=|<=) (?P<threshold>-?[\d.]+)')
+F4_CONFIRM_RE = re.compile(
+    r'F4: BUY (?P<scrip>\S+) \(\d+@REG\) \+ SHORT SELL (?P<fut>\S+) \(\d+@FUT@(?P<bp>[^)]*)\)')
+F5_CONFIRM_RE = re.compile(
+    r'F5: BUY (?P<fut>\S+) \(\d+@FUT\) \+ SELL (?P<scrip>\S+) \(\d+@REG\)')
+RESPONSE_MARK = '📨 ORDER RESPONSE RECEIVED:'
+BODY_MARK = 'Raw message body:'
+
+
+@dataclass
+class LoggedTrigger:
+    """One F4/F5 trigger found in the order log."""
+
+    line_no: int
+    time: datetime
+    command: str  # TRIGGER_F4 or TRIGGER_F5
+    symbol_key: str
+    metric: str  # Major or Minor
+    value: float
+    threshold: float
+    scrip: str
+    fut_scrip: str
+    fut_scrip_bp: Optional[str] = None
+    confirmed_at: Optional[datetime] = None  # Time of the "✅ F4/F5:" confirmation line
+
+    def to_trigger(self) -> dict:
+        """The trigger package feed.js would have sent for this entry."""
+        trigger = {
+            'command': self.command,
+            'symbolKey': self.symbol_key,
+            'scrip': self.scrip,
+            'futScrip': self.fut_scrip,
+        }
+        if self.command == 'TRIGGER_F4':
+            trigger['futScripBp'] = self.fut_scrip_bp if self.fut_scrip_bp is not None else '0'
+        return trigger
+
+    @property
+    def confirmation_latency(self) -> Optional[float]:
+        """Seconds from the TRIGGERED line to its confirmation (log times have 1 s resolution)."""
+        if self.confirmed_at is None:
+            return None
+        return (self.confirmed_at - self.time).total_seconds()
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['time'] = self.time.isoformat()
+        data['confirmed_at'] = self.confirmed_at.isoformat() if self.confirmed_at else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LoggedTrigger':
+        data = dict(data)
+        data['time'] = datetime.fromisoformat(data['time'])
+        if data.get('confirmed_at'):
+            data['confirmed_at'] = datetime.fromisoformat(data['confirmed_at'])
+        return cls(**data)
+
+
+def split_symbol_key(symbol_key: str):
+    """
+    Derive (scrip, futScrip) from a symbol key such as 'NPL-JAN-NPL'.
+
+    The key is '<futScrip>-<scrip>' where futScrip itself contains a dash.
+    """
+    head, _, scrip = symbol_key.rpartition('-')
+    return (scrip, head) if head else (symbol_key, symbol_key)
+
+
+def parse_session_start(text: str) -> Optional[datetime]:
+    """Parse the session header timestamp, e.g. '1/22/2026, 10:52:21 AM'."""
+    for fmt in ('%m/%d/%Y, %I:%M:%S %p', '%d/%m/%Y, %H:%M:%S', '%m/%d/%Y, %H:%M:%S'):
+        try:
+            return datetime.strptime(text.strip(), fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class OrderLogParser:
+    """Stateful line parser; feed lines in order with feed_line()."""
+
+    def __init__(self, session_start: Optional[datetime] = None):
+        self.session_start = session_start
+        self.current_time: Optional[datetime] = None
+        self.pending = {}  # command -> triggers awaiting their confirmation line
+
+    def _resolve_time(self, clock: str) -> Optional[datetime]:
+        try:
+            clock_time = datetime.strptime(' '.join(clock.split()), '%I:%M:%S %p').time()
+        except ValueError:
+            return None
+        base = self.current_time or self.session_start or datetime(1970, 1, 1)
+        resolved = datetime.combine(base.date(), clock_time)
+        # Clock wrapped past midnight
+        if self.current_time and resolved < self.current_time - timedelta(hours=12):
+            resolved += timedelta(days=1)
+        self.current_time = resolved
+        return resolved
+
+    def feed_line(self, line: str, line_no: int = 0) -> Optional[LoggedTrigger]:
+        """
+        Parse one line.
+
+        Returns:
+            A new LoggedTrigger when the line is a TRIGGERED entry, otherwise None.
+            Confirmation lines update the matching trigger in place.
+        """
+        header = SESSION_RE.match(line)
+        if header:
+            self.session_start = parse_session_start(header.group('started'))
+            self.current_time = self.session_start
+            self.pending = {}
+            return None
+
+        match = LINE_RE.match(line.rstrip('\r\n'))
+        if not match:
+            return None
+        text = match.group('text')
+        if 'TRIGGERED' not in text and 'F4:' not in text and 'F5:' not in text:
+            return None
+        when = self._resolve_time(match.group('clock'))
+        if when is None:
+            return None
+
+        trigger_match = TRIGGER_RE.search(text)
+        if trigger_match:
+            scrip, fut_scrip = split_symbol_key(trigger_match.group('symbol'))
+            command = f"TRIGGER_{trigger_match.group('key')}"
+            trigger = LoggedTrigger(
+                line_no=line_no,
+                time=when,
+                command=command,
+                symbol_key=trigger_match.group('symbol'),
+                metric=trigger_match.group('metric'),
+                value=float(trigger_match.group('value')),
+                threshold=float(trigger_match.group('threshold')),
+                scrip=scrip,
+                fut_scrip=fut_scrip,
+            )
+            self.pending.setdefault(command, []).append(trigger)
+            return trigger
+
+        for command, pattern in (('TRIGGER_F4', F4_CONFIRM_RE), ('TRIGGER_F5', F5_CONFIRM_RE)):
+            confirm = pattern.search(text)
+            if confirm and self.pending.get(command):
+                trigger = self.pending[command].pop(0)
+                trigger.scrip = confirm.group('scrip')
+                trigger.fut_scrip = confirm.group('fut')
+                if command == 'TRIGGER_F4':
+                    trigger.fut_scrip_bp = confirm.group('bp')
+                trigger.confirmed_at = when
+                break
+        return None
+
+
+def iter_triggers(lines: Iterable[str]) -> Iterator[LoggedTrigger]:
+    """Yield triggers in log order (confirmation details are filled in as parsing continues)."""
+    parser = OrderLogParser()
+    for line_no, line in enumerate(lines, 1):
+        trigger = parser.feed_line(line, line_no)
+        if trigger:
+            yield trigger
+
+
+def parse_order_log(path: str) -> List[LoggedTrigger]:
+    """Parse a whole order log file into a list of triggers."""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return list(iter_triggers(f))
+
+
+def iter_order_responses(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Yield the JSON body of every order-service response block, in log order."""
+    in_block = expect_body = False
+    for line in lines:
+        match = LINE_RE.match(line.rstrip('\r\n'))
+        if not match:
+            continue
+        text = match.group('text').strip()
+        if text == RESPONSE_MARK:
+            in_block, expect_body = True, False
+        elif in_block and text == BODY_MARK:
+            expect_body = True
+        elif expect_body:
+            in_block = expect_body = False
+            try:
+                body = json.loads(text)
+            except ValueError:
+                continue  # Not JSON (orderManager logs those too)
+            if isinstance(body, dict):
+                yield body
@@ -0,0 +1,417 @@
+"""
+Shared-Memory Trigger Transport
+A same-host fast path: triggers are written into a shared-memory ring buffer
+instead of being sent over TCP loopback as JSON.
+
+The controller creates the ring (a multiprocessing.shared_memory block) and a
+receiver thread consumes it alongside the socket server. A producer attaches
+by name and writes fixed-size slots. There is one producer per ring
+(single-producer / single-consumer), so no atomic read-modify-write is needed:
+each side only ever writes its own counters.
+
+Layout (little-endian, C-compatible; all offsets in bytes):
+
+    struct ring_header {            /* 64 bytes at offset 0 */
+        char     magic[4];          /*  0  "TRGR" */
+        uint16_t version;           /*  4  1 */
+        uint16_t slot_size;         /*  6  160 */
+        uint32_t capacity;          /*  8  number of slots (power of two) */
+        uint32_t waiting;           /* 12  consumer sets 1 while blocked on the wakeup */
+        uint64_t write_seq;         /* 16  triggers published (producer writes) */
+        uint64_t read_seq;          /* 24  triggers consumed (consumer writes) */
+        uint64_t dropped;           /* 32  triggers refused because the ring was full (producer) */
+        uint64_t accepted;          /* 40  consumed and queued for execution (consumer) */
+        uint64_t rejected;          /* 48  consumed but refused, e.g. stale (consumer) */
+        uint8_t  reserved[8];
+    };
+
+    struct trigger_slot {           /* slot_size bytes at 64 + (seq % capacity) * slot_size */
+        uint64_t seq;               /*  0  seq + 1 of the trigger in the slot, written last */
+        uint8_t  command;           /*  8  1 = TRIGGER_F4, 2 = TRIGGER_F5 */
+        uint8_t  flags;             /*  9  bit 0: id set, bit 1: timestamp set */
+        int16_t  priority;          /* 10 */
+        uint32_t reserved;          /* 12 */
+        int64_t  timestamp_ms;      /* 16  producer epoch milliseconds */
+        uint64_t id;                /* 24  correlation id */
+        char     symbol_key[48];    /* 32  NUL-padded UTF-8 */
+        char     scrip[24];         /* 80 */
+        char     fut_scrip[32];     /* 104 */
+        char     fut_scrip_bp[16];  /* 136 */
+        uint8_t  pad[8];            /* 152 */
+    };
+
+Text fields are empty when the producer did not send them; the receiver then
+fills in 'Unknown', the same default decode_message applies to JSON triggers
+(so such triggers are never coalesced under an empty symbolKey).
+
+Producer protocol: if write_seq - read_seq == capacity the ring is full
+(increment dropped); otherwise fill slot write_seq % capacity, store its seq
+field, then store write_seq + 1, and if waiting is 1 signal the wakeup.
+
+Wakeup: consumers spin briefly, then set waiting, re-check write_seq and
+block on a named Win32 auto-reset event "<name>_wakeup" (Windows) or a FIFO
+at <tempdir>/<name>.wakeup (elsewhere) with a short timeout.
+
+Usage:
+    python app_controller.py --serve --shm tango_triggers
+
+    from shm_transport import ShmTriggerProducer
+    producer = ShmTriggerProducer('tango_triggers')
+    producer.send({'command': 'TRIGGER_F4', 'symbolKey': 'NPL-JAN-NPL', 'scrip': 'NPL',
+                   'futScrip': 'NPL-JAN', 'futScripBp': '1.25', 'timestamp': 1767225600000})
+"""
+
+import os
+import select
+import struct
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Dict, Any, Callable
+
+from trigger_protocol import COMMAND_CODES, COMMANDS_BY_CODE
+
+MAGIC = b'TRGR'
+VERSION = 1
+HEADER_SIZE = 64
+SLOT_SIZE = 160
+DEFAULT_NAME = 'tango_triggers'
+DEFAULT_CAPACITY = 1024
+
+FLAG_ID = 0x01
+FLAG_TIMESTAMP = 0x02
+
+HEADER = struct.Struct('<4sHHI')  # magic, version, slot_size, capacity
+U32 = struct.Struct('<I')
+U64 = struct.Struct('<Q')
+SLOT = struct.Struct('<QBBhIqQ48s24s32s16s8x')
+assert SLOT.size == SLOT_SIZE
+
+# Header field offsets
+OFF_WAITING = 12
+OFF_WRITE_SEQ = 16
+OFF_READ_SEQ = 24
+OFF_DROPPED = 32
+OFF_ACCEPTED = 40
+OFF_REJECTED = 48
+
+SPIN_SECONDS = 0.0002  # Poll this long before blocking on the wakeup
+WAIT_TIMEOUT = 0.01  # Bounds the wakeup race window and keeps stop() responsive
+
+
+class RingError(Exception):
+    """Raised when a ring cannot be created or does not have the expected layout."""
+
+
+_created = set()  # Rings owned by this process (still registered with its resource tracker)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing block without letting this process's resource tracker unlink it."""
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == 'posix' and name not in _created:
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+    return shm
+
+
+def _text(value: bytes) -> str:
+    """Decode a NUL-padded text field; an empty field was not sent."""
+    return value.split(b'\0', 1)[0].decode('utf-8', errors='replace') or 'Unknown'
+
+
+def _field(value: Any, size: int) -> bytes:
+    """Encode a text field; a missing (None) value is left empty."""
+    if value is None:
+        return b''
+    data = str(value).encode('utf-8')
+    if len(data) > size:
+        raise ValueError(f"'{value}' does not fit in {size} bytes")
+    return data
+
+
+class Win32EventWakeup:
+    """Named auto-reset event; the consumer creates it, producers open it."""
+
+    def __init__(self, name: str, create: bool):
+        import ctypes
+        from ctypes import wintypes
+        self._kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self._kernel32.CreateEventW.restype = wintypes.HANDLE
+        self._kernel32.OpenEventW.restype = wintypes.HANDLE
+        event_name = f"{name}_wakeup"
+        if create:
+            self.handle = self._kernel32.CreateEventW(None, False, False, event_name)
+        else:
+            self.handle = self._kernel32.OpenEventW(0x0002, False, event_name)  # EVENT_MODIFY_STATE
+        if not self.handle:
+            raise RingError(f"Cannot open wakeup event {event_name} (error {ctypes.get_last_error()})")
+
+    def signal(self):
+        self._kernel32.SetEvent(self.handle)
+
+    def wait(self, timeout: float):
+        self._kernel32.WaitForSingleObject(self.handle, int(timeout * 1000))
+
+    def close(self):
+        if self.handle:
+            self._kernel32.CloseHandle(self.handle)
+            self.handle = None
+
+
+class FifoWakeup:
+    """Named pipe; the consumer owns it (holding a write end so it never sees EOF)."""
+
+    def __init__(self, name: str, create: bool):
+        self.path = os.path.join(tempfile.gettempdir(), f"{name}.wakeup")
+        self.create = create
+        self._fd = None
+        self._keepalive = None
+        if create:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            os.mkfifo(self.path, 0o600)
+            self._fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+            self._keepalive = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+
+    def signal(self):
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+            os.write(self._fd, b'\x01')
+        except BlockingIOError:
+            pass  # Pipe already full of wakeups
+        except OSError:
+            self._fd = None  # Consumer gone or restarted; reopen next time
+
+    def wait(self, timeout: float):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if readable:
+            try:
+                os.read(self._fd, 4096)
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        for fd in (self._fd, self._keepalive):
+            if fd is not None:
+                os.close(fd)
+        self._fd = self._keepalive = None
+        if self.create and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def create_wakeup(name: str, create: bool):
+    if sys.platform == 'win32':
+        return Win32EventWakeup(name, create)
+    return FifoWakeup(name, create)
+
+
+class TriggerRing:
+    """One shared-memory ring: header plus capacity fixed-size slots."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.buf = shm.buf
+        magic, version, slot_size, capacity = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION or slot_size != SLOT_SIZE:
+            raise RingError(f"{shm.name}: not a version {VERSION} trigger ring")
+        self.capacity = capacity
+        self.mask = capacity - 1
+
+    @classmethod
+    def create(cls, name: str = DEFAULT_NAME, capacity: int = DEFAULT_CAPACITY) -> 'TriggerRing':
+        """Create (or replace) a ring; capacity is rounded up to a power of two."""
+        capacity = 1 << max(0, capacity - 1).bit_length()
+        size = HEADER_SIZE + capacity * SLOT_SIZE
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _created.add(name)
+        shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        HEADER.pack_into(shm.buf, 0, MAGIC, VERSION, SLOT_SIZE, capacity)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str = DEFAULT_NAME) -> 'TriggerRing':
+        try:
+            return cls(_attach(name), owner=False)
+        except FileNotFoundError:
+            raise RingError(f"No trigger ring named '{name}' (is the controller running with it enabled?)")
+
+    def counter(self, offset: int) -> int:
+        return U64.unpack_from(self.buf, offset)[0]
+
+    def set_counter(self, offset: int, value: int):
+        U64.pack_into(self.buf, offset, value)
+
+    def stats(self) -> Dict[str, int]:
+        write_seq = self.counter(OFF_WRITE_SEQ)
+        read_seq = self.counter(OFF_READ_SEQ)
+        return {
+            'capacity': self.capacity,
+            'published': write_seq,
+            'consumed': read_seq,
+            'pending': write_seq - read_seq,
+            'dropped': self.counter(OFF_DROPPED),
+            'accepted': self.counter(OFF_ACCEPTED),
+            'rejected': self.counter(OFF_REJECTED),
+        }
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+            _created.discard(self.shm.name.lstrip('/'))
+
+
+class ShmTriggerProducer:
+    """Writes triggers into a ring created by the controller (one producer per ring)."""
+
+    def __init__(self, name: str = DEFAULT_NAME):
+        self.ring = TriggerRing.attach(name)
+        self.wakeup = create_wakeup(name, create=False)
+
+    def send(self, trigger: Dict[str, Any]) -> bool:
+        """
+        Publish one trigger package (same keys as the JSON protocol).
+
+        Returns:
+            False if the ring was full and the trigger was dropped
+        """
+        ring = self.ring
+        buf = ring.buf
+        write_seq = ring.counter(OFF_WRITE_SEQ)
+        if write_seq - ring.counter(OFF_READ_SEQ) >= ring.capacity:
+            ring.set_counter(OFF_DROPPED, ring.counter(OFF_DROPPED) + 1)
+            return False
+
+        flags = 0
+        correlation_id = trigger.get('id')
+        if correlation_id is not None:
+            flags |= FLAG_ID
+        timestamp = trigger.get('timestamp')
+        if isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool):
+            flags |= FLAG_TIMESTAMP
+        offset = HEADER_SIZE + (write_seq & ring.mask) * SLOT_SIZE
+        SLOT.pack_into(
+            buf, offset, 0, COMMAND_CODES[trigger['command']], flags, int(trigger.get('priority', 0)), 0,
+            int(timestamp) if flags & FLAG_TIMESTAMP else 0,
+            int(correlation_id) if flags & FLAG_ID else 0,
+            _field(trigger.get('symbolKey'), 48), _field(trigger.get('scrip'), 24),
+            _field(trigger.get('futScrip'), 32), _field(trigger.get('futScripBp'), 16))
+        # Commit: slot sequence first, then the published count
+        U64.pack_into(buf, offset, write_seq + 1)
+        ring.set_counter(OFF_WRITE_SEQ, write_seq + 1)
+        if U32.unpack_from(buf, OFF_WAITING)[0]:
+            self.wakeup.signal()
+        return True
+
+    def close(self):
+        self.wakeup.close()
+        self.ring.close()
+
+
+class ShmTriggerReceiver:
+    """Consumes a ring on its own thread and hands each trigger to a callback."""
+
+    def __init__(self, submit: Callable[[Dict[str, Any], float], Optional[str]],
+                 name: str = DEFAULT_NAME, capacity: int = DEFAULT_CAPACITY):
+        """
+        Args:
+            submit: Called with (trigger_info, received_at); returns a rejection reason or None
+            name: Shared-memory name producers attach to
+            capacity: Number of slots
+        """
+        self.name = name
+        self.ring = TriggerRing.create(name, capacity)
+        self.wakeup = create_wakeup(name, create=True)
+        self.submit = submit
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='shm-receiver', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.wakeup.close()
+        self.ring.close()
+
+    def _wait_for(self, read_seq: int):
+        """Spin briefly, then block on the wakeup until write_seq moves past read_seq."""
+        ring = self.ring
+        spin_until = time.perf_counter() + SPIN_SECONDS
+        while ring.counter(OFF_WRITE_SEQ) == read_seq:
+            if self._stopped.is_set():
+                return
+            if time.perf_counter() < spin_until:
+                time.sleep(0)  # Yield the GIL to the controller's other threads
+                continue
+            U32.pack_into(ring.buf, OFF_WAITING, 1)
+            if ring.counter(OFF_WRITE_SEQ) == read_seq:
+                self.wakeup.wait(WAIT_TIMEOUT)
+            U32.pack_into(ring.buf, OFF_WAITING, 0)
+
+    def decode(self, offset: int) -> Dict[str, Any]:
+        """
+        Trigger info (as decode_message would produce) from the slot at offset.
+
+        A new dict is built for every trigger: it outlives the slot in the queue,
+        so it cannot be reused the way the slot is.
+        """
+        (_, code, flags, priority, _, timestamp_ms, correlation_id,
+         symbol_key, scrip, fut_scrip, fut_scrip_bp) = SLOT.unpack_from(self.ring.buf, offset)
+        command = COMMANDS_BY_CODE.get(code, 'UNKNOWN')
+        info = {
+            'command': command,
+            'symbolKey': _text(symbol_key),
+            'scrip': _text(scrip),
+            'futScrip': _text(fut_scrip),
+            'timestamp': timestamp_ms if flags & FLAG_TIMESTAMP else 'Unknown',
+        }
+        if command == 'TRIGGER_F4':
+            info['futScripBp'] = _text(fut_scrip_bp)
+        if flags & FLAG_ID:
+            info['id'] = correlation_id
+        if priority:
+            info['priority'] = priority
+        return info
+
+    def _run(self):
+        ring = self.ring
+        while not self._stopped.is_set():
+            read_seq = ring.counter(OFF_READ_SEQ)
+            if ring.counter(OFF_WRITE_SEQ) == read_seq:
+                self._wait_for(read_seq)
+                continue
+            received_at = time.perf_counter()
+            offset = HEADER_SIZE + (read_seq & ring.mask) * SLOT_SIZE
+            if U64.unpack_from(ring.buf, offset)[0] != read_seq + 1:
+                continue  # Slot not committed yet
+            info = self.decode(offset)
+            ring.set_counter(OFF_READ_SEQ, read_seq + 1)  # Slot may be reused from here on
+            if info['command'] not in COMMAND_CODES:
+                ring.set_counter(OFF_REJECTED, ring.counter(OFF_REJECTED) + 1)
+                continue
+            rejection = self.submit(info, received_at)
+            counter = OFF_REJECTED if rejection else OFF_ACCEPTED
+            ring.set_counter(counter, ring.counter(counter) + 1)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.ring.stats(), name=self.name)
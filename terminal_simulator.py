@@ -0,0 +1,406 @@
+"""
+Terminal Simulator
+A deterministic stand-in for the trading terminal's order-entry form, runnable on Linux.
+
+The simulator consumes the keystroke stream the controller produces - either
+a RecordingBackend capture or the nominal timeline of compiled plans - and
+replays it through a state machine of the order form:
+
+    idle --F4/F5/F8--> form opening --(open latency)--> form ready
+    form ready: one focused field (TAB / SHIFT+TAB), text fields with a cursor
+    (typing, BACKSPACE, LEFT/RIGHT/HOME/END), the market selector (R/F), the
+    order-type list (UP/DOWN); ENTER puts the order on the submit queue and
+    closes the form, ESC closes it without an order
+    idle: the model's idle keys (the ENTERs that dismiss confirmations) do
+    nothing; any other key is stray and fails the check
+
+The forms, fields and remembered values come from FORM_MODEL, which
+describes what the F4/F5 sequences imply about the terminal: F4/F5/F8 open a
+form on its volume field, fields are ordered market, order type, volume,
+symbol, price, and the further ENTERs after a submit dismiss the terminal's
+confirmations. No form is assumed to keep a value between openings; list a
+field under 'persistent' only once the terminal is confirmed to remember it.
+
+Every keystroke keeps the terminal busy for a configurable latency. One that
+arrives while it is still busy is flagged as early: with the 'drop' policy
+it is lost (the worst case, keys landing outside the form), with 'queue' it
+is handled once the terminal is ready.
+
+Orders are compared with a reference run on an ideal terminal (no latency),
+so shorter delays can be checked for producing exactly the same orders.
+
+Usage:
+    python terminal_simulator.py                          # both sequences, production delays
+    python terminal_simulator.py --delay-scale 0.5        # every delay halved
+    python terminal_simulator.py --latency open=0.4 --latency focus=0.05 --policy queue
+"""
+
+import argparse
+import random
+import sys
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Tuple, Iterable, Any
+
+from input_backends import InputEvent, RecordedEvent, DOWN, CHAR, chord_events, text_events
+from keystroke_plan import KeystrokePlan, load_sequence_specs, compile_sequences
+
+# What the F4/F5 sequences imply about the terminal's order-entry forms
+FORM_MODEL = {
+    'forms': {'f4': 'buy', 'f5': 'sell', 'f8': 'short_sell'},  # Key that opens each form
+    'fields': ['market', 'order_type', 'volume', 'symbol', 'price'],  # TAB order
+    'initial_focus': 'volume',
+    'persistent': {},  # Fields a form keeps from its previous opening, e.g. {'f4': ['volume']}
+    'selectors': {'market': {'r': 'REG', 'f': 'FUT'}},  # Fields set by a single letter
+    'lists': ['order_type'],  # Fields moved with UP/DOWN from their default entry
+    'idle_keys': ['enter'],  # Harmless with no form open (dismiss the terminal's confirmations)
+}
+
+# Seconds the terminal needs to process each kind of keystroke
+DEFAULT_LATENCIES = {
+    'open': 0.25,  # F-key until the form accepts input
+    'focus': 0.03,  # TAB / SHIFT+TAB
+    'char': 0.005,  # Typed character, BACKSPACE or cursor movement
+    'select': 0.08,  # Market selector letter (reloads the symbol list)
+    'list': 0.03,  # UP / DOWN in the order-type list
+    'submit': 0.15,  # ENTER until the order is queued and the form closed
+    'other': 0.01,
+}
+POLICIES = ('drop', 'queue')
+MODIFIERS = {'shift', 'ctrl', 'alt', 'shiftleft', 'shiftright', 'ctrlleft', 'ctrlright',
+             'altleft', 'altright'}
+CURSOR_KEYS = {'left', 'right', 'home', 'end'}
+# Contents of remembered fields before the form was ever submitted
+DEFAULT_PREFILL = {'f4': {'volume': '100'}}
+
+TimedEvent = Tuple[float, InputEvent, int]  # (seconds, event, plan step or 0)
+
+
+@dataclass(frozen=True)
+class Order:
+    """One order the terminal accepted."""
+
+    mode: str  # Form name: buy, sell or short_sell
+    values: Tuple[Tuple[str, Any], ...]  # (field, value) in TAB order
+    submitted_at: float
+    step: int
+
+    def get(self, name: str) -> Any:
+        return dict(self.values).get(name)
+
+    def describe(self) -> str:
+        return f"{self.mode:<10} " + ' '.join(f"{name}={value}" for name, value in self.values)
+
+
+@dataclass(frozen=True)
+class EarlyKey:
+    """A keystroke that arrived before the terminal was ready for it."""
+
+    at: float
+    key: str
+    step: int
+    early_by: float  # Seconds before the terminal became ready
+    dropped: bool
+
+
+@dataclass
+class SimulationReport:
+    """What the terminal did with a keystroke stream."""
+
+    orders: List[Order] = field(default_factory=list)
+    early: List[EarlyKey] = field(default_factory=list)
+    stray: int = 0  # Keystrokes with no form open, other than idle keys
+    idle: int = 0  # Idle keys (e.g. ENTER dismissing a confirmation) with no form open
+    unhandled: int = 0  # Keys the form ignores
+    finished_at: float = 0.0  # When the terminal went idle after the last keystroke
+
+    def same_orders(self, reference: 'SimulationReport') -> bool:
+        """Whether the accepted orders match the reference's, ignoring timing."""
+        return [(o.mode, o.values) for o in self.orders] == [(o.mode, o.values) for o in reference.orders]
+
+
+class TerminalSimulator:
+    """State machine of the order-entry form, driven by timestamped key events."""
+
+    def __init__(self, latencies: Optional[Dict[str, float]] = None, policy: str = 'drop',
+                 model: Dict[str, Any] = FORM_MODEL, prefill: Optional[Dict[str, Dict[str, str]]] = None,
+                 jitter: float = 0.0, seed: Optional[int] = 0):
+        """
+        Args:
+            latencies: Overrides for DEFAULT_LATENCIES
+            policy: 'drop' or 'queue' keystrokes that arrive early
+            model: Forms and fields (see FORM_MODEL)
+            prefill: Remembered field contents before the first submission, per form key
+            jitter: Each latency is stretched by a random 0..jitter fraction (a loaded machine)
+            seed: Seed for the jitter, so runs stay reproducible
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy '{policy}' (choose from {', '.join(POLICIES)})")
+        unknown = set(latencies or {}) - set(DEFAULT_LATENCIES)
+        if unknown:
+            raise ValueError(f"Unknown latencies: {', '.join(sorted(unknown))}")
+        self.latencies = dict(DEFAULT_LATENCIES, **(latencies or {}))
+        self.policy = policy
+        self.model = model
+        self.fields = model['fields']
+        self.prefill = DEFAULT_PREFILL if prefill is None else prefill
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        """Close every form and forget remembered values and orders."""
+        self.form: Optional[str] = None
+        self.focus = 0
+        self.values: Dict[str, Any] = {}
+        self.cursor = 0
+        self.remembered: Dict[str, Dict[str, Any]] = {}
+        self.held: List[str] = []
+        self.ready_at = 0.0
+        self.report = SimulationReport()
+
+    def kind(self, name: str) -> str:
+        if name in self.model['selectors']:
+            return 'selector'
+        if name in self.model['lists']:
+            return 'list'
+        return 'text'
+
+    def feed(self, at: float, event: InputEvent, step: int = 0):
+        """Process one key event sent at time at (seconds)."""
+        if event.action == CHAR:
+            self._keystroke(at, event.key, step)
+        elif event.key in MODIFIERS:
+            # Modifier state belongs to the keyboard, not the form
+            if event.action == DOWN:
+                self.held.append(event.key)
+            elif event.key in self.held:
+                self.held.remove(event.key)
+        elif event.action == DOWN:
+            shift = any(key.startswith('shift') for key in self.held)
+            self._keystroke(at, f"shift+{event.key}" if shift else event.key, step)
+
+    def feed_all(self, events: Iterable[TimedEvent]) -> SimulationReport:
+        for at, event, step in events:
+            self.feed(at, event, step)
+        return self.report
+
+    def _keystroke(self, at: float, key: str, step: int):
+        if at < self.ready_at:
+            dropped = self.policy == 'drop'
+            self.report.early.append(EarlyKey(at, key, step, self.ready_at - at, dropped))
+            if dropped:
+                return
+            at = self.ready_at
+        latency = self.latencies[self._handle(key.lower() if len(key) > 1 else key, at, step)]
+        if self.jitter:
+            latency *= 1 + self.random.random() * self.jitter
+        self.ready_at = at + latency
+        self.report.finished_at = max(self.report.finished_at, self.ready_at)
+
+    def _open(self, key: str):
+        if self.form is not None:
+            self._close()
+        self.form = key
+        self.focus = self.fields.index(self.model['initial_focus'])
+        self.values = {}
+        for name in self.fields:
+            kind = self.kind(name)
+            self.values[name] = 0 if kind == 'list' else (None if kind == 'selector' else '')
+        for name in self.model['persistent'].get(key, ()):
+            remembered = self.remembered.get(key, {})
+            self.values[name] = remembered.get(name, self.prefill.get(key, {}).get(name, self.values[name]))
+        self._enter_field()
+
+    def _close(self):
+        kept = self.model['persistent'].get(self.form, ())
+        self.remembered[self.form] = {name: self.values[name] for name in kept}
+        self.form = None
+
+    def _enter_field(self):
+        value = self.values[self.fields[self.focus]]
+        self.cursor = len(value) if isinstance(value, str) else 0
+
+    def _handle(self, key: str, at: float, step: int) -> str:
+        """Apply one keystroke; returns the latency class it costs."""
+        if key in self.model['forms']:
+            self._open(key)
+            return 'open'
+        if self.form is None:
+            if key in self.model['idle_keys']:
+                self.report.idle += 1
+            else:
+                self.report.stray += 1
+            return 'other'
+
+        name = self.fields[self.focus]
+        kind = self.kind(name)
+        value = self.values[name]
+        if key in ('tab', 'shift+tab'):
+            self.focus = (self.focus + (1 if key == 'tab' else -1)) % len(self.fields)
+            self._enter_field()
+            return 'focus'
+        if key == 'enter':
+            order = Order(self.model['forms'][self.form],
+                          tuple((field_name, self.values[field_name]) for field_name in self.fields),
+                          at, step)
+            self.report.orders.append(order)
+            self._close()
+            return 'submit'
+        if key == 'esc':
+            self._close()
+            return 'other'
+        if kind == 'list' and key in ('up', 'down'):
+            self.values[name] = max(0, value + (1 if key == 'down' else -1))
+            return 'list'
+        if kind == 'text' and (key == 'backspace' or key in CURSOR_KEYS):
+            if key == 'backspace' and self.cursor:
+                self.values[name] = value[:self.cursor - 1] + value[self.cursor:]
+                self.cursor -= 1
+            elif key in CURSOR_KEYS:
+                self.cursor = {'left': max(0, self.cursor - 1), 'right': min(len(value), self.cursor + 1),
+                               'home': 0, 'end': len(value)}[key]
+            return 'char'
+        if len(key) == 1:
+            if kind == 'selector':
+                choice = self.model['selectors'][name].get(key.lower())
+                if choice is None:
+                    self.report.unhandled += 1
+                    return 'other'
+                self.values[name] = choice
+                return 'select'
+            if kind == 'text':
+                self.values[name] = value[:self.cursor] + key + value[self.cursor:]
+                self.cursor += 1
+                return 'char'
+        self.report.unhandled += 1
+        return 'other'
+
+
+def plan_timeline(plan: KeystrokePlan, fields: Dict[str, str], start: float = 0.0) -> Tuple[List[TimedEvent], float]:
+    """
+    The nominal send time of every event of a plan, as PlanExecutor schedules them.
+
+    Returns:
+        (events, time the plan finishes)
+    """
+    events = []
+    now = start
+    for action in plan.actions:
+        if action.text is None:
+            events.extend((now, event, action.step) for event in chord_events(action.keys))
+        else:
+            text = action.text.format(**fields)
+            if action.interval <= 0:
+                events.extend((now, event, action.step) for event in text_events(text))
+            else:
+                for char in text:
+                    events.extend((now, event, action.step) for event in text_events(char))
+                    now += action.interval
+        now += action.delay
+    return events, now
+
+
+def recording_timeline(events: List[RecordedEvent]) -> List[TimedEvent]:
+    """A RecordingBackend capture as timed events (seconds from the first event)."""
+    if not events:
+        return []
+    origin = events[0].timestamp
+    return [(event.timestamp - origin, InputEvent(event.key, event.action), 0) for event in events]
+
+
+def simulate_plans(runs: List[Tuple[KeystrokePlan, Dict[str, str]]], latencies: Optional[Dict[str, float]] = None,
+                   policy: str = 'drop', gap: float = 0.0, jitter: float = 0.0,
+                   seed: Optional[int] = 0) -> SimulationReport:
+    """Play several plans back-to-back (gap seconds apart) on a fresh simulated terminal."""
+    simulator = TerminalSimulator(latencies, policy, jitter=jitter, seed=seed)
+    now = 0.0
+    for plan, fields in runs:
+        events, now = plan_timeline(plan, fields, now)
+        simulator.feed_all(events)
+        now += gap
+    return simulator.report
+
+
+def reference_orders(runs: List[Tuple[KeystrokePlan, Dict[str, str]]]) -> SimulationReport:
+    """The orders an ideal terminal (no latency) produces for the plans."""
+    return simulate_plans(runs, {name: 0.0 for name in DEFAULT_LATENCIES}, 'queue')
+
+
+def check_plans(runs: List[Tuple[KeystrokePlan, Dict[str, str]]], latencies: Optional[Dict[str, float]] = None,
+                policy: str = 'drop', jitter: float = 0.0,
+                seed: Optional[int] = 0) -> Tuple[bool, SimulationReport, SimulationReport]:
+    """
+    Whether the plans still produce the reference orders on a terminal with these latencies.
+
+    Returns:
+        (ok, simulated report, reference report); ok also requires no early
+        and no stray keystrokes
+    """
+    report = simulate_plans(runs, latencies, policy, jitter=jitter, seed=seed)
+    reference = reference_orders(runs)
+    return report.same_orders(reference) and not report.early and not report.stray, report, reference
+
+
+def parse_latencies(values: List[str]) -> Dict[str, float]:
+    """['open=0.3', 'focus=0.05'] -> {'open': 0.3, 'focus': 0.05}"""
+    latencies = {}
+    for value in values or []:
+        name, _, seconds = value.partition('=')
+        if name not in DEFAULT_LATENCIES or not seconds:
+            raise ValueError(f"Expected <{'|'.join(DEFAULT_LATENCIES)}>=<seconds>, got '{value}'")
+        latencies[name] = float(seconds)
+    return latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay keystroke sequences on a simulated trading terminal")
+    parser.add_argument('--triggers', default='F4,F5', help="Comma-separated commands played back-to-back")
+    parser.add_argument('--delay-scale', type=float, default=1.0, help="Multiplier for every sequence delay")
+    parser.add_argument('--latency', action='append', metavar='KIND=SECONDS',
+                        help=f"Terminal latency override ({', '.join(DEFAULT_LATENCIES)})")
+    parser.add_argument('--policy', choices=POLICIES, default='drop', help="What happens to early keystrokes")
+    parser.add_argument('--sequence-file', help="Keystroke sequence JSON")
+    args = parser.parse_args(argv)
+    try:
+        latencies = parse_latencies(args.latency)
+    except ValueError as e:
+        parser.error(str(e))
+
+    sequences = compile_sequences(load_sequence_specs(args.sequence_file))
+    runs = []
+    for index, name in enumerate(part.strip().upper() for part in args.triggers.split(',') if part.strip()):
+        plan = sequences.get(f"TRIGGER_{name}")
+        if plan is None:
+            parser.error(f"no sequence for TRIGGER_{name}")
+        fields = {'scrip': f"SYM{index}", 'symbolKey': f"SYM{index}-JAN-SYM{index}",
+                  'futScrip': f"SYM{index}-JAN", 'futScripBp': '100.25'}
+        runs.append((plan.scaled(args.delay_scale), fields))
+
+    ok, report, reference = check_plans(runs, latencies, args.policy)
+    print(f"🖥️ Simulated terminal ({args.policy} early keys), delay scale {args.delay_scale:g}, "
+          f"idle after {report.finished_at:.2f}s")
+    for order in report.orders:
+        print(f"   📝 {order.submitted_at:7.3f}s  {order.describe()}")
+    for early in report.early[:20]:
+        print(f"   ⚠️ {early.at:7.3f}s  '{early.key}' {early.early_by * 1000:.0f} ms early "
+              f"(step {early.step}){' - dropped' if early.dropped else ''}")
+    if len(report.early) > 20:
+        print(f"   ... {len(report.early) - 20} more early keystrokes")
+    if report.stray:
+        print(f"   ⚠️ {report.stray} stray keystroke(s) with no form open")
+    if ok:
+        print(f"✅ {len(report.orders)} order(s) match the reference")
+        return 0
+    if not report.same_orders(reference):
+        print("❌ Orders differ from the reference:")
+        for order in reference.orders:
+            print(f"   expected  {order.describe()}")
+    elif report.early:
+        print("❌ Orders match, but keystrokes arrived before the terminal was ready")
+    else:
+        print("❌ Orders match, but keystrokes were sent with no form open")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
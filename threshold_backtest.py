@@ -0,0 +1,315 @@
+"""
+Threshold Backtest
+Replay feed.js's trigger rule over the recorded major/minor series for whole parameter grids.
+
+feed.js fires F4 while an armed symbol's Major is >= its stored target and
+F5 while Minor is <= its target, once per qualifying update until the
+configured depth (remaining triggers) is used up. This module evaluates that
+rule for every (threshold, depth) pair at once:
+
+- Every (day, symbol) series from data/ becomes a row of a NaN-padded matrix
+- A block of thresholds is compared against the whole matrix in one numpy
+  operation; a cumulative sum gives each qualifying update its rank, so the
+  triggers for depth d are the updates ranked 1..d
+- Triggers are then pushed through a FIFO executor model (one sequence at a
+  time, sequence_latency seconds each, stale after max_age seconds in queue)
+  to count how many the controller could actually have executed
+
+The snapshots keep arrival order but no per-update timestamps, so time is
+modelled as tick_seconds per update of a symbol, and the executor model runs
+per symbol (how updates of different symbols interleave is not recorded).
+
+Usage:
+    python threshold_backtest.py                                   # F4 and F5, default grids
+    python threshold_backtest.py --series major --thresholds 0.1:1.5:0.01 --depths 1-10
+    python threshold_backtest.py --tick-seconds 0.5 --max-age 5 --top 20
+"""
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, Tuple
+
+import numpy as np
+
+from keystroke_plan import load_sequence_specs, compile_sequences
+from market_query import MarketQuery
+
+# Series -> (command, comparison) as implemented in feed.js
+RULES = {
+    'major': ('TRIGGER_F4', '>='),
+    'minor': ('TRIGGER_F5', '<='),
+}
+MAX_BLOCK_ELEMENTS = 20_000_000  # Cap on thresholds x rows x updates per comparison block
+
+
+@dataclass
+class SeriesMatrix:
+    """Recorded series as a NaN-padded (rows x max_updates) matrix."""
+
+    series: str
+    values: np.ndarray
+    lengths: np.ndarray
+    labels: List[Tuple[str, str]]  # (date, symbol) per row
+
+
+@dataclass
+class BacktestResult:
+    """Per-(threshold, depth) outcomes; 2-D arrays are indexed [threshold, depth]."""
+
+    series: str
+    command: str
+    thresholds: np.ndarray
+    depths: np.ndarray
+    sequence_latency: float
+    tick_seconds: float
+    max_age: Optional[float]
+    triggers: np.ndarray  # Total triggers over all rows
+    handled: np.ndarray  # Triggers the executor model could have executed
+    rows_triggered: np.ndarray  # (day, symbol) rows with at least one trigger
+    mean_spacing_s: np.ndarray  # Mean gap between consecutive triggers of a row (NaN if none)
+    min_spacing_s: np.ndarray
+    row_triggers: np.ndarray = field(repr=False, default=None)  # [threshold, depth, row]
+    labels: List[Tuple[str, str]] = field(repr=False, default_factory=list)
+
+    @property
+    def combinations(self) -> int:
+        return len(self.thresholds) * len(self.depths)
+
+    def table(self) -> List[Dict[str, Any]]:
+        """One dict per (threshold, depth) combination."""
+        rows = []
+        for i, threshold in enumerate(self.thresholds):
+            for j, depth in enumerate(self.depths):
+                triggers = int(self.triggers[i, j])
+                rows.append({
+                    'threshold': round(float(threshold), 6),
+                    'depth': int(depth),
+                    'triggers': triggers,
+                    'handled': int(self.handled[i, j]),
+                    'handled_ratio': (float(self.handled[i, j]) / triggers) if triggers else None,
+                    'rows_triggered': int(self.rows_triggered[i, j]),
+                    'mean_spacing_s': _finite_or_none(self.mean_spacing_s[i, j]),
+                    'min_spacing_s': _finite_or_none(self.min_spacing_s[i, j]),
+                })
+        return rows
+
+
+def _finite_or_none(value) -> Optional[float]:
+    return float(value) if np.isfinite(value) else None
+
+
+def load_matrix(query: MarketQuery, series: str, start: Optional[str] = None, end: Optional[str] = None,
+                symbols: Optional[List[str]] = None) -> SeriesMatrix:
+    """Collect every (day, symbol) series into one padded matrix."""
+    arrays = []
+    labels = []
+    for symbol in symbols or query.symbols():
+        for date, values in query.iter_arrays(symbol, series, start, end):
+            arrays.append(values)
+            labels.append((date, symbol))
+    lengths = np.array([len(values) for values in arrays], dtype=np.int64)
+    matrix = np.full((len(arrays), int(lengths.max()) if len(arrays) else 0), np.nan)
+    for row, values in enumerate(arrays):
+        matrix[row, :len(values)] = values
+    return SeriesMatrix(series, matrix, lengths, labels)
+
+
+def sequence_latencies(sequence_file: Optional[str] = None) -> Dict[str, float]:
+    """Nominal duration of each configured keystroke sequence, in seconds."""
+    plans = compile_sequences(load_sequence_specs(sequence_file))
+    return {command: plan.nominal_duration() for command, plan in plans.items()}
+
+
+def parse_range(text: str, integer: bool = False) -> np.ndarray:
+    """'a:b:step' (inclusive), 'a-b' for integers, or a comma-separated list."""
+    if ':' in text:
+        start, stop, step = (float(part) for part in text.split(':'))
+        values = np.arange(start, stop + step / 2, step)
+        return np.round(values, 10)
+    if integer and '-' in text and ',' not in text:
+        low, high = (int(part) for part in text.split('-'))
+        return np.arange(low, high + 1)
+    return np.array([int(part) if integer else float(part) for part in text.split(',')])
+
+
+def default_thresholds(matrix: SeriesMatrix, count: int = 200) -> np.ndarray:
+    """Evenly spaced thresholds between the 1st and 99th percentile of the recorded values."""
+    finite = matrix.values[np.isfinite(matrix.values)]
+    if not len(finite):
+        return np.array([0.0])
+    low, high = np.percentile(finite, [1, 99])
+    return np.round(np.linspace(low, high, count), 4)
+
+
+def backtest(matrix: SeriesMatrix, thresholds: np.ndarray, depths: np.ndarray,
+             sequence_latency: float, tick_seconds: float = 1.0,
+             max_age: Optional[float] = 5.0) -> BacktestResult:
+    """
+    Evaluate the trigger rule for every threshold x depth combination.
+
+    Args:
+        matrix: Recorded series from load_matrix()
+        thresholds: Target values to test
+        depths: Trigger depths (remaining-trigger counts) to test
+        sequence_latency: Seconds the controller spends executing one trigger
+        tick_seconds: Assumed time between consecutive updates of one symbol
+        max_age: Triggers waiting longer than this are dropped as stale (None = never)
+
+    Returns:
+        BacktestResult with one cell per combination
+    """
+    command, comparison = RULES[matrix.series]
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    depths = np.asarray(depths, dtype=np.int64)
+    max_depth = int(depths.max())
+    n_thresholds = len(thresholds)
+    n_rows, n_updates = matrix.values.shape
+
+    # Trigger time (seconds) of the r-th trigger per [threshold, row, r]; inf where there is none
+    trigger_times = np.full((n_thresholds, n_rows, max_depth), np.inf)
+    block = max(1, MAX_BLOCK_ELEMENTS // max(1, n_rows * n_updates))
+    for first in range(0, n_thresholds, block):
+        chunk = thresholds[first:first + block, None, None]
+        if comparison == '>=':
+            qualifying = matrix.values[None, :, :] >= chunk
+        else:
+            qualifying = matrix.values[None, :, :] <= chunk
+        ranks = np.cumsum(qualifying, axis=2, dtype=np.int32)
+        totals = ranks[:, :, -1] if n_updates else np.zeros(ranks.shape[:2], dtype=np.int32)
+        for r in range(1, max_depth + 1):
+            # First update whose rank reaches r is the r-th trigger
+            position = np.argmax(ranks >= r, axis=2)
+            trigger_times[first:first + block, :, r - 1] = np.where(
+                totals >= r, position * tick_seconds, np.inf)
+
+    # FIFO executor per row: a trigger starts when the previous one finishes
+    fired = np.isfinite(trigger_times)
+    handled = np.zeros_like(fired)
+    busy_until = np.full((n_thresholds, n_rows), -np.inf)
+    with np.errstate(invalid='ignore'):  # inf - inf for triggers that never fired
+        for r in range(max_depth):
+            arrival = trigger_times[:, :, r]
+            start = np.maximum(arrival, busy_until)
+            ok = fired[:, :, r].copy()
+            if max_age is not None:
+                ok &= (start - arrival) <= max_age
+            handled[:, :, r] = ok
+            busy_until = np.where(ok, start + sequence_latency, busy_until)
+
+    # Results for depth d are the first d triggers of the max-depth run
+    fired_cum = np.cumsum(fired, axis=2)
+    handled_cum = np.cumsum(handled, axis=2)
+    index = depths - 1
+    row_triggers = np.moveaxis(fired_cum[:, :, index], 2, 1)  # [threshold, depth, row]
+    row_handled = np.moveaxis(handled_cum[:, :, index], 2, 1)
+
+    mean_spacing = np.full((n_thresholds, len(depths)), np.nan)
+    min_spacing = np.full((n_thresholds, len(depths)), np.nan)
+    with np.errstate(invalid='ignore'):
+        gaps = np.diff(trigger_times, axis=2)
+        gaps[~np.isfinite(gaps)] = np.nan
+        for j, depth in enumerate(depths):
+            window = gaps[:, :, :depth - 1].reshape(n_thresholds, -1)
+            has_gap = np.isfinite(window).any(axis=1)
+            if has_gap.any():
+                mean_spacing[has_gap, j] = np.nanmean(window[has_gap], axis=1)
+                min_spacing[has_gap, j] = np.nanmin(window[has_gap], axis=1)
+
+    return BacktestResult(
+        series=matrix.series,
+        command=command,
+        thresholds=thresholds,
+        depths=depths,
+        sequence_latency=sequence_latency,
+        tick_seconds=tick_seconds,
+        max_age=max_age,
+        triggers=row_triggers.sum(axis=2),
+        handled=row_handled.sum(axis=2),
+        rows_triggered=(row_triggers > 0).sum(axis=2),
+        mean_spacing_s=mean_spacing,
+        min_spacing_s=min_spacing,
+        row_triggers=row_triggers,
+        labels=matrix.labels,
+    )
+
+
+def print_report(result: BacktestResult, top: int = 10):
+    ratio = np.divide(result.handled, result.triggers, out=np.zeros(result.triggers.shape),
+                      where=result.triggers > 0)
+    print(f"\n📈 {result.command} ({result.series} {RULES[result.series][1]} threshold): "
+          f"{result.combinations} combinations, sequence {result.sequence_latency:.2f}s, "
+          f"tick {result.tick_seconds:g}s, max age {result.max_age}")
+    print(f"   {'threshold':>10} {'depth':>5} {'triggers':>9} {'handled':>8} {'ratio':>6} "
+          f"{'rows':>5} {'mean gap':>9} {'min gap':>8}")
+    # Most triggers the executor keeps up with, then highest handled ratio
+    order = np.lexsort((-ratio.ravel(), -result.handled.ravel()))
+    for flat in order[:top]:
+        i, j = np.unravel_index(flat, result.triggers.shape)
+        mean_gap, min_gap = (f"{value:.1f}s" if np.isfinite(value) else '-'
+                             for value in (result.mean_spacing_s[i, j], result.min_spacing_s[i, j]))
+        print(f"   {result.thresholds[i]:>10.4f} {result.depths[j]:>5} {result.triggers[i, j]:>9} "
+              f"{result.handled[i, j]:>8} {ratio[i, j]:>6.0%} {result.rows_triggered[i, j]:>5} "
+              f"{mean_gap:>9} {min_gap:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest F4/F5 thresholds over recorded market data")
+    parser.add_argument('--series', choices=('major', 'minor', 'both'), default='both')
+    parser.add_argument('--thresholds', help="Grid as start:stop:step or a comma list (default: "
+                                             "200 points across the recorded range)")
+    parser.add_argument('--depths', default='1-10', help="Depths as low-high or a comma list")
+    parser.add_argument('--tick-seconds', type=float, default=1.0,
+                        help="Assumed seconds between consecutive updates of one symbol")
+    parser.add_argument('--max-age', type=float, default=5.0,
+                        help="Queue age after which a trigger is dropped (negative = never)")
+    parser.add_argument('--latency', type=float,
+                        help="Seconds per executed trigger (default: configured sequence duration)")
+    parser.add_argument('--sequence-file', help="Keystroke sequence JSON used for the default latency")
+    parser.add_argument('--symbols', help="Comma-separated symbol keys (default: all)")
+    parser.add_argument('--from', dest='start', help="First date (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='end', help="Last date (YYYY-MM-DD)")
+    parser.add_argument('--top', type=int, default=10, help="Combinations to print per series")
+    parser.add_argument('--output', help="Write every combination as JSON to this file")
+    args = parser.parse_args(argv)
+
+    query = MarketQuery()
+    symbols = args.symbols.split(',') if args.symbols else None
+    depths = parse_range(args.depths, integer=True)
+    latencies = sequence_latencies(args.sequence_file)
+    max_age = args.max_age if args.max_age >= 0 else None
+
+    output = {}
+    for series in (('major', 'minor') if args.series == 'both' else (args.series,)):
+        command = RULES[series][0]
+        started = time.perf_counter()
+        matrix = load_matrix(query, series, args.start, args.end, symbols)
+        if not matrix.labels:
+            print(f"No {series} values recorded for the selection")
+            continue
+        thresholds = parse_range(args.thresholds) if args.thresholds else default_thresholds(matrix)
+        latency = args.latency if args.latency is not None else latencies.get(command, 0.0)
+        result = backtest(matrix, thresholds, depths, latency, args.tick_seconds, max_age)
+        elapsed = time.perf_counter() - started
+        print(f"⚡ {series}: {len(matrix.labels)} day/symbol series, {int(matrix.lengths.sum())} values, "
+              f"{result.combinations} combinations in {elapsed:.2f}s")
+        print_report(result, args.top)
+        output[series] = {
+            'command': command,
+            'sequence_latency_s': latency,
+            'tick_seconds': args.tick_seconds,
+            'max_age_s': max_age,
+            'combinations': result.table(),
+        }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+        print(f"\n📝 Results saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
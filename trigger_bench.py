@@ -0,0 +1,412 @@
+"""
+Trigger Benchmark
+Drive the controller's socket server with synthetic load and report latencies.
+
+The controller runs in-process with the recording input backend and the local
+focus service, so no display or Windows desktop is needed. Load generator
+clients use the persistent protocol and measure ack latency per trigger; the
+controller's own timelines supply queue wait and execution latency.
+
+Scenarios:
+1. single      One trigger
+2. burst       N triggers written back-to-back on one connection
+3. sustained   A fixed rate for a fixed duration
+4. mixed       Alternating F4/F5 burst
+5. concurrent  Several clients bursting at the same time
+
+Usage:
+    python trigger_bench.py                          # all scenarios, no sequence delays
+    python trigger_bench.py --delay-scale 1 --scenarios single
+    python trigger_bench.py --compare bench_results/previous.json
+    python trigger_bench.py --binary --burst 1000    # negotiated binary frames instead of JSON
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Optional, List, Dict, Any
+
+from controller_logging import setup_logging
+from app_controller import WindowsAppController
+from input_backends import RecordingBackend
+from window_focus import LocalFocusService
+from trigger_protocol import (
+    LineFramer, BINARY_ACK, STATUS_BY_CODE, encode_trigger, encode_hello, encode_binary_trigger
+)
+from trigger_metrics import summarize
+
+SCENARIOS = ('single', 'burst', 'sustained', 'mixed', 'concurrent')
+TARGET_APP = {'name': 'terminal.exe', 'pid': '0', 'window_title': 'Bench', 'display_name': 'Bench'}
+SYMBOL_COUNT = 50
+BENCH_SYMBOLS = [{'symbolKey': f"SYM{i}-JAN-SYM{i}", 'scrip': f"SYM{i}", 'futScrip': f"SYM{i}-JAN"}
+                 for i in range(SYMBOL_COUNT)]
+
+
+def make_trigger(index: int, command: str) -> Dict[str, Any]:
+    """A synthetic trigger package shaped like the ones feed.js sends."""
+    symbol = f"SYM{index % SYMBOL_COUNT}"
+    trigger = {
+        'command': command,
+        'symbolKey': f"{symbol}-JAN-{symbol}",
+        'scrip': symbol,
+        'futScrip': f"{symbol}-JAN",
+        'timestamp': int(time.time() * 1000),
+    }
+    if command == 'TRIGGER_F4':
+        trigger['futScripBp'] = '100.25'
+    return trigger
+
+
+class BenchHarness:
+    """A headless controller plus an executor thread that counts completions."""
+
+    def __init__(self, delay_scale: float, queue_size: int, coalesce: bool = False,
+                 max_age: Optional[float] = None):
+        self.controller = WindowsAppController(
+            max_pending_triggers=queue_size,
+            max_trigger_age=max_age,
+            coalesce_triggers=coalesce,
+            input_backend=RecordingBackend(),
+            focus_service=LocalFocusService(),
+        )
+        self.controller.plan_executor.verbose = False
+        self.controller.target_app_info = TARGET_APP
+        self.controller.sequence_plans = {
+            name: plan.scaled(delay_scale) for name, plan in self.controller.sequence_plans.items()
+        }
+        self.completed = 0
+        self.completion_times = []
+        self._cond = threading.Condition()
+        self.port = None
+        self._thread = None
+
+    def start(self):
+        if not self.controller.start_socket_server(port=0):
+            raise RuntimeError("Could not start the socket server")
+        self.port = self.controller.server.server_address[1]
+        self._thread = threading.Thread(target=self._executor_loop, daemon=True)
+        self._thread.start()
+
+    def _executor_loop(self):
+        while True:
+            trigger = self.controller.wait_for_trigger()
+            if trigger is None:
+                return
+            executed = self.controller.process_pending(trigger)
+            with self._cond:
+                self.completed += len(executed)
+                self.completion_times.append(time.perf_counter())
+                self._cond.notify_all()
+
+    def wait_for_completions(self, timeout: float) -> bool:
+        """Wait until the queue is drained and every delivered trigger has completed."""
+        queue = self.controller.trigger_queue
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not (len(queue) == 0 and self.completed >= queue.delivered):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, 0.01))
+            return True
+
+    def stop(self):
+        self.controller.trigger_queue.close()
+        self.controller.stop_socket_server()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+class LoadClient:
+    """One persistent connection that sends triggers and timestamps their acks."""
+
+    def __init__(self, port: int, client_id: int, binary: bool = False):
+        self.sock = socket.create_connection(('localhost', port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.client_id = client_id
+        self.binary = binary
+        if binary:
+            self._negotiate()
+        self.sent_at = {}
+        self.ack_latency = []
+        self.statuses = {}
+        self.acked = 0
+        self._cond = threading.Condition()
+        self._reader = threading.Thread(target=self._read_acks, daemon=True)
+        self._reader.start()
+
+    def send(self, index: int, command: str):
+        """Send a synthetic trigger."""
+        self.send_payload(index, make_trigger(index, command))
+
+    def send_payload(self, index: int, trigger: Dict[str, Any]):
+        """Send a trigger package, tagged with a per-client correlation id."""
+        if self.binary:
+            frame = encode_binary_trigger(trigger['command'], index % SYMBOL_COUNT, index,
+                                          trigger.get('futScripBp'), trigger.get('timestamp'))
+            self.sent_at[index] = time.perf_counter()
+            self.sock.sendall(frame)
+            return
+        trigger_id = f"{self.client_id}-{index}"
+        self.sent_at[trigger_id] = time.perf_counter()
+        self.sock.sendall(encode_trigger(dict(trigger, id=trigger_id)))
+
+    def _negotiate(self):
+        """Send the symbol table and wait for the server to switch to binary frames."""
+        self.sock.sendall(encode_hello(BENCH_SYMBOLS))
+        framer = LineFramer()
+        while True:
+            data = self.sock.recv(4096)
+            if not data:
+                raise RuntimeError("Connection closed during HELLO")
+            lines = framer.feed(data)
+            if lines:
+                reply = json.loads(lines[0])
+                if reply.get('status') != 'OK':
+                    raise RuntimeError(f"Binary format refused: {reply}")
+                return
+
+    def _ack(self, correlation_id, status: str, now: float):
+        sent = self.sent_at.get(correlation_id)
+        if sent is not None:
+            self.ack_latency.append(now - sent)
+        with self._cond:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.acked += 1
+            self._cond.notify_all()
+
+    def _read_acks(self):
+        buffer = b''
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            now = time.perf_counter()
+            buffer += data
+            if self.binary:
+                complete = len(buffer) - len(buffer) % BINARY_ACK.size
+                for correlation_id, code in BINARY_ACK.iter_unpack(buffer[:complete]):
+                    self._ack(correlation_id, STATUS_BY_CODE.get(code, str(code)), now)
+                buffer = buffer[complete:]
+                continue
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                ack = json.loads(line)
+                self._ack(ack.get('id'), ack.get('status'), now)
+
+    def wait_for_acks(self, timeout: float) -> bool:
+        """Wait until every sent trigger has been acknowledged."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.acked >= len(self.sent_at), timeout)
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        self._reader.join(timeout=2)
+        self.sock.close()
+
+
+def run_scenario(name: str, args) -> Dict[str, Any]:
+    """Run one scenario on a fresh controller and return its results."""
+    harness = BenchHarness(args.delay_scale, args.queue_size, args.coalesce, args.max_age)
+    harness.start()
+    clients = []
+    try:
+        started = time.perf_counter()
+        if name == 'single':
+            clients = [LoadClient(harness.port, 0, args.binary)]
+            clients[0].send(0, 'TRIGGER_F4')
+        elif name in ('burst', 'mixed'):
+            clients = [LoadClient(harness.port, 0, args.binary)]
+            for i in range(args.burst):
+                command = 'TRIGGER_F5' if name == 'mixed' and i % 2 else 'TRIGGER_F4'
+                clients[0].send(i, command)
+        elif name == 'sustained':
+            clients = [LoadClient(harness.port, 0, args.binary)]
+            total = max(1, int(args.rate * args.duration))
+            for i in range(total):
+                target = started + i / args.rate
+                delay = target - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                clients[0].send(i, 'TRIGGER_F4')
+        elif name == 'concurrent':
+            clients = [LoadClient(harness.port, c, args.binary) for c in range(args.clients)]
+            barrier = threading.Barrier(len(clients))
+
+            def burst(client):
+                barrier.wait()
+                for i in range(args.burst):
+                    client.send(i, 'TRIGGER_F5' if i % 2 else 'TRIGGER_F4')
+
+            senders = [threading.Thread(target=burst, args=(c,)) for c in clients]
+            for sender in senders:
+                sender.start()
+            for sender in senders:
+                sender.join()
+        else:
+            raise ValueError(f"Unknown scenario: {name}")
+
+        sent = sum(len(client.sent_at) for client in clients)
+        for client in clients:
+            client.wait_for_acks(args.timeout)
+        finished = harness.wait_for_completions(args.timeout)
+        elapsed = (harness.completion_times[-1] if harness.completion_times else time.perf_counter()) - started
+    finally:
+        for client in clients:
+            client.close()
+        harness.stop()
+
+    ack_latency = [latency for client in clients for latency in client.ack_latency]
+    statuses = {}
+    for client in clients:
+        for status, count in client.statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+
+    server = harness.controller.metrics.snapshot()
+    return {
+        'sent': sent,
+        'completed': harness.completed,
+        'timed_out': not finished,
+        'statuses': statuses,
+        'queue': harness.controller.trigger_queue.stats(),
+        'elapsed_s': elapsed,
+        'throughput_per_s': harness.completed / elapsed if elapsed > 0 else None,
+        'ack_latency_s': summarize(ack_latency),
+        'server_latency_s': {
+            command: {segment: entries[segment]
+                      for segment in ('queue_wait', 'execution', 'keystroke_jitter', 'total')
+                      if segment in entries}
+            for command, entries in server.items()
+        },
+    }
+
+
+def git_revision() -> Optional[str]:
+    """Short commit id of the working tree, if available."""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare_results(current: Dict[str, Any], previous: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return a line for every p50/p95 or throughput metric that regressed beyond tolerance."""
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        pairs = [('ack p50', result['ack_latency_s'].get('p50'), before['ack_latency_s'].get('p50')),
+                 ('ack p95', result['ack_latency_s'].get('p95'), before['ack_latency_s'].get('p95'))]
+        for command, segments in result['server_latency_s'].items():
+            for segment, entry in segments.items():
+                old = before['server_latency_s'].get(command, {}).get(segment, {})
+                pairs.append((f"{command} {segment} p95", entry.get('p95'), old.get('p95')))
+        for label, new, old in pairs:
+            if new is not None and old and new > old * (1 + tolerance):
+                regressions.append(f"{name}: {label} {old * 1000:.3f} ms -> {new * 1000:.3f} ms")
+        new_tp, old_tp = result.get('throughput_per_s'), before.get('throughput_per_s')
+        if new_tp and old_tp and new_tp < old_tp * (1 - tolerance):
+            regressions.append(f"{name}: throughput {old_tp:.1f}/s -> {new_tp:.1f}/s")
+    return regressions
+
+
+def print_report(results: Dict[str, Any]):
+    print(f"\n=== TRIGGER BENCHMARK ({results['revision'] or 'unknown revision'}) ===")
+    for name, result in results['scenarios'].items():
+        ack = result['ack_latency_s']
+        throughput = result['throughput_per_s']
+        print(f"\n{name}: {result['completed']}/{result['sent']} completed in {result['elapsed_s']:.3f}s"
+              f" ({throughput:.1f}/s)" if throughput else f"\n{name}: nothing completed")
+        if ack.get('count'):
+            print(f"  ack        p50 {ack['p50'] * 1000:8.3f} ms   p95 {ack['p95'] * 1000:8.3f} ms"
+                  f"   p99 {ack['p99'] * 1000:8.3f} ms")
+        for command, segments in result['server_latency_s'].items():
+            for segment, entry in segments.items():
+                print(f"  {command[-2:]} {segment:<16} p50 {entry['p50'] * 1000:8.3f} ms"
+                      f"   p95 {entry['p95'] * 1000:8.3f} ms   p99 {entry['p99'] * 1000:8.3f} ms")
+        if result['timed_out']:
+            print("  ⚠️ timed out before every trigger completed")
+        if set(result['statuses']) - {'F4_TRIGGERED', 'F5_TRIGGERED'}:
+            print(f"  statuses: {result['statuses']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the trigger path with synthetic load")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--burst', type=int, default=100, help="Triggers per burst")
+    parser.add_argument('--rate', type=float, default=50.0, help="Sustained triggers per second")
+    parser.add_argument('--duration', type=float, default=2.0, help="Sustained scenario seconds")
+    parser.add_argument('--clients', type=int, default=4, help="Clients in the concurrent scenario")
+    parser.add_argument('--delay-scale', type=float, default=0.0,
+                        help="Multiplier for sequence delays (0 = no delays, 1 = production)")
+    parser.add_argument('--queue-size', type=int, default=10000, help="Trigger queue bound")
+    parser.add_argument('--coalesce', action='store_true',
+                        help="Coalesce pending triggers per symbol (off so every trigger executes)")
+    parser.add_argument('--max-age', type=float, help="Drop triggers older than this many seconds")
+    parser.add_argument('--binary', action='store_true',
+                        help="Clients negotiate binary trigger frames instead of JSON lines")
+    parser.add_argument('--timeout', type=float, default=120.0, help="Seconds to wait per scenario")
+    parser.add_argument('--output', help="Results file (default: bench_results/trigger_bench-<time>.json)")
+    parser.add_argument('--compare', help="Previous results file to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args(argv)
+    # Controller records go to logs/controller.log only, off the console
+    setup_logging(console=False)
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = {
+        'revision': git_revision(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': vars(args),
+        'scenarios': {},
+    }
+    for name in names:
+        print(f"Running {name}...")
+        # The controller's console output would dominate the measurement
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            results['scenarios'][name] = run_scenario(name, args)
+
+    print_report(results)
+
+    output = args.output or os.path.join('bench_results', f"trigger_bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📝 Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        regressions = compare_results(results, previous, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\n✅ No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
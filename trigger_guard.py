@@ -0,0 +1,352 @@
+"""
+Trigger Guard
+Per-symbol rate limiting and circuit breaking in front of the trigger queue.
+
+A misfiring producer that hammers one symbolKey would otherwise make the
+executor run a multi-second sequence for every trigger and starve every other
+symbol. TriggerGuard.admit() runs on the socket threads before a trigger is
+queued and refuses it with a reason that is acknowledged to the producer
+(RATE_LIMITED, GLOBAL_RATE_LIMITED or CIRCUIT_OPEN), so the order can be
+routed elsewhere. An admitted trigger that the queue then rejects or
+coalesces gets its tokens back (refund()). The guard is opt-in: the service
+(--serve) enables it, the interactive menu runs without one.
+
+- Token buckets: one per symbol and one for all symbols (rate per second, burst).
+- Circuit breaker per symbol: after N consecutive failed or timed-out sequences
+  the symbol is refused for a cooldown, then one trial trigger is let through
+  (half-open); its success closes the breaker, a failure opens it again.
+- Sequence deadline: the executor calls begin() when a sequence starts and
+  end() when it returns. A sequence still running sequence_timeout seconds
+  after begin() is counted as timed out by the next admit() (or stats call),
+  so a hung sequence trips the breaker without ever returning; its late
+  record_result() is then ignored.
+
+State lives in flat arrays indexed by an interned symbol slot - no dict or
+object per event (only the few sequences in flight have an entry). TriggerHistory keeps the last `depth` events per symbol as
+a ring of (timestamp, command code, event code).
+"""
+
+import threading
+import time
+from array import array
+from typing import Optional, List, Dict, Any, Callable
+
+from trigger_protocol import COMMAND_CODES, COMMANDS_BY_CODE
+from trigger_queue import TriggerRecord
+
+# Rejection reasons (acknowledged upper-cased, like the queue's)
+REJECT_RATE_LIMITED = 'rate_limited'
+REJECT_GLOBAL_RATE_LIMITED = 'global_rate_limited'
+REJECT_CIRCUIT_OPEN = 'circuit_open'
+
+# Event codes stored in the history
+EVENT_ADMITTED = 0
+EVENT_RATE_LIMITED = 1
+EVENT_GLOBAL_RATE_LIMITED = 2
+EVENT_CIRCUIT_OPEN = 3
+EVENT_SUCCEEDED = 4
+EVENT_FAILED = 5
+EVENT_TIMED_OUT = 6
+EVENT_NAMES = ('admitted', REJECT_RATE_LIMITED, REJECT_GLOBAL_RATE_LIMITED, REJECT_CIRCUIT_OPEN,
+               'succeeded', 'failed', 'timed_out')
+EVENT_BY_REJECTION = {REJECT_RATE_LIMITED: EVENT_RATE_LIMITED,
+                      REJECT_GLOBAL_RATE_LIMITED: EVENT_GLOBAL_RATE_LIMITED,
+                      REJECT_CIRCUIT_OPEN: EVENT_CIRCUIT_OPEN}
+
+# Breaker states
+CLOSED = 0
+OPEN = 1
+HALF_OPEN = 2
+STATE_NAMES = ('closed', 'open', 'half_open')
+
+# Symbols beyond max_symbols share this slot
+OVERFLOW_SYMBOL = '<other>'
+
+
+class TriggerHistory:
+    """Fixed-depth ring of recent events per interned symbol, stored in flat arrays."""
+
+    def __init__(self, depth: int = 32, max_symbols: int = 4096):
+        """
+        Args:
+            depth: Events kept per symbol
+            max_symbols: Symbols interned individually; later ones share OVERFLOW_SYMBOL
+        """
+        if depth < 1 or max_symbols < 1:
+            raise ValueError("depth and max_symbols must be at least 1")
+        self.depth = depth
+        self.max_symbols = max_symbols
+        self.slots = {}  # symbolKey -> slot
+        self.symbols = []  # slot -> symbolKey
+        self.times = array('d')  # slot * depth + position
+        self.commands = array('B')
+        self.events = array('B')
+        self.heads = array('L')  # Next write position per slot
+        self.counts = array('L')  # Events recorded per slot (saturates at depth)
+
+    def slot(self, symbol: str) -> int:
+        """Intern a symbol, growing the arrays by one ring for a new one."""
+        slot = self.slots.get(symbol)
+        if slot is not None:
+            return slot
+        if len(self.symbols) >= self.max_symbols:
+            symbol = OVERFLOW_SYMBOL
+            slot = self.slots.get(symbol)
+            if slot is not None:
+                return slot
+        slot = len(self.symbols)
+        self.slots[symbol] = slot
+        self.symbols.append(symbol)
+        self.times.extend(array('d', bytes(8 * self.depth)))
+        self.commands.extend(bytes(self.depth))
+        self.events.extend(bytes(self.depth))
+        self.heads.append(0)
+        self.counts.append(0)
+        return slot
+
+    def record(self, slot: int, now: float, command_code: int, event: int):
+        position = slot * self.depth + self.heads[slot]
+        self.times[position] = now
+        self.commands[position] = command_code
+        self.events[position] = event
+        self.heads[slot] = (self.heads[slot] + 1) % self.depth
+        if self.counts[slot] < self.depth:
+            self.counts[slot] += 1
+
+    def recent(self, slot: int) -> List[tuple]:
+        """The slot's events, oldest first, as (timestamp, command code, event code)."""
+        base = slot * self.depth
+        count = self.counts[slot]
+        start = (self.heads[slot] - count) % self.depth
+        positions = [base + (start + i) % self.depth for i in range(count)]
+        return [(self.times[p], self.commands[p], self.events[p]) for p in positions]
+
+    def event_counts(self, slot: int, since: float) -> List[int]:
+        """Events per code recorded at or after since."""
+        counts = [0] * len(EVENT_NAMES)
+        base = slot * self.depth
+        for position in range(base, base + self.counts[slot]):
+            if self.times[position] >= since:
+                counts[self.events[position]] += 1
+        return counts
+
+
+class TriggerGuard:
+    """Token-bucket rate limits and a circuit breaker per symbol (thread-safe)."""
+
+    def __init__(self, symbol_rate: float = 0.5, symbol_burst: int = 3,
+                 global_rate: float = 2.0, global_burst: int = 10,
+                 breaker_failures: int = 3, breaker_cooldown: float = 30.0,
+                 sequence_timeout: Optional[float] = 15.0,
+                 history_depth: int = 32, max_symbols: int = 4096,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            symbol_rate: Sustained triggers per second per symbol (0 disables)
+            symbol_burst: Triggers a symbol may send at once
+            global_rate: Sustained triggers per second over all symbols (0 disables)
+            global_burst: Triggers all symbols together may send at once
+            breaker_failures: Consecutive failures or timeouts that open a symbol's breaker (0 disables)
+            breaker_cooldown: Seconds a breaker stays open before a trial trigger is let through
+            sequence_timeout: A sequence running longer counts as a failure, even before it returns (None disables)
+            history_depth: Events kept per symbol
+            max_symbols: Symbols tracked individually
+        """
+        self.symbol_rate = symbol_rate
+        self.symbol_burst = max(1, symbol_burst)
+        self.global_rate = global_rate
+        self.global_burst = max(1, global_burst)
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.sequence_timeout = sequence_timeout
+        self.clock = clock
+        self.history = TriggerHistory(history_depth, max_symbols)
+        self._lock = threading.Lock()
+        # Per-slot state, grown alongside the history
+        self.tokens = array('d')
+        self.refilled_at = array('d')
+        self.failures = array('H')
+        self.states = array('B')
+        self.opened_at = array('d')
+        self.global_tokens = float(self.global_burst)
+        self.global_refilled_at = clock()
+        self.totals = [0] * len(EVENT_NAMES)
+        self.running = {}  # id(trigger) -> (slot, command, started_at) of sequences in flight
+        self.expired = set()  # id(trigger) of sequences already counted as timed out
+
+    @classmethod
+    def from_options(cls, options: Dict[str, Any]) -> 'TriggerGuard':
+        """Build from the service settings (symbol_rate, ..., sequence_timeout)."""
+        timeout = options['sequence_timeout']
+        return cls(symbol_rate=options['symbol_rate'], symbol_burst=options['symbol_burst'],
+                   global_rate=options['global_rate'], global_burst=options['global_burst'],
+                   breaker_failures=options['breaker_failures'],
+                   breaker_cooldown=options['breaker_cooldown'],
+                   sequence_timeout=timeout if timeout and timeout > 0 else None)
+
+    def _slot(self, symbol: str, now: float) -> int:
+        slot = self.history.slot(symbol)
+        while len(self.tokens) <= slot:
+            self.tokens.append(float(self.symbol_burst))
+            self.refilled_at.append(now)
+            self.failures.append(0)
+            self.states.append(CLOSED)
+            self.opened_at.append(0.0)
+        return slot
+
+    def _record(self, slot: int, now: float, command: str, event: int):
+        self.history.record(slot, now, COMMAND_CODES.get(command, 0), event)
+        self.totals[event] += 1
+
+    def admit(self, trigger: TriggerRecord) -> Optional[str]:
+        """
+        Decide whether a trigger may be queued; admitted triggers use up a token.
+
+        Returns:
+            None if admitted, otherwise the rejection reason
+        """
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            slot = self._slot(trigger.symbol_key, now)
+            rejection = self._check(slot, now)
+            self._record(slot, now, trigger.command,
+                         EVENT_BY_REJECTION[rejection] if rejection else EVENT_ADMITTED)
+            return rejection
+
+    def refund(self, trigger: TriggerRecord):
+        """Give back the tokens of an admitted trigger that will not run (rejected by the queue or coalesced)."""
+        with self._lock:
+            slot = self._slot(trigger.symbol_key, self.clock())
+            if self.symbol_rate > 0:
+                self.tokens[slot] = min(self.symbol_burst, self.tokens[slot] + 1)
+            if self.global_rate > 0:
+                self.global_tokens = min(self.global_burst, self.global_tokens + 1)
+
+    def begin(self, trigger: TriggerRecord):
+        """Start the deadline of a sequence that is about to run."""
+        if self.sequence_timeout is None:
+            return
+        with self._lock:
+            now = self.clock()
+            self.running[id(trigger)] = (self._slot(trigger.symbol_key, now), trigger.command, now)
+
+    def end(self, trigger: TriggerRecord):
+        """Stop the deadline of a sequence that returned (its result follows in record_result())."""
+        if self.sequence_timeout is None:
+            return
+        with self._lock:
+            self.running.pop(id(trigger), None)
+
+    def _expire(self, now: float):
+        """Count sequences in flight past sequence_timeout as timed out."""
+        if not self.running:
+            return
+        for key, (slot, command, started_at) in list(self.running.items()):
+            if now - started_at > self.sequence_timeout:
+                del self.running[key]
+                self.expired.add(key)
+                self._fail(slot, now, command, EVENT_TIMED_OUT)
+
+    def _check(self, slot: int, now: float) -> Optional[str]:
+        trial = self.states[slot] != CLOSED
+        if trial and now - self.opened_at[slot] < self.breaker_cooldown:
+            return REJECT_CIRCUIT_OPEN
+
+        if self.global_rate > 0:
+            self.global_tokens = min(self.global_burst,
+                                     self.global_tokens + (now - self.global_refilled_at) * self.global_rate)
+            self.global_refilled_at = now
+        if self.symbol_rate > 0:
+            self.tokens[slot] = min(self.symbol_burst,
+                                    self.tokens[slot] + (now - self.refilled_at[slot]) * self.symbol_rate)
+            self.refilled_at[slot] = now
+        if self.symbol_rate > 0 and self.tokens[slot] < 1:
+            return REJECT_RATE_LIMITED
+        if self.global_rate > 0 and self.global_tokens < 1:
+            return REJECT_GLOBAL_RATE_LIMITED
+        if self.symbol_rate > 0:
+            self.tokens[slot] -= 1
+        if self.global_rate > 0:
+            self.global_tokens -= 1
+        if trial:
+            # Cooldown over: this trigger is the trial (another follows if it never runs)
+            self.states[slot] = HALF_OPEN
+            self.opened_at[slot] = now
+        return None
+
+    def record_result(self, trigger: TriggerRecord, ok: bool, duration: float) -> bool:
+        """
+        Feed a finished sequence into the symbol's breaker.
+
+        Args:
+            trigger: The executed trigger
+            ok: False if the sequence raised
+            duration: Seconds the sequence took (above sequence_timeout counts as a failure)
+
+        Returns:
+            True if this result opened the breaker (False if the sequence was
+            already counted as timed out while it ran)
+        """
+        timed_out = ok and self.sequence_timeout is not None and duration > self.sequence_timeout
+        with self._lock:
+            key = id(trigger)
+            self.running.pop(key, None)
+            if key in self.expired:
+                self.expired.discard(key)
+                return False
+            now = self.clock()
+            slot = self._slot(trigger.symbol_key, now)
+            if not ok or timed_out:
+                return self._fail(slot, now, trigger.command, EVENT_TIMED_OUT if timed_out else EVENT_FAILED)
+            self._record(slot, now, trigger.command, EVENT_SUCCEEDED)
+            self.failures[slot] = 0
+            self.states[slot] = CLOSED
+            return False
+
+    def _fail(self, slot: int, now: float, command: str, event: int) -> bool:
+        """Record a failed or timed-out sequence; True if it opened the breaker."""
+        self._record(slot, now, command, event)
+        self.failures[slot] = min(self.failures[slot] + 1, 0xFFFF)
+        if self.breaker_failures <= 0:
+            return False
+        if self.states[slot] == HALF_OPEN or self.failures[slot] >= self.breaker_failures:
+            opened = self.states[slot] != OPEN
+            self.states[slot] = OPEN
+            self.opened_at[slot] = now
+            return opened
+        return False
+
+    def symbol_status(self, symbol: str, window: float = 60.0) -> Dict[str, Any]:
+        """Breaker state, tokens and the last window seconds of events for one symbol."""
+        with self._lock:
+            slot = self.history.slots.get(symbol)
+            now = self.clock()
+            self._expire(now)
+            if slot is None or slot >= len(self.tokens):
+                return {'symbol': symbol, 'state': STATE_NAMES[CLOSED], 'events': {}}
+            counts = self.history.event_counts(slot, now - window)
+            recent = self.history.recent(slot)
+            return {
+                'symbol': symbol,
+                'state': STATE_NAMES[self.states[slot]],
+                'failures': self.failures[slot],
+                'tokens': round(self.tokens[slot], 3),
+                'events': {EVENT_NAMES[code]: count for code, count in enumerate(counts) if count},
+                'last': [{'age_s': round(now - at, 3), 'command': COMMANDS_BY_CODE.get(code, '?'),
+                          'event': EVENT_NAMES[event]} for at, code, event in recent[-5:]],
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals per event plus the symbols whose breaker is not closed."""
+        with self._lock:
+            self._expire(self.clock())
+            tripped = {self.history.symbols[slot]: STATE_NAMES[state]
+                       for slot, state in enumerate(self.states) if state != CLOSED}
+            return {
+                'symbols': len(self.history.symbols),
+                'global_tokens': round(self.global_tokens, 3),
+                'events': dict(zip(EVENT_NAMES, self.totals)),
+                'breakers': tripped,
+                'running': len(self.running),
+            }
@@ -0,0 +1,234 @@
+"""
+Trigger Metrics
+Per-trigger latency timelines and rolling percentile summaries.
+
+Every trigger carries a TriggerTimeline of time.perf_counter() marks
+(received, parsed, enqueued, dequeued, focus_start, focus_end, step_N,
+complete) plus the worst keystroke lateness seen by the executor, reported as
+the keystroke_jitter segment. When a trigger completes, its timeline is reduced to segment
+durations which feed rolling p50/p95/p99 summaries per command. Summaries
+export as JSON or in the Prometheus text exposition format.
+"""
+
+import json
+import math
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple, Any
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Segment name -> (start mark, end mark)
+SEGMENTS = {
+    'parse': ('received', 'parsed'),
+    'ack': ('received', 'acked'),
+    'queue_wait': ('enqueued', 'dequeued'),
+    'focus': ('focus_start', 'focus_end'),
+    'execution': ('execution_start', 'complete'),
+    'total': ('received', 'complete'),
+}
+
+
+class TriggerTimeline:
+    """Ordered monotonic timestamps for one trigger."""
+
+    __slots__ = ('marks', 'wall_received', 'producer_timestamp', 'keystroke_late')
+
+    def __init__(self, producer_timestamp: Any = None):
+        self.marks: Dict[str, float] = {}
+        self.wall_received = time.time()
+        self.producer_timestamp = producer_timestamp
+        self.keystroke_late: Optional[float] = None  # Worst keystroke delay past its schedule
+
+    def mark(self, name: str, at: Optional[float] = None):
+        """Record a named point in time (time.perf_counter() unless given)."""
+        self.marks[name] = time.perf_counter() if at is None else at
+
+    def note_lateness(self, late: float):
+        """Keep the worst keystroke lateness (seconds past schedule) reported so far."""
+        if self.keystroke_late is None or late > self.keystroke_late:
+            self.keystroke_late = late
+
+    def span(self, start: str, end: str) -> Optional[float]:
+        """Seconds between two marks, or None if either is missing."""
+        if start in self.marks and end in self.marks:
+            return self.marks[end] - self.marks[start]
+        return None
+
+    def producer_skew(self) -> Optional[float]:
+        """Seconds between the producer's timestamp and our receipt (wall clock)."""
+        sent = parse_producer_timestamp(self.producer_timestamp)
+        if sent is None:
+            return None
+        return self.wall_received - sent
+
+    def segments(self) -> Dict[str, float]:
+        """Reduce the marks to segment durations in seconds."""
+        durations = {}
+        for segment, (start, end) in SEGMENTS.items():
+            value = self.span(start, end)
+            if value is not None:
+                durations[segment] = value
+
+        if self.keystroke_late is not None:
+            durations['keystroke_jitter'] = self.keystroke_late
+
+        skew = self.producer_skew()
+        if skew is not None:
+            durations['producer_skew'] = skew
+            total = durations.get('total')
+            if total is not None:
+                durations['end_to_end'] = skew + total
+
+        # Each step lasts until the next step (or completion) starts
+        steps = sorted((int(name[5:]), at) for name, at in self.marks.items()
+                       if name.startswith('step_'))
+        for i, (step, at) in enumerate(steps):
+            end = steps[i + 1][1] if i + 1 < len(steps) else self.marks.get('complete')
+            if end is not None:
+                durations[f'step_{step}'] = end - at
+        return durations
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Marks relative to the first one, in milliseconds."""
+        if not self.marks:
+            return {}
+        origin = min(self.marks.values())
+        return {name: round((at - origin) * 1000, 3)
+                for name, at in sorted(self.marks.items(), key=lambda item: item[1])}
+
+
+def parse_producer_timestamp(value: Any) -> Optional[float]:
+    """
+    Convert a producer timestamp to epoch seconds.
+
+    Accepts epoch seconds or milliseconds (numbers or numeric strings) and
+    ISO-8601 strings such as '2025-12-30T08:21:40.708Z'.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            value = float(text)
+        except ValueError:
+            try:
+                return datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp()
+            except ValueError:
+                return None
+    if isinstance(value, (int, float)):
+        # Values beyond ~2286 in seconds are milliseconds (JavaScript Date.now())
+        return value / 1000.0 if value > 1e10 else float(value)
+    return None
+
+
+class RollingSummary:
+    """Percentiles over the most recent window of samples."""
+
+    def __init__(self, window: int = 1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self, quantiles: Tuple[float, ...] = QUANTILES) -> Dict[float, float]:
+        """Nearest-rank quantiles over the current window."""
+        if not self.samples:
+            return {}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {q: ordered[min(last, max(0, math.ceil(q * len(ordered)) - 1))] for q in quantiles}
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Count, mean and nearest-rank p50/p95/p99/max of values (seconds)."""
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+
+    def rank(q):
+        return ordered[min(last, max(0, math.ceil(q * len(ordered)) - 1))]
+
+    return {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'p50': rank(0.5),
+        'p95': rank(0.95),
+        'p99': rank(0.99),
+        'max': ordered[-1],
+    }
+
+
+class TriggerMetrics:
+    """Rolling latency summaries keyed by (command, segment)."""
+
+    def __init__(self, window: int = 1024, keep_recent: int = 50):
+        """
+        Args:
+            window: Samples kept per summary for percentile estimation
+            keep_recent: Number of complete timelines kept for inspection
+        """
+        self.window = window
+        self.summaries: Dict[Tuple[str, str], RollingSummary] = {}
+        self.recent = deque(maxlen=keep_recent)
+        self._lock = threading.Lock()
+
+    def record(self, command: str, timeline: TriggerTimeline, symbol_key: Optional[str] = None):
+        """Add a completed trigger's segments to the summaries."""
+        segments = timeline.segments()
+        with self._lock:
+            for segment, value in segments.items():
+                key = (command, segment)
+                summary = self.summaries.get(key)
+                if summary is None:
+                    summary = self.summaries[key] = RollingSummary(self.window)
+                summary.add(value)
+            # Wall-clock receipt and symbol let external logs be joined to these timings
+            self.recent.append({'command': command, 'symbol_key': symbol_key,
+                                'wall_received': timeline.wall_received,
+                                'segments': segments, 'marks_ms': timeline.to_dict()})
+
+    def recent_timelines(self) -> List[Dict[str, Any]]:
+        """The most recent completed triggers, oldest first."""
+        with self._lock:
+            return list(self.recent)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """All summaries as {command: {segment: {count, sum, p50, p95, p99}}} in seconds."""
+        result = {}
+        with self._lock:
+            for (command, segment), summary in sorted(self.summaries.items()):
+                entry = {'count': summary.count, 'sum': summary.sum}
+                for q, value in summary.quantiles().items():
+                    entry[f'p{int(q * 100)}'] = value
+                result.setdefault(command, {})[segment] = entry
+        return result
+
+    def to_json(self, include_recent: bool = False) -> str:
+        data = {'generated_at': time.time(), 'latency_seconds': self.snapshot()}
+        if include_recent:
+            data['recent'] = self.recent_timelines()
+        return json.dumps(data, indent=2)
+
+    def to_prometheus(self) -> str:
+        """Summaries in the Prometheus text exposition format."""
+        name = 'trigger_latency_seconds'
+        lines = [f'# HELP {name} Trigger pipeline latency by command and segment.',
+                 f'# TYPE {name} summary']
+        for command, segments in self.snapshot().items():
+            for segment, entry in segments.items():
+                labels = f'command="{command}",segment="{segment}"'
+                for q in QUANTILES:
+                    value = entry.get(f'p{int(q * 100)}')
+                    if value is not None:
+                        lines.append(f'{name}{{{labels},quantile="{q}"}} {value:.6f}')
+                lines.append(f'{name}_sum{{{labels}}} {entry["sum"]:.6f}')
+                lines.append(f'{name}_count{{{labels}}} {entry["count"]}')
+        return '\n'.join(lines) + '\n'
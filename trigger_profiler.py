@@ -0,0 +1,292 @@
+"""
+Trigger Profiler
+On-demand diagnostics for a running controller, toggled over the trigger socket.
+
+Control commands (JSON, same connection styles as the triggers):
+    {"command": "PROFILE", "count": 5, "top": 20}   cProfile the next 5 triggers
+    {"command": "PROFILE", "count": 0}              cancel; no count returns the status
+    {"command": "MEMORY", "action": "start"}        start tracemalloc (frames: traceback depth)
+    {"command": "MEMORY", "action": "snapshot"}     snapshot, diff against the previous one
+    {"command": "MEMORY", "action": "stop"}         stop tracemalloc
+    {"command": "STACKS"}                           dump every thread's stack
+
+Results are written to timestamped files in logs/diagnostics/ (a .prof file
+loadable with pstats/snakeviz plus a text summary, a tracemalloc snapshot,
+or a stack dump) and the reply carries the top-N summary.
+
+When nothing is armed the executor only tests one integer attribute per
+trigger, and tracemalloc is never started unless asked for, so the hooks can
+stay in the production build.
+
+Usage:
+    python trigger_profiler.py PROFILE --count 5
+    python trigger_profiler.py MEMORY --action snapshot --top 10
+    python trigger_profiler.py STACKS
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import socket
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from typing import List, Dict, Callable, Any
+
+from controller_logging import LOG_DIR, get_logger
+
+DIAGNOSTICS_DIR = os.path.join(LOG_DIR, 'diagnostics')
+DEFAULT_TOP = 20
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+MEMORY_ACTIONS = ('start', 'snapshot', 'stop')
+
+log = get_logger('profiler')
+
+
+def timestamp() -> str:
+    """File-name timestamp with milliseconds, e.g. 20261018-093012-481."""
+    now = time.time()
+    return time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+
+
+def top_functions(stats: pstats.Stats, top: int, sort: str) -> List[Dict[str, Any]]:
+    """The top-N entries of a pstats table as JSON-friendly rows."""
+    stats.sort_stats(sort)
+    rows = []
+    for func in stats.fcn_list[:top]:
+        calls, primitive, tottime, cumtime, _ = stats.stats[func]
+        filename, line, name = func
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({name})" if line else name,
+            'calls': calls,
+            'tottime_s': round(tottime, 6),
+            'cumtime_s': round(cumtime, 6),
+        })
+    return rows
+
+
+class TriggerProfiler:
+    """Arms cProfile for a number of triggers and takes memory/stack snapshots."""
+
+    def __init__(self, output_dir: str = DIAGNOSTICS_DIR):
+        self.output_dir = output_dir
+        self.pending = 0  # Triggers still to profile; the executor's only check when idle
+        self.top = DEFAULT_TOP
+        self.sort = 'cumulative'
+        self.last_report = None
+        self.last_snapshot = None
+        self.defer = None  # Optional callable(fn, *args) that writes reports off the executor thread
+        self._stats = None
+        self._profiled = 0
+        self._lock = threading.Lock()  # Arming and collecting
+        self._running = threading.Lock()  # One profiled trigger at a time
+
+    def _path(self, prefix: str, suffix: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        return os.path.join(self.output_dir, f"{prefix}-{timestamp()}{suffix}")
+
+    def arm(self, count: int, top: int = DEFAULT_TOP, sort: str = 'cumulative') -> Dict[str, Any]:
+        """
+        Profile the next count triggers (0 cancels and discards what was collected).
+
+        Returns:
+            Status reply
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+        with self._lock:
+            self.pending = max(0, count)
+            self.top = max(1, top)
+            self.sort = sort
+            self._stats = None
+            self._profiled = 0
+        if count > 0:
+            log.info("🔬 Profiling the next %d trigger(s)", count)
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        """Pending count and the last finished report."""
+        return {'pending': self.pending, 'profiled': self._profiled, 'last': self.last_report}
+
+    def run(self, func: Callable[..., List], *args) -> List:
+        """
+        Call func (which returns the triggers it executed) under cProfile.
+
+        A trigger that starts while another is being profiled, e.g. on a second
+        pool window, runs unprofiled and does not use up the count.
+        """
+        if not self._running.acquire(blocking=False):
+            return func(*args)
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # Another profiler owns the interpreter (Python 3.12+)
+                return func(*args)
+            try:
+                executed = func(*args)
+            finally:
+                profile.disable()
+            self._collect(profile, len(executed) if executed else 1)
+            return executed
+        finally:
+            self._running.release()
+
+    def _collect(self, profile: cProfile.Profile, triggers: int):
+        with self._lock:
+            if self.pending <= 0:  # Cancelled while the trigger ran
+                return
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self._profiled += triggers
+            self.pending = max(0, self.pending - triggers)
+            if self.pending:
+                return
+            stats, self._stats = self._stats, None
+            profiled, self._profiled = self._profiled, 0
+        if self.defer:
+            self.defer(self._finish, stats, profiled)
+        else:
+            self._finish(stats, profiled)
+
+    def _finish(self, stats: pstats.Stats, profiled: int):
+        self.last_report = self.write_report(stats, profiled)
+        log.info("🔬 Profile of %d trigger(s) written to %s", profiled, self.last_report['file'])
+        for row in self.last_report['top'][:5]:
+            log.info("   %8.4fs cum %8.4fs own %6d calls  %s",
+                     row['cumtime_s'], row['tottime_s'], row['calls'], row['function'])
+
+    def write_report(self, stats: pstats.Stats, triggers: int) -> Dict[str, Any]:
+        """Dump the collected stats (.prof plus a text summary) and return the top-N summary."""
+        path = self._path('cprofile', '.prof')
+        stats.dump_stats(path)
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats(self.sort).print_stats(self.top)
+        with open(path[:-len('.prof')] + '.txt', 'w', encoding='utf-8') as f:
+            f.write(text.getvalue())
+        return {'file': path, 'triggers': triggers, 'sort': self.sort,
+                'total_s': round(stats.total_tt, 6), 'top': top_functions(stats, self.top, self.sort)}
+
+    def memory(self, action: str, top: int = DEFAULT_TOP, frames: int = 1) -> Dict[str, Any]:
+        """
+        Control tracemalloc.
+
+        'snapshot' writes the snapshot to a file and summarizes the top allocation
+        sites, plus the growth since the previous snapshot when there is one.
+        """
+        if action == 'start':
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(max(1, frames))
+                log.info("🔬 tracemalloc started (%d frame(s))", max(1, frames))
+            self.last_snapshot = None
+            return {'tracing': True}
+        if action == 'stop':
+            tracemalloc.stop()
+            self.last_snapshot = None
+            log.info("🔬 tracemalloc stopped")
+            return {'tracing': False}
+        if action != 'snapshot':
+            raise ValueError(f"action must be one of {', '.join(MEMORY_ACTIONS)}")
+        if not tracemalloc.is_tracing():
+            raise ValueError("tracemalloc is not running (send action 'start' first)")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ))
+        path = self._path('tracemalloc', '.snapshot')
+        snapshot.dump(path)
+        current, peak = tracemalloc.get_traced_memory()
+        reply = {
+            'file': path,
+            'current_bytes': current,
+            'peak_bytes': peak,
+            'top': [{'site': str(stat.traceback[0]), 'bytes': stat.size, 'count': stat.count}
+                    for stat in snapshot.statistics('lineno')[:top]],
+        }
+        if self.last_snapshot is not None:
+            reply['growth'] = [{'site': str(stat.traceback[0]), 'bytes': stat.size_diff,
+                                'count': stat.count_diff}
+                               for stat in snapshot.compare_to(self.last_snapshot, 'lineno')[:top]]
+        self.last_snapshot = snapshot
+        log.info("🔬 tracemalloc snapshot written to %s (%.1f KiB traced)", path, current / 1024)
+        return reply
+
+    def stacks(self, limit: int = 8) -> Dict[str, Any]:
+        """Write every thread's full stack to a file; the reply keeps the innermost frames."""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        path = self._path('stacks', '.txt')
+        threads = {}
+        with open(path, 'w', encoding='utf-8') as f:
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, f"thread-{ident}")
+                stack = traceback.extract_stack(frame)
+                f.write(f"--- {name} ({ident}) ---\n")
+                f.writelines(traceback.format_list(stack))
+                f.write("\n")
+                threads[name] = [f"{os.path.basename(entry.filename)}:{entry.lineno}({entry.name})"
+                                 for entry in stack[-limit:]]
+        log.info("🔬 Stacks of %d thread(s) written to %s", len(threads), path)
+        return {'file': path, 'threads': threads}
+
+    def handle(self, request: Dict) -> Dict[str, Any]:
+        """Reply to a PROFILE, MEMORY or STACKS control message."""
+        command = request['command']
+        top = int(request.get('top', DEFAULT_TOP))
+        try:
+            if command == 'PROFILE':
+                if 'count' not in request:
+                    return dict(self.status(), status='OK')
+                reply = self.arm(int(request['count']), top, request.get('sort', 'cumulative'))
+            elif command == 'MEMORY':
+                reply = self.memory(request.get('action', 'snapshot'), top, int(request.get('frames', 1)))
+            else:
+                reply = self.stacks(int(request.get('limit', 8)))
+        except (TypeError, ValueError, OSError) as e:
+            return {'status': 'ERROR', 'error': str(e)}
+        return dict(reply, status='OK')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send a profiling command to a running controller")
+    parser.add_argument('command', choices=('PROFILE', 'MEMORY', 'STACKS'))
+    parser.add_argument('--count', type=int, help="PROFILE: triggers to profile (0 cancels, omit for status)")
+    parser.add_argument('--sort', choices=SORT_KEYS)
+    parser.add_argument('--action', choices=MEMORY_ACTIONS, help="MEMORY: what to do")
+    parser.add_argument('--frames', type=int, help="MEMORY start: traceback depth")
+    parser.add_argument('--top', type=int)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=9999)
+    args = parser.parse_args(argv)
+
+    request = {'command': args.command, 'id': 'trigger-profiler'}
+    for key in ('count', 'sort', 'action', 'frames', 'top'):
+        if getattr(args, key) is not None:
+            request[key] = getattr(args, key)
+    try:
+        with socket.create_connection((args.host, args.port), timeout=10) as sock:
+            sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+            data = b''
+            while not data.endswith(b'\n'):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+    except OSError as e:
+        print(f"❌ Cannot reach the controller on {args.host}:{args.port}: {e}")
+        return 1
+    reply = json.loads(data)
+    print(json.dumps(reply, indent=2))
+    return 0 if reply.get('status') == 'OK' else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
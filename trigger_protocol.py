@@ -0,0 +1,404 @@
+"""
+Trigger Protocol
+Framing and parsing helpers for the trigger socket on localhost:9999.
+
+Two connection styles are accepted on the same port:
+1. One-shot (legacy): the client writes a single message without a trailing
+   newline - either the bare string TRIGGER_F4 or a JSON object - waits for
+   the acknowledgment and closes the connection.
+2. Persistent: the client keeps the connection open and writes one message
+   per line. A JSON message may carry an "id" which is echoed back in a JSON
+   acknowledgment line, so many triggers can be pipelined over one connection.
+3. Binary: a persistent client first sends a HELLO line listing its symbols,
+   waits for the JSON reply, and from then on writes fixed-size trigger frames
+   that refer to symbols by index. Acknowledgments become fixed-size too.
+
+Binary frames (little-endian, BINARY_TRIGGER, 28 bytes):
+
+    uint8  command       1 = TRIGGER_F4, 2 = TRIGGER_F5
+    uint8  flags         bit 0: id set, bit 1: price set, bit 2: timestamp set
+    uint16 symbol        index into the HELLO symbol list
+    uint32 id            correlation id echoed in the ack
+    int64  price         futScripBp * 10**priceDecimals
+    int64  timestamp     producer epoch milliseconds
+    int16  priority
+    uint8  pad[2]
+
+Binary acks (BINARY_ACK, 8 bytes): uint32 id, uint8 status (STATUS_CODES), pad.
+
+HELLO: {"command": "HELLO", "format": "binary", "priceDecimals": 2,
+        "symbols": [{"symbolKey": ..., "scrip": ..., "futScrip": ...}, ...]}
+A binary connection carries triggers only; METRICS and the profiling commands
+(PROFILE, MEMORY, STACKS - see trigger_profiler.py) go over a JSON connection.
+"""
+
+import json
+import struct
+import time
+from typing import Optional, List, Dict, Tuple, Iterator
+
+# Maximum size of a single message; protects the server from runaway clients
+MAX_FRAME_SIZE = 64 * 1024
+
+LEGACY_TRIGGER = 'TRIGGER_F4'
+
+# Acknowledgment sent back for each accepted command
+ACK_BY_COMMAND = {
+    'TRIGGER_F4': 'F4_TRIGGERED',
+    'TRIGGER_F5': 'F5_TRIGGERED',
+}
+UNKNOWN_COMMAND = 'UNKNOWN_COMMAND'
+# Triggers refused by the queue or the trigger guard are acknowledged with the
+# reason upper-cased, e.g. QUEUE_FULL, STALE, RATE_LIMITED or CIRCUIT_OPEN
+
+# Fields copied only when the producer sends them
+OPTIONAL_FIELDS = ('priority',)
+
+# Commands answered by the server itself instead of being queued for execution
+# (HELLO is handled by the connection, the others by the controller)
+CONTROL_COMMANDS = {'METRICS', 'HELLO', 'PROFILE', 'MEMORY', 'STACKS'}
+
+# Fields copied from the producer's package for each command
+TRIGGER_FIELDS = {
+    'TRIGGER_F4': ('symbolKey', 'scrip', 'futScrip', 'futScripBp', 'timestamp'),
+    'TRIGGER_F5': ('symbolKey', 'scrip', 'futScrip', 'timestamp'),
+}
+
+# Numeric command codes used by the binary transports
+COMMAND_CODES = {'TRIGGER_F4': 1, 'TRIGGER_F5': 2}
+COMMANDS_BY_CODE = {code: command for command, code in COMMAND_CODES.items()}
+
+# Binary format negotiation (see module docstring)
+HELLO_COMMAND = 'HELLO'
+BINARY_FORMAT = 'binary'
+DEFAULT_PRICE_DECIMALS = 2
+MAX_SYMBOLS = 0xFFFF
+BINARY_TRIGGER = struct.Struct('<BBHIqqh2x')
+BINARY_ACK = struct.Struct('<IB3x')
+FLAG_ID = 0x01
+FLAG_PRICE = 0x02
+FLAG_TIMESTAMP = 0x04
+# Ack status codes on binary connections; reasons without a code are sent as REJECTED
+STATUS_CODES = {
+    'F4_TRIGGERED': 1,
+    'F5_TRIGGERED': 2,
+    UNKNOWN_COMMAND: 3,
+    'QUEUE_FULL': 4,
+    'STALE': 5,
+    'CLOSED': 6,
+    'RATE_LIMITED': 7,
+    'GLOBAL_RATE_LIMITED': 8,
+    'CIRCUIT_OPEN': 9,
+    'REJECTED': 255,
+}
+STATUS_BY_CODE = {code: status for status, code in STATUS_CODES.items()}
+
+
+class FrameTooLargeError(ValueError):
+    """Raised when a client sends more than MAX_FRAME_SIZE bytes without a delimiter."""
+
+
+class LineFramer:
+    """Split a TCP byte stream into newline-delimited frames."""
+
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """
+        Add received bytes and return every complete frame.
+
+        Args:
+            data: Bytes read from the socket
+
+        Returns:
+            List of complete frames (without delimiter, blank frames skipped)
+        """
+        self.buffer.extend(data)
+        frames = []
+        start = 0
+        while True:
+            end = self.buffer.find(b'\n', start)
+            if end < 0:
+                break
+            frame = bytes(self.buffer[start:end]).strip()
+            if frame:
+                frames.append(frame)
+            start = end + 1
+        if start:
+            del self.buffer[:start]
+        if len(self.buffer) > self.max_frame_size:
+            self.buffer.clear()
+            raise FrameTooLargeError(f"Frame exceeds {self.max_frame_size} bytes")
+        return frames
+
+    def iter_frames(self, data: bytes) -> Iterator[bytes]:
+        """
+        Like feed(), but yields the frames one at a time.
+
+        Each frame is removed from the buffer before it is yielded, so a caller
+        that stops early (a HELLO switching the connection to binary) can
+        take_rest() the bytes that followed it.
+        """
+        self.buffer.extend(data)
+        while True:
+            end = self.buffer.find(b'\n')
+            if end < 0:
+                break
+            frame = bytes(self.buffer[:end]).strip()
+            del self.buffer[:end + 1]
+            if frame:
+                yield frame
+        if len(self.buffer) > self.max_frame_size:
+            self.buffer.clear()
+            raise FrameTooLargeError(f"Frame exceeds {self.max_frame_size} bytes")
+
+    def take_rest(self) -> bytes:
+        """Remove and return the raw buffered bytes, undelimited tail included."""
+        rest = bytes(self.buffer)
+        self.buffer.clear()
+        return rest
+
+    def take_one_shot(self) -> Optional[bytes]:
+        """
+        Return the pending bytes if they already form a complete message.
+
+        Legacy clients never send a newline and wait for the acknowledgment,
+        so an undelimited buffer holding a whole message is processed as-is.
+        """
+        pending = bytes(self.buffer).strip()
+        if not pending:
+            return None
+        if pending == LEGACY_TRIGGER.encode('utf-8') or (
+                pending.endswith(b'}') and _is_json_object(pending)):
+            self.buffer.clear()
+            return pending
+        return None
+
+    def flush(self) -> Optional[bytes]:
+        """Return whatever is left in the buffer (used when the client half-closes)."""
+        pending = bytes(self.buffer).strip()
+        self.buffer.clear()
+        return pending or None
+
+
+def _is_json_object(data: bytes) -> bool:
+    """Check whether data decodes to a JSON object."""
+    try:
+        return isinstance(json.loads(data), dict)
+    except (ValueError, UnicodeDecodeError):
+        return False
+
+
+def decode_message(frame: bytes) -> Tuple[Optional[Dict[str, str]], bytes]:
+    """
+    Parse one message into trigger information and its acknowledgment.
+
+    Args:
+        frame: A single message, either JSON or the legacy TRIGGER_F4 string
+
+    Returns:
+        Tuple of (trigger_info or None when rejected, acknowledgment bytes)
+    """
+    text = frame.decode('utf-8', errors='replace').strip()
+
+    try:
+        trigger_data = json.loads(text)
+    except json.JSONDecodeError:
+        # Fallback to old simple string format for backward compatibility
+        if text == LEGACY_TRIGGER:
+            trigger_info = {
+                'command': LEGACY_TRIGGER,
+                'symbolKey': 'Legacy',
+                'scrip': 'Unknown',
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+            }
+            return trigger_info, encode_ack(ACK_BY_COMMAND[LEGACY_TRIGGER])
+        return None, encode_ack(UNKNOWN_COMMAND)
+
+    if not isinstance(trigger_data, dict):
+        return None, encode_ack(UNKNOWN_COMMAND)
+
+    correlation_id = trigger_data.get('id')
+    command = trigger_data.get('command')
+    if command in CONTROL_COMMANDS:
+        # The handler builds the reply; hand back every argument as sent
+        return dict(trigger_data), b''
+
+    fields = TRIGGER_FIELDS.get(command)
+    if fields is None:
+        return None, encode_ack(UNKNOWN_COMMAND, correlation_id)
+
+    trigger_info = {'command': command}
+    for field in fields:
+        trigger_info[field] = trigger_data.get(field, 'Unknown')
+    for field in OPTIONAL_FIELDS:
+        if field in trigger_data:
+            trigger_info[field] = trigger_data[field]
+    if correlation_id is not None:
+        trigger_info['id'] = correlation_id
+
+    return trigger_info, encode_ack(ACK_BY_COMMAND[command], correlation_id)
+
+
+def encode_ack(status: str, correlation_id=None) -> bytes:
+    """
+    Build an acknowledgment line.
+
+    Messages without an id get the plain status line legacy clients expect;
+    messages with an id get a JSON line so pipelined clients can match replies.
+    """
+    if correlation_id is None:
+        return f"{status}\n".encode('utf-8')
+    return (json.dumps({'id': correlation_id, 'status': status}) + "\n").encode('utf-8')
+
+
+def encode_reply(reply: Dict, correlation_id=None) -> bytes:
+    """Build a JSON reply line for a control command."""
+    if correlation_id is not None:
+        reply = dict(reply, id=correlation_id)
+    return (json.dumps(reply) + "\n").encode('utf-8')
+
+
+def encode_trigger(trigger: Dict[str, str]) -> bytes:
+    """Encode a trigger as one newline-delimited JSON frame (client side helper)."""
+    return (json.dumps(trigger, separators=(',', ':')) + "\n").encode('utf-8')
+
+
+def format_scaled(value: int, decimals: int) -> str:
+    """Scaled integer back to the decimal text a JSON producer would send (8750, 2 -> '87.5')."""
+    whole, fraction = divmod(abs(value), 10 ** decimals)
+    text = str(whole)
+    fraction = str(fraction).rjust(decimals, '0').rstrip('0') if decimals else ''
+    if fraction:
+        text = f"{text}.{fraction}"
+    return f"-{text}" if value < 0 else text
+
+
+def scale_price(price, decimals: int) -> int:
+    """Decimal price (number or string) as an integer in units of 10**-decimals."""
+    return int(round(float(price) * 10 ** decimals))
+
+
+class BinaryTriggerCodec:
+    """Server side of a negotiated binary connection: the symbol table plus frame decoding."""
+
+    def __init__(self, symbols: List[Dict[str, str]], price_decimals: int = DEFAULT_PRICE_DECIMALS):
+        """
+        Args:
+            symbols: Symbol entries (symbolKey, scrip, futScrip) in the order frames refer to them
+            price_decimals: Digits after the decimal point carried by the scaled price
+        """
+        if len(symbols) > MAX_SYMBOLS:
+            raise ValueError(f"At most {MAX_SYMBOLS} symbols per connection")
+        if not 0 <= price_decimals <= 9:
+            raise ValueError("priceDecimals must be between 0 and 9")
+        self.price_decimals = price_decimals
+        # Interned once; every decoded trigger shares these strings
+        self.symbols = []
+        for entry in symbols:
+            if not isinstance(entry, dict) or 'symbolKey' not in entry:
+                raise ValueError("Each symbol needs at least a symbolKey")
+            key = str(entry['symbolKey'])
+            self.symbols.append((key, str(entry.get('scrip', 'Unknown')), str(entry.get('futScrip', 'Unknown'))))
+
+    @classmethod
+    def from_hello(cls, request: Dict) -> 'BinaryTriggerCodec':
+        """Build the codec from a HELLO message (raises ValueError if it is malformed)."""
+        if request.get('format') != BINARY_FORMAT:
+            raise ValueError(f"Unsupported format '{request.get('format')}'")
+        symbols = request.get('symbols')
+        if not isinstance(symbols, list):
+            raise ValueError("HELLO needs a symbols list")
+        decimals = request.get('priceDecimals', DEFAULT_PRICE_DECIMALS)
+        if not isinstance(decimals, int) or isinstance(decimals, bool):
+            raise ValueError("priceDecimals must be an integer")
+        return cls(symbols, decimals)
+
+    def decode(self, fields: Tuple) -> Tuple[Optional[Dict], Optional[int], str]:
+        """
+        Trigger information from one unpacked BINARY_TRIGGER frame.
+
+        Returns:
+            Tuple of (trigger_info or None when rejected, correlation id or None, ack status)
+        """
+        code, flags, symbol, correlation_id, price, timestamp, priority = fields
+        correlation_id = correlation_id if flags & FLAG_ID else None
+        command = COMMANDS_BY_CODE.get(code)
+        if command is None or symbol >= len(self.symbols):
+            return None, correlation_id, UNKNOWN_COMMAND
+        symbol_key, scrip, fut_scrip = self.symbols[symbol]
+        trigger_info = {
+            'command': command,
+            'symbolKey': symbol_key,
+            'scrip': scrip,
+            'futScrip': fut_scrip,
+            'timestamp': timestamp if flags & FLAG_TIMESTAMP else 'Unknown',
+        }
+        if command == 'TRIGGER_F4':
+            trigger_info['futScripBp'] = (format_scaled(price, self.price_decimals)
+                                          if flags & FLAG_PRICE else 'Unknown')
+        if priority:
+            trigger_info['priority'] = priority
+        if correlation_id is not None:
+            trigger_info['id'] = correlation_id
+        return trigger_info, correlation_id, ACK_BY_COMMAND[command]
+
+
+class BinaryFramer:
+    """Split a byte stream into fixed-size BINARY_TRIGGER frames."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[Tuple]:
+        """Add received bytes and return every complete frame, already unpacked."""
+        if not self.buffer and len(data) % BINARY_TRIGGER.size == 0:
+            return list(BINARY_TRIGGER.iter_unpack(data))
+        self.buffer.extend(data)
+        complete = len(self.buffer) - len(self.buffer) % BINARY_TRIGGER.size
+        if not complete:
+            return []
+        frames = list(BINARY_TRIGGER.iter_unpack(memoryview(self.buffer)[:complete]))
+        del self.buffer[:complete]
+        return frames
+
+
+def encode_binary_ack(status: str, correlation_id=None) -> bytes:
+    """Fixed-size acknowledgment for a binary connection."""
+    return BINARY_ACK.pack(correlation_id or 0, STATUS_CODES.get(status, STATUS_CODES['REJECTED']))
+
+
+def encode_hello(symbols: List[Dict[str, str]], price_decimals: int = DEFAULT_PRICE_DECIMALS) -> bytes:
+    """HELLO line asking the server to switch the connection to binary frames (client side helper)."""
+    return encode_trigger({'command': HELLO_COMMAND, 'format': BINARY_FORMAT,
+                           'priceDecimals': price_decimals, 'symbols': symbols})
+
+
+def encode_binary_trigger(command: str, symbol: int, correlation_id: Optional[int] = None,
+                          price=None, timestamp: Optional[int] = None, priority: int = 0,
+                          price_decimals: int = DEFAULT_PRICE_DECIMALS) -> bytes:
+    """
+    Encode one binary trigger frame (client side helper).
+
+    Args:
+        command: TRIGGER_F4 or TRIGGER_F5
+        symbol: Index of the symbol in the HELLO list
+        correlation_id: Unsigned 32-bit id echoed in the ack
+        price: futScripBp (number or decimal string)
+        timestamp: Producer epoch milliseconds
+        priority: Queue priority
+        price_decimals: Must match the HELLO message
+    """
+    flags = 0
+    if correlation_id is not None:
+        flags |= FLAG_ID
+    if price is not None:
+        flags |= FLAG_PRICE
+    if timestamp is not None:
+        flags |= FLAG_TIMESTAMP
+    return BINARY_TRIGGER.pack(
+        COMMAND_CODES[command], flags, symbol, correlation_id or 0,
+        scale_price(price, price_decimals) if price is not None else 0,
+        timestamp or 0, priority)
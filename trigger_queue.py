@@ -0,0 +1,263 @@
+"""
+Trigger Queue
+In-process hand-off between the socket server threads and the keystroke executor.
+
+Producers (socket handler threads) put immutable TriggerRecord objects on a
+bounded queue and the executor blocks on it, so a trigger is picked up the
+moment it arrives and a second trigger arriving mid-sequence waits its turn
+instead of overwriting the first. The queue also applies admission control:
+stale triggers are dropped and repeated triggers for a symbol are coalesced.
+"""
+
+import heapq
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Callable
+
+from trigger_metrics import TriggerTimeline, parse_producer_timestamp
+
+
+def _as_int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+@dataclass(frozen=True)
+class TriggerRecord:
+    """Immutable description of a single trigger received from a producer."""
+
+    command: str
+    symbol_key: str = 'Unknown'
+    scrip: str = 'Unknown'
+    fut_scrip: Optional[str] = None
+    fut_scrip_bp: Optional[str] = None
+    timestamp: Any = 'Unknown'  # Producer's timestamp, as sent
+    correlation_id: Any = None
+    priority: int = 0  # Higher runs first when several symbols are pending
+    received_at: float = field(default_factory=time.perf_counter)
+    # Latency marks collected as the trigger moves through the pipeline
+    timeline: TriggerTimeline = field(default=None, compare=False, repr=False)
+
+    def __post_init__(self):
+        if self.timeline is None:
+            object.__setattr__(self, 'timeline', TriggerTimeline(self.timestamp))
+
+    @classmethod
+    def from_info(cls, trigger_info: Dict[str, Any],
+                  received_at: Optional[float] = None) -> 'TriggerRecord':
+        """
+        Build a record from the dict produced by trigger_protocol.decode_message.
+
+        Args:
+            trigger_info: Parsed trigger fields
+            received_at: time.perf_counter() when the bytes were read (default: now)
+        """
+        record = cls(
+            command=trigger_info['command'],
+            symbol_key=trigger_info.get('symbolKey', 'Unknown'),
+            scrip=trigger_info.get('scrip', 'Unknown'),
+            fut_scrip=trigger_info.get('futScrip'),
+            fut_scrip_bp=trigger_info.get('futScripBp'),
+            timestamp=trigger_info.get('timestamp', 'Unknown'),
+            correlation_id=trigger_info.get('id'),
+            priority=_as_int(trigger_info.get('priority', 0)),
+            received_at=time.perf_counter() if received_at is None else received_at,
+        )
+        record.timeline.mark('received', record.received_at)
+        return record
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the trigger in the wire (camelCase) field names."""
+        info = {
+            'command': self.command,
+            'symbolKey': self.symbol_key,
+            'scrip': self.scrip,
+            'timestamp': self.timestamp,
+        }
+        if self.fut_scrip is not None:
+            info['futScrip'] = self.fut_scrip
+        if self.fut_scrip_bp is not None:
+            info['futScripBp'] = self.fut_scrip_bp
+        if self.correlation_id is not None:
+            info['id'] = self.correlation_id
+        return info
+
+
+# Reasons a trigger is refused or dropped (also used as stats keys)
+REJECT_QUEUE_FULL = 'queue_full'
+REJECT_STALE = 'stale'
+REJECT_CLOSED = 'closed'
+DROP_STALE_IN_QUEUE = 'stale_in_queue'
+DROP_COALESCED = 'coalesced'
+
+# Symbol keys that identify no particular symbol and are never coalesced
+UNCOALESCED_KEYS = {'Legacy', 'Unknown'}
+
+
+def trigger_age(record: TriggerRecord, now_wall: Optional[float] = None) -> float:
+    """
+    Seconds since the producer created the trigger.
+
+    Uses the producer's timestamp when it can be parsed, otherwise the time
+    the bytes were received.
+    """
+    sent = parse_producer_timestamp(record.timestamp)
+    if sent is not None:
+        return (time.time() if now_wall is None else now_wall) - sent
+    return time.perf_counter() - record.received_at
+
+
+class TriggerQueue:
+    """Bounded trigger queue with admission control and blocking, wake-on-put consumers.
+
+    - Triggers older than max_age are refused on arrival and dropped at dequeue.
+    - With coalesce enabled, a trigger for a (symbolKey, command) that is
+      already pending replaces the pending one in place (keeping its turn).
+    - Pending work is served highest priority first, then in arrival order.
+    """
+
+    def __init__(self, maxsize: int = 100, max_age: Optional[float] = None,
+                 coalesce: bool = True,
+                 priority: Optional[Callable[[TriggerRecord], float]] = None,
+                 on_coalesce: Optional[Callable[[TriggerRecord], None]] = None):
+        """
+        Args:
+            maxsize: Maximum number of pending triggers; further puts are rejected
+            max_age: Maximum trigger age in seconds (None disables expiry)
+            coalesce: Replace a pending trigger for the same symbolKey/command with the newest one
+            priority: Returns a trigger's priority, higher first (default: record.priority)
+            on_coalesce: Called with a trigger that was merged into a pending one
+                (under the queue lock, so it must not use the queue)
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.coalesce = coalesce
+        self.priority = priority or (lambda record: record.priority)
+        self.on_coalesce = on_coalesce
+        self._heap = []  # (-priority, seq, key)
+        self._pending = {}  # key -> (seq, record)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.accepted = 0
+        self.rejected = 0
+        self.delivered = 0
+        self.drops = {reason: 0 for reason in (REJECT_QUEUE_FULL, REJECT_STALE, REJECT_CLOSED,
+                                               DROP_STALE_IN_QUEUE, DROP_COALESCED)}
+
+    def _key(self, record: TriggerRecord, seq: int):
+        if self.coalesce and record.symbol_key not in UNCOALESCED_KEYS:
+            return (record.symbol_key, record.command)
+        return ('#', seq)
+
+    def _is_stale(self, record: TriggerRecord) -> bool:
+        return self.max_age is not None and trigger_age(record) > self.max_age
+
+    def put(self, record: TriggerRecord) -> Optional[str]:
+        """
+        Admit a trigger and wake the executor.
+
+        Returns:
+            None if queued (or coalesced into a pending trigger), otherwise the
+            rejection reason: REJECT_STALE, REJECT_QUEUE_FULL or REJECT_CLOSED
+        """
+        stale = self._is_stale(record)
+        with self._cond:
+            if self._closed:
+                reason = REJECT_CLOSED
+            elif stale:
+                reason = REJECT_STALE
+            else:
+                key = self._key(record, self._seq)
+                pending = self._pending.get(key)
+                if pending is not None:
+                    # Newest data wins; the trigger keeps its place in line
+                    seq, replaced = pending
+                    self._pending[key] = (seq, record)
+                    self.drops[DROP_COALESCED] += 1
+                    priority = self.priority(record)
+                    if priority != self.priority(replaced):
+                        heapq.heappush(self._heap, (-priority, seq, key))
+                    self.accepted += 1
+                    if self.on_coalesce:
+                        self.on_coalesce(record)
+                    return None
+                if len(self._pending) >= self.maxsize:
+                    reason = REJECT_QUEUE_FULL
+                else:
+                    seq = self._seq
+                    self._seq += 1
+                    self._pending[key] = (seq, record)
+                    heapq.heappush(self._heap, (-self.priority(record), seq, key))
+                    self.accepted += 1
+                    self._cond.notify()
+                    return None
+            self.rejected += 1
+            self.drops[reason] += 1
+            return reason
+
+    def _pop(self) -> Optional[TriggerRecord]:
+        """Pop the best pending trigger, skipping superseded heap entries."""
+        while self._heap:
+            neg_priority, seq, key = heapq.heappop(self._heap)
+            pending = self._pending.get(key)
+            if pending is None or pending[0] != seq:
+                continue
+            if -neg_priority != self.priority(pending[1]):
+                continue  # Entry from before a coalesce changed the priority
+            del self._pending[key]
+            return pending[1]
+        return None
+
+    def get(self, timeout: Optional[float] = None) -> Optional[TriggerRecord]:
+        """
+        Remove and return the next trigger, blocking until one is available.
+
+        Triggers that went stale while waiting are dropped here.
+
+        Args:
+            timeout: Maximum seconds to wait (None waits forever)
+
+        Returns:
+            The next TriggerRecord, or None on timeout or when the queue is closed
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not self._cond.wait_for(lambda: self._pending or self._closed, remaining):
+                    return None
+                record = self._pop()
+                if record is None:
+                    return None
+                if self._is_stale(record):
+                    self.drops[DROP_STALE_IN_QUEUE] += 1
+                    continue
+                self.delivered += 1
+                return record
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring: accepted, delivered, pending and every drop reason."""
+        with self._cond:
+            return dict(self.drops, accepted=self.accepted, delivered=self.delivered,
+                        pending=len(self._pending))
+
+    def close(self):
+        """Reject further triggers and wake every waiting consumer."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        """Whether close() has been called."""
+        return self._closed
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._pending)
@@ -0,0 +1,162 @@
+"""
+Trigger Replay
+Replay the F4/F5 triggers recorded in order_logs.txt against the controller.
+
+Triggers are sent over the real socket protocol (persistent connection,
+newline-delimited JSON) with the same spacing as in the log, scaled by
+--speed. With --headless an in-process controller is started with the
+recording input backend, so the replay needs no display or trading terminal.
+
+Usage:
+    python trigger_replay.py --headless                  # real time
+    python trigger_replay.py --headless --speed 100      # 100x accelerated
+    python trigger_replay.py --headless --speed 0        # as fast as possible
+    python trigger_replay.py --port 9999 --speed 10      # against a running controller
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Optional, List, Dict, Any
+
+from controller_logging import setup_logging
+from order_log_parser import parse_order_log, LoggedTrigger
+from trigger_bench import BenchHarness, LoadClient, summarize
+
+
+def replay_schedule(triggers: List[LoggedTrigger], speed: float,
+                    max_gap: Optional[float] = None) -> List[float]:
+    """
+    Offsets in seconds (from replay start) at which each trigger is sent.
+
+    Args:
+        triggers: Logged triggers in log order
+        speed: Playback speed (1 = real time, 10 = ten times faster, 0 = no waiting)
+        max_gap: Cap on any single logged gap, in log seconds (skips idle hours)
+    """
+    offsets = []
+    offset = 0.0
+    previous = None
+    for trigger in triggers:
+        if previous is not None and speed > 0:
+            gap = max(0.0, (trigger.time - previous).total_seconds())
+            if max_gap is not None:
+                gap = min(gap, max_gap)
+            offset += gap / speed
+        offsets.append(offset)
+        previous = trigger.time
+    return offsets
+
+
+def run_replay(triggers: List[LoggedTrigger], port: int, speed: float,
+               max_gap: Optional[float], timeout: float,
+               harness: Optional[BenchHarness] = None) -> Dict[str, Any]:
+    """Send the triggers on schedule and collect ack (and, headless, execution) results."""
+    client = LoadClient(port, 0)
+    offsets = replay_schedule(triggers, speed, max_gap)
+    started = time.perf_counter()
+    lateness = []
+    try:
+        for index, (trigger, offset) in enumerate(zip(triggers, offsets)):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            lateness.append(max(0.0, time.perf_counter() - started - offset))
+            # The producer timestamp is the send time, so skew metrics stay meaningful
+            payload = dict(trigger.to_trigger(), timestamp=int(time.time() * 1000),
+                           loggedAt=trigger.time.isoformat())
+            client.send_payload(index, payload)
+        client.wait_for_acks(timeout)
+        if harness:
+            harness.wait_for_completions(timeout)
+        elapsed = time.perf_counter() - started
+    finally:
+        client.close()
+
+    result = {
+        'triggers': len(triggers),
+        'speed': speed,
+        'elapsed_s': elapsed,
+        'logged_span_s': (max(t.time for t in triggers) - min(t.time for t in triggers)).total_seconds(),
+        'statuses': dict(client.statuses),
+        'ack_latency_s': summarize(client.ack_latency),
+        'send_lateness_s': summarize(lateness),
+    }
+    if harness:
+        result['completed'] = harness.completed
+        result['server_latency_s'] = harness.controller.metrics.snapshot()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay order_logs.txt triggers into the controller")
+    parser.add_argument('--log', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      'order_logs.txt'),
+                        help="Order log to replay")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Playback speed: 1 = real time, 10/100 = accelerated, 0 = as fast as possible")
+    parser.add_argument('--max-gap', type=float, help="Cap idle gaps between triggers (log seconds)")
+    parser.add_argument('--repeat', type=int, default=1, help="Replay the log this many times back to back")
+    parser.add_argument('--port', type=int, default=9999, help="Controller port (ignored with --headless)")
+    parser.add_argument('--headless', action='store_true',
+                        help="Start an in-process controller with the recording input backend")
+    parser.add_argument('--delay-scale', type=float, default=0.0,
+                        help="Headless only: multiplier for sequence delays (1 = production)")
+    parser.add_argument('--timeout', type=float, default=300.0, help="Seconds to wait for completion")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+    # Controller records go to logs/controller.log only, off the console
+    setup_logging(console=False)
+
+    logged = parse_order_log(args.log)
+    if not logged:
+        print(f"No F4/F5 triggers found in {args.log}")
+        return 1
+    triggers = logged * max(1, args.repeat)
+    print(f"📂 {len(logged)} trigger(s) in {args.log}; replaying {len(triggers)} at "
+          f"{'max speed' if args.speed <= 0 else f'{args.speed:g}x'}")
+
+    harness = None
+    if args.headless:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            harness = BenchHarness(args.delay_scale, queue_size=max(100, len(triggers)))
+            harness.start()
+        port = harness.port
+    else:
+        port = args.port
+
+    try:
+        # The controller's console output would dominate the measurement
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull if harness else sys.stdout):
+            result = run_replay(triggers, port, args.speed, args.max_gap, args.timeout, harness)
+    finally:
+        if harness:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                harness.stop()
+
+    ack = result['ack_latency_s']
+    print(f"\n✅ Sent {result['triggers']} trigger(s) in {result['elapsed_s']:.3f}s "
+          f"(logged span {result['logged_span_s']:.0f}s)")
+    print(f"   Statuses: {result['statuses']}")
+    if ack.get('count'):
+        print(f"   Ack latency p50 {ack['p50'] * 1000:.3f} ms, p95 {ack['p95'] * 1000:.3f} ms, "
+              f"p99 {ack['p99'] * 1000:.3f} ms")
+    if harness:
+        print(f"   Executed: {result['completed']}")
+        for command, segments in result['server_latency_s'].items():
+            total = segments.get('total')
+            if total:
+                print(f"   {command} total p50 {total['p50'] * 1000:.3f} ms, p95 {total['p95'] * 1000:.3f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"📝 Results saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""
+Window Focus
+Bring the target application's window to the foreground before keystrokes.
+
+Win32FocusService talks to user32 directly through ctypes, caches the target
+window handle, and returns immediately when that window - or a dialog it
+owns, such as an order form - is already in the foreground. The handle is
+resolved for the exact pid (and hwnd, when the enumerator supplied one);
+other processes with the same image name are only a fallback after the
+target process restarted. LocalFocusService is a stand-in with the same interface for
+running and testing the controller off Windows.
+"""
+
+import sys
+import time
+import threading
+from typing import Optional, Dict
+
+import psutil
+
+
+class FocusService:
+    """Base class for window focus services."""
+
+    name = 'base'
+
+    def focus(self, app_info: Dict[str, str]) -> bool:
+        """
+        Make the application's main window the foreground window.
+
+        Args:
+            app_info: Application info as returned by get_open_applications
+
+        Returns:
+            True if the window is in the foreground afterwards
+        """
+        raise NotImplementedError
+
+    def is_focused(self, app_info: Dict[str, str]) -> bool:
+        """Check whether the application's window (or one of its dialogs) is in the foreground."""
+        raise NotImplementedError
+
+    def invalidate(self):
+        """Forget cached window handles (e.g. after the application restarted)."""
+
+
+SW_RESTORE = 9
+GW_OWNER = 4
+GA_ROOTOWNER = 3
+
+
+class Win32FocusService(FocusService):
+    """In-process focus service using user32, with a cached window handle."""
+
+    name = 'win32'
+
+    def __init__(self, settle_timeout: float = 0.25):
+        """
+        Args:
+            settle_timeout: Maximum seconds to wait for the foreground switch to land
+        """
+        if sys.platform != 'win32':
+            raise OSError("Win32FocusService is only available on Windows")
+        import ctypes
+        from ctypes import wintypes
+
+        self.ctypes = ctypes
+        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self.user32.GetForegroundWindow.restype = wintypes.HWND
+        self.user32.GetWindowThreadProcessId.argtypes = (wintypes.HWND, ctypes.POINTER(wintypes.DWORD))
+        self.user32.IsWindow.argtypes = (wintypes.HWND,)
+        self.user32.IsWindowVisible.argtypes = (wintypes.HWND,)
+        self.user32.IsIconic.argtypes = (wintypes.HWND,)
+        self.user32.GetWindow.argtypes = (wintypes.HWND, ctypes.c_uint)
+        self.user32.GetWindow.restype = wintypes.HWND
+        self.user32.GetAncestor.argtypes = (wintypes.HWND, ctypes.c_uint)
+        self.user32.GetAncestor.restype = wintypes.HWND
+        self.user32.ShowWindow.argtypes = (wintypes.HWND, ctypes.c_int)
+        self.user32.BringWindowToTop.argtypes = (wintypes.HWND,)
+        self.user32.SetForegroundWindow.argtypes = (wintypes.HWND,)
+        self.user32.GetLastActivePopup.argtypes = (wintypes.HWND,)
+        self.user32.GetLastActivePopup.restype = wintypes.HWND
+        self.user32.AttachThreadInput.argtypes = (wintypes.DWORD, wintypes.DWORD, wintypes.BOOL)
+        self.kernel32 = ctypes.WinDLL('kernel32')
+        self.enum_proc_type = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+        self.user32.EnumWindows.argtypes = (self.enum_proc_type, wintypes.LPARAM)
+        self.settle_timeout = settle_timeout
+        self._hwnd_cache = {}  # (process name, pid, hwnd) -> hwnd
+        self._lock = threading.Lock()
+
+    def _window_pid(self, hwnd) -> int:
+        pid = self.ctypes.c_ulong()
+        self.user32.GetWindowThreadProcessId(hwnd, self.ctypes.byref(pid))
+        return pid.value
+
+    def _find_main_window(self, pids) -> Optional[int]:
+        """Return the first visible, unowned top-level window of any pid in pids."""
+        found = []
+
+        def callback(hwnd, _lparam):
+            if (self.user32.IsWindowVisible(hwnd) and not self.user32.GetWindow(hwnd, GW_OWNER)
+                    and self._window_pid(hwnd) in pids):
+                found.append(hwnd)
+                return False  # Stop enumerating
+            return True
+
+        self.user32.EnumWindows(self.enum_proc_type(callback), 0)
+        return found[0] if found else None
+
+    @staticmethod
+    def _target_pid(app_info: Dict[str, str]) -> Optional[int]:
+        try:
+            return int(app_info.get('pid', 0)) or None
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _same_name_pids(app_info: Dict[str, str]):
+        """Every process with the target's image name (fallback after a restart)."""
+        name = app_info['name'].lower()
+        return {proc.pid for proc in psutil.process_iter(['name'])
+                if (proc.info['name'] or '').lower() == name}
+
+    def _resolve(self, app_info: Dict[str, str]) -> Optional[int]:
+        pid = self._target_pid(app_info)
+        try:
+            hwnd = int(app_info.get('hwnd', 0)) or None
+        except (TypeError, ValueError):
+            hwnd = None
+        # The exact window the user picked, while it still belongs to that process
+        if hwnd and self.user32.IsWindow(hwnd) and (pid is None or self._window_pid(hwnd) == pid):
+            return hwnd
+        if pid is not None:
+            hwnd = self._find_main_window({pid})
+            if hwnd:
+                return hwnd
+        return self._find_main_window(self._same_name_pids(app_info))
+
+    def window_handle(self, app_info: Dict[str, str]) -> Optional[int]:
+        """Return the cached window handle, looking it up only when it is stale."""
+        key = (app_info['name'], app_info.get('pid'), app_info.get('hwnd'))
+        with self._lock:
+            hwnd = self._hwnd_cache.get(key)
+            if hwnd and self.user32.IsWindow(hwnd):
+                return hwnd
+            hwnd = self._resolve(app_info)
+            if hwnd:
+                self._hwnd_cache[key] = hwnd
+            else:
+                self._hwnd_cache.pop(key, None)
+            return hwnd
+
+    def _owns_foreground(self, hwnd: int) -> bool:
+        """
+        The foreground window is hwnd or one of its owned windows (e.g. a dialog).
+
+        Other windows of the same process do not count: two terminal windows of
+        one process must not be mistaken for each other.
+        """
+        foreground = self.user32.GetForegroundWindow()
+        if not foreground:
+            return False
+        return foreground == hwnd or self.user32.GetAncestor(foreground, GA_ROOTOWNER) == hwnd
+
+    def is_focused(self, app_info: Dict[str, str]) -> bool:
+        hwnd = self.window_handle(app_info)
+        return bool(hwnd) and self._owns_foreground(hwnd)
+
+    def focus(self, app_info: Dict[str, str]) -> bool:
+        hwnd = self.window_handle(app_info)
+        if not hwnd:
+            return False
+        if self._owns_foreground(hwnd):
+            return True  # Already in front (or one of its dialogs is): nothing to do
+
+        if self.user32.IsIconic(hwnd):
+            self.user32.ShowWindow(hwnd, SW_RESTORE)
+        # Reactivate the order form if one was open, as Alt+Tab does
+        target = self.user32.GetLastActivePopup(hwnd) or hwnd
+        if not self.user32.IsWindowVisible(target):
+            target = hwnd
+        # Sharing the foreground thread's input state lifts the foreground lock. A
+        # synthetic Alt tap would do the same, but mid-sequence it would land in
+        # another pool window's open order form.
+        foreground = self.user32.GetForegroundWindow()
+        other_thread = self.user32.GetWindowThreadProcessId(foreground, None) if foreground else 0
+        own_thread = self.kernel32.GetCurrentThreadId()
+        attached = bool(other_thread) and other_thread != own_thread and \
+            bool(self.user32.AttachThreadInput(own_thread, other_thread, True))
+        try:
+            self.user32.BringWindowToTop(target)
+            self.user32.SetForegroundWindow(target)
+        finally:
+            if attached:
+                self.user32.AttachThreadInput(own_thread, other_thread, False)
+
+        deadline = time.perf_counter() + self.settle_timeout
+        while time.perf_counter() < deadline:
+            if self._owns_foreground(hwnd):
+                return True
+            time.sleep(0.005)
+        return self._owns_foreground(hwnd)
+
+    def invalidate(self):
+        with self._lock:
+            self._hwnd_cache.clear()
+
+
+class LocalFocusService(FocusService):
+    """Stand-in focus service that tracks a simulated foreground window."""
+
+    name = 'local'
+
+    def __init__(self, switch_cost: float = 0.0):
+        """
+        Args:
+            switch_cost: Seconds a simulated foreground switch takes
+        """
+        self.switch_cost = switch_cost
+        self.foreground = None
+        self.focus_calls = 0
+        self.switches = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _window_key(app_info: Dict[str, str]):
+        return (app_info['name'], app_info.get('pid'), app_info.get('hwnd'))
+
+    def is_focused(self, app_info: Dict[str, str]) -> bool:
+        return self.foreground == self._window_key(app_info)
+
+    def focus(self, app_info: Dict[str, str]) -> bool:
+        with self._lock:
+            self.focus_calls += 1
+            key = self._window_key(app_info)
+            if self.foreground == key:
+                return True
+            if self.switch_cost:
+                time.sleep(self.switch_cost)
+            self.foreground = key
+            self.switches += 1
+            return True
+
+    def invalidate(self):
+        with self._lock:
+            self.foreground = None
+
+
+def create_focus_service() -> FocusService:
+    """Return the Win32 focus service on Windows and the local stand-in elsewhere."""
+    if sys.platform == 'win32':
+        return Win32FocusService()
+    return LocalFocusService()
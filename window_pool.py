@@ -0,0 +1,185 @@
+"""
+Window Pool
+Run triggers against several trading-terminal windows from one process.
+
+Each TargetWindow has its own trigger queue and executor thread. Keystrokes
+only reach the foreground window, so executors take turns through a shared
+focus lock, held only while a burst of key events is sent: the executor
+takes the lock, brings its terminal (the main window or a dialog it owns)
+to the front if another window took it, injects the burst and releases the
+lock. The delays between steps, where a sequence spends nearly all of its
+time, run outside the lock, so N windows execute their sequences
+concurrently and each order form simply keeps its state while another
+window is in front. Routing, queueing and waiting for the next trigger
+happen outside the lock as well.
+
+Routing:
+- 'affinity' (default): a symbolKey sticks to the window it was first sent
+  to, chosen as the least-loaded window at that time
+- 'least_loaded': every trigger goes to the window with the least work
+"""
+
+import threading
+from typing import Optional, List, Dict, Callable
+
+from input_backends import InputBackend, InputEvent
+from keystroke_plan import PlanExecutor
+from trigger_queue import TriggerQueue, TriggerRecord
+from window_focus import FocusService
+from controller_logging import get_logger
+
+log = get_logger('executor')
+
+ROUTING_POLICIES = ('affinity', 'least_loaded')
+
+
+class FocusedBackend(InputBackend):
+    """Wraps a backend so every batch is sent with its own window in the foreground."""
+
+    def __init__(self, inner: InputBackend, focus_service: FocusService,
+                 app_info: Dict[str, str], focus_lock: threading.Lock):
+        self.inner = inner
+        self.focus_service = focus_service
+        self.app_info = app_info
+        self.focus_lock = focus_lock
+        self.name = f"focused-{inner.name}"
+        self.handoffs = 0  # Batches that needed a foreground switch
+
+    def _ensure_focused(self):
+        if not self.focus_service.is_focused(self.app_info):
+            if not self.focus_service.focus(self.app_info):
+                raise RuntimeError(f"Could not focus {self.app_info['display_name']}")
+            self.handoffs += 1
+
+    def send_events(self, events: List[InputEvent]):
+        # Focus and injection are one unit; the step delays around it run unlocked
+        with self.focus_lock:
+            self._ensure_focused()
+            self.inner.send_events(events)
+
+
+class TargetWindow:
+    """One target application window with its own queue and executor thread."""
+
+    def __init__(self, index: int, app_info: Dict[str, str], queue: TriggerQueue,
+                 backend: FocusedBackend, verbose: bool = True):
+        self.index = index
+        self.app_info = app_info
+        self.queue = queue
+        self.backend = backend
+        self.executor = PlanExecutor(backend, verbose=verbose)
+        self.busy = False
+        self.completed = 0
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def name(self) -> str:
+        return self.app_info['display_name']
+
+    def load(self) -> int:
+        """Pending triggers plus the one being executed."""
+        return len(self.queue) + (1 if self.busy else 0)
+
+
+class WindowPool:
+    """Routes triggers to a set of TargetWindows and runs one executor per window."""
+
+    def __init__(self, apps: List[Dict[str, str]], backend: InputBackend,
+                 focus_service: FocusService, queue_factory: Callable[[], TriggerQueue],
+                 process: Callable[[TriggerRecord, TargetWindow], Optional[List[TriggerRecord]]],
+                 routing: str = 'affinity', verbose: bool = True,
+                 thread_setup: Optional[Callable[[TargetWindow], None]] = None):
+        """
+        Args:
+            apps: Target applications (as returned by get_open_applications)
+            backend: Input backend shared by every window
+            focus_service: Focus service used for handoffs between windows
+            queue_factory: Creates the trigger queue of each window
+            process: Called on the window's executor thread for each trigger taken from the
+                queue; may execute more queued triggers and return every one it ran
+            routing: 'affinity' or 'least_loaded'
+            verbose: Log each sequence step
+            thread_setup: Called first on each executor thread (e.g. to raise its priority)
+        """
+        if not apps:
+            raise ValueError("WindowPool needs at least one application")
+        if routing not in ROUTING_POLICIES:
+            raise ValueError(f"Unknown routing policy '{routing}' (choose from {', '.join(ROUTING_POLICIES)})")
+        self.focus_lock = threading.Lock()
+        self.windows = [
+            TargetWindow(index, app, queue_factory(),
+                         FocusedBackend(backend, focus_service, app, self.focus_lock), verbose)
+            for index, app in enumerate(apps)
+        ]
+        self.process = process
+        self.thread_setup = thread_setup
+        self.routing = routing
+        self.affinity: Dict[str, TargetWindow] = {}
+        self._route_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def route(self, trigger: TriggerRecord) -> TargetWindow:
+        """Pick the window that will execute trigger."""
+        with self._route_lock:
+            if self.routing == 'affinity':
+                window = self.affinity.get(trigger.symbol_key)
+                if window is not None:
+                    return window
+            window = min(self.windows, key=lambda w: (w.load(), w.index))
+            if self.routing == 'affinity':
+                self.affinity[trigger.symbol_key] = window
+            return window
+
+    def submit(self, trigger: TriggerRecord) -> Optional[str]:
+        """Route and queue a trigger; returns the rejection reason, if any."""
+        return self.route(trigger).queue.put(trigger)
+
+    def _run(self, window: TargetWindow):
+        if self.thread_setup:
+            self.thread_setup(window)
+        while not self._stopped.is_set():
+            trigger = window.queue.get(timeout=1.0)
+            if trigger is None:
+                if window.queue.closed:
+                    return
+                continue
+            trigger.timeline.mark('dequeued')
+            window.busy = True
+            try:
+                executed = self.process(trigger, window)
+                window.completed += len(executed) if executed else 1
+            except Exception as e:
+                log.error("❌ [%s] Error executing %s: %s", window.name, trigger.command, e)
+            finally:
+                window.busy = False
+
+    def start(self):
+        """Start one executor thread per window."""
+        self._stopped.clear()
+        for window in self.windows:
+            window.thread = threading.Thread(target=self._run, args=(window,),
+                                             name=f"executor-{window.index}", daemon=True)
+            window.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop accepting triggers and wait for the executors to finish their current sequence."""
+        self._stopped.set()
+        for window in self.windows:
+            window.queue.close()
+        for window in self.windows:
+            if window.thread:
+                window.thread.join(timeout)
+
+    def wait(self, timeout: float) -> bool:
+        """Block up to timeout seconds; returns True once the pool has been stopped."""
+        return self._stopped.wait(timeout)
+
+    def status(self) -> List[Dict]:
+        """Per-window load and counters."""
+        return [{
+            'window': window.name,
+            'pending': len(window.queue),
+            'busy': window.busy,
+            'completed': window.completed,
+            'focus_handoffs': window.backend.handoffs,
+        } for window in self.windows]